@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+@dataclass
+class CachedApp:
+    """Generated single-page app code for one cache key."""
+
+    code: str
+    created_at: float
+
+    @property
+    def size(self) -> int:
+        return len(self.code.encode("utf-8"))
+
+
+class MemoryAppBackend:
+    """In-process LRU store, bounded by the total size of cached code."""
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedApp]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[CachedApp]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedApp):
+        self.delete(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self._max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+class SQLiteAppBackend:
+    """SQLite-backed LRU store, shared by bot processes on the same host.
+
+    The file is created readable by its owner only, since generated apps
+    echo what users asked for.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self._max_bytes = max_bytes
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS generated_apps (
+                key text PRIMARY KEY,
+                code text NOT NULL,
+                created_at real NOT NULL,
+                size integer NOT NULL,
+                last_used real NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[CachedApp]:
+        row = self._conn.execute(
+            "SELECT code, created_at FROM generated_apps WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            "UPDATE generated_apps SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        self._conn.commit()
+        return CachedApp(*row)
+
+    def put(self, key: str, entry: CachedApp):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO generated_apps VALUES (?, ?, ?, ?, ?)",
+            (key, entry.code, entry.created_at, entry.size, time.time()),
+        )
+        # evict least recently used entries, always keeping the newest one
+        rows = self._conn.execute(
+            "SELECT key, size FROM generated_apps ORDER BY last_used DESC"
+        ).fetchall()
+        total = 0
+        for i, (cached_key, size) in enumerate(rows):
+            total += size
+            if i > 0 and total > self._max_bytes:
+                self._conn.execute("DELETE FROM generated_apps WHERE key = ?", (cached_key,))
+        self._conn.commit()
+
+    def delete(self, key: str):
+        self._conn.execute("DELETE FROM generated_apps WHERE key = ?", (key,))
+        self._conn.commit()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM generated_apps"
+        ).fetchone()[0]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the app."""
+    return " ".join(prompt.lower().split()).rstrip(".!?")
+
+
+def app_cache_key(prompt: str, model: str, system_instruction: str) -> str:
+    """Key for a generation; changing the model or instruction text changes it."""
+    instruction_version = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()[:16]
+    return hashlib.sha256(
+        "\0".join([model, instruction_version, normalize_prompt(prompt)]).encode("utf-8")
+    ).hexdigest()
+
+
+class _SharedGeneration:
+    """One upstream generation that any number of callers can follow.
+
+    Each follower gets every chunk from the start, including those produced
+    before it joined. The generation is cancelled once nobody follows it.
+    """
+
+    def __init__(self, source: AsyncIterator[str]):
+        self._chunks: List[str] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._followers = 0
+        self._changed = asyncio.Condition()
+        self.task = asyncio.create_task(self._run(source))
+
+    async def _run(self, source: AsyncIterator[str]):
+        try:
+            async for text in source:
+                self._chunks.append(text)
+                async with self._changed:
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self._error = RuntimeError("generation cancelled")
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def follow(self) -> AsyncIterator[str]:
+        self._followers += 1
+        sent = 0
+        try:
+            while True:
+                while sent < len(self._chunks):
+                    yield self._chunks[sent]
+                    sent += 1
+                if self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(
+                        lambda: sent < len(self._chunks) or self._done
+                    )
+        finally:
+            self._followers -= 1
+            if self._followers == 0 and not self._done:
+                self.task.cancel()
+
+
+class AppCache:
+    """Content-addressed cache of generated single-page apps.
+
+    A hit yields the stored code at once. A miss starts the upstream
+    generation; further requests for the same key while it runs follow that
+    generation instead of starting their own. Completed generations are
+    stored and expire after `ttl` seconds.
+    """
+
+    def __init__(self, backend, ttl: float = 86400):
+        self._backend = backend
+        self._ttl = ttl
+        self._inflight: Dict[str, _SharedGeneration] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "inflight": len(self._inflight),
+            "size_bytes": self._backend.size_bytes,
+        }
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._backend.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.created_at >= self._ttl:
+            self._backend.delete(key)
+            return None
+        return entry.code
+
+    async def stream(
+        self, key: str, generate: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """Yield the app code for key, generating it with generate() on a miss."""
+        code = self.get(key)
+        if code is not None:
+            self.hits += 1
+            logger.debug(f"Generated app cache hit: {self.stats()}")
+            yield code
+            return
+
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self.shared += 1
+        else:
+            self.misses += 1
+            shared = _SharedGeneration(self._generate_and_store(key, generate()))
+            self._inflight[key] = shared
+            shared.task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        async for text in shared.follow():
+            yield text
+
+    async def _generate_and_store(self, key: str, source: AsyncIterator[str]):
+        chunks = []
+        async for text in source:
+            chunks.append(text)
+            yield text
+        code = "".join(chunks)
+        if code:
+            self._backend.put(key, CachedApp(code=code, created_at=time.time()))
+
+
+_app_cache: Optional[AppCache] = None
+
+
+def get_app_cache() -> Optional[AppCache]:
+    """Process-wide cache, configured from APP_CACHE_* env variables.
+
+    Returns None when APP_CACHE_BACKEND is "none".
+    """
+    global _app_cache
+    backend_name = os.getenv("APP_CACHE_BACKEND", "memory")
+    if backend_name == "none":
+        return None
+    if _app_cache is None:
+        max_bytes = int(os.getenv("APP_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        if backend_name == "sqlite":
+            path = os.getenv(
+                "APP_CACHE_PATH", os.path.join(tempfile.gettempdir(), "app-cache.sqlite3")
+            )
+            backend = SQLiteAppBackend(path, max_bytes)
+        else:
+            backend = MemoryAppBackend(max_bytes)
+        _app_cache = AppCache(backend, ttl=float(os.getenv("APP_CACHE_TTL", "86400")))
+    return _app_cache
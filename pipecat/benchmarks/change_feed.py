@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Checks of the todo_turns change feed against a real Postgres.
+
+Needs SUPABASE_DB_URL pointing at a database with the migrations applied
+(migration 9 adds the NOTIFY trigger). Two context caches, standing in for
+two bot processes, each run a TodoTurnsFeed on their own connection; turns
+are inserted into Postgres, for the notifications, and into a fake_supabase
+client that serves the caches' history fetches. Checks that:
+  - an entry synced while the feed is up is used without a round trip
+  - an insert for a user reaches both caches and the next lookup fetches it
+  - inserts for other users leave the entry alone
+  - notifications that arrive while the event loop is busy, as in an idle
+    pool worker, are handled before the entry is trusted
+  - after the feed's connection is killed nothing is trusted until it has
+    reconnected
+Prints insert-to-notification latency and exits 1 if any check fails.
+Usage (from the pipecat directory):
+    python -m benchmarks.change_feed [--inserts 50]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import psycopg2
+
+from benchmarks.fake_supabase import FakeAsyncClient
+from context_cache import ContextCache, MemoryContextBackend
+from todo_turns_feed import TodoTurnsFeed
+
+USER = "feed-bench-user"
+OTHER_USER = "feed-bench-other"
+OLDEST = datetime.now(timezone.utc) - timedelta(days=14)
+
+
+class Turns:
+    """Writes each turn to Postgres and to the fake client the caches read."""
+
+    def __init__(self, db_url: str, client: FakeAsyncClient):
+        self.conn = psycopg2.connect(db_url)
+        self.client = client
+        self.at = datetime.now(timezone.utc) - timedelta(hours=1)
+        self.count = 0
+
+    def add(self, user_id: str) -> str:
+        self.at += timedelta(seconds=1)
+        self.count += 1
+        row = {
+            "timestamp": self.at.isoformat(),
+            "user_id": user_id,
+            "conversation_id": "feed-bench",
+            "role": "user",
+            "content": f"feed bench turn {self.count}",
+        }
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO todo_turns (timestamp, user_id, conversation_id, role, content)"
+                " VALUES (%(timestamp)s, %(user_id)s, %(conversation_id)s, %(role)s, %(content)s);",
+                row,
+            )
+        self.conn.commit()
+        self.client.seed([row])
+        return row["content"]
+
+    def cleanup(self):
+        with self.conn.cursor() as cur:
+            for table in ("todo_turns", "conversations"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE user_id IN (%s, %s);", (USER, OTHER_USER)
+                )
+        self.conn.commit()
+        self.conn.close()
+
+
+async def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.001)
+    return True
+
+
+async def lookup(cache: ContextCache, client: FakeAsyncClient):
+    """History text and the round trips it took."""
+    before = client.round_trips
+    text = await cache.get_history(client, USER, oldest=OLDEST)
+    return text, client.round_trips - before
+
+
+async def run(args) -> int:
+    db_url = os.getenv("SUPABASE_DB_URL")
+    if not db_url:
+        print("SUPABASE_DB_URL is not set")
+        return 1
+    client = FakeAsyncClient()
+    turns = Turns(db_url, client)
+    caches = [ContextCache(MemoryContextBackend(1 << 26)) for _ in range(2)]
+    feeds = [TodoTurnsFeed(db_url, cache, max_backoff=1.0) for cache in caches]
+    cache = caches[0]
+    results = []
+
+    def check(name: str, ok: bool, detail=""):
+        results.append(ok)
+        print(f"{name:<28} {'ok' if ok else 'FAIL':<5} {detail}")
+
+    try:
+        turns.add(USER)
+        for feed in feeds:
+            feed.start()
+        if not await wait_for(lambda: all(c.stats()["feed_connected"] for c in caches)):
+            check("feed connects", False)
+            return 1
+
+        await lookup(cache, client)
+        _, round_trips = await lookup(cache, client)
+        check("unchanged entry trusted", round_trips == 0, f"{round_trips} round trips")
+
+        latencies: List[float] = []
+        fetched = True
+        for _ in range(args.inserts):
+            seen = [c.notifications for c in caches]
+            started = time.perf_counter()
+            content = turns.add(USER)
+            if not await wait_for(
+                lambda: all(c.notifications > n for c, n in zip(caches, seen))
+            ):
+                break
+            latencies.append(time.perf_counter() - started)
+            text, round_trips = await lookup(cache, client)
+            fetched &= content in text and round_trips == 1
+        check(
+            "inserts reach every cache",
+            len(latencies) == args.inserts,
+            f"{len(latencies)}/{args.inserts} notified",
+        )
+        check("new turns fetched", fetched)
+
+        seen = cache.notifications
+        turns.add(OTHER_USER)
+        await wait_for(lambda: cache.notifications > seen)
+        _, round_trips = await lookup(cache, client)
+        check("other users ignored", round_trips == 0, f"{round_trips} round trips")
+
+        # the loop is blocked, so the feed task cannot read the notification
+        content = turns.add(USER)
+        time.sleep(0.2)
+        text, round_trips = await lookup(cache, client)
+        check("busy loop drained", content in text and round_trips == 1)
+
+        connects = feeds[0].connects
+        with turns.conn.cursor() as cur:
+            cur.execute(
+                "SELECT pg_terminate_backend(pid) FROM pg_stat_activity"
+                " WHERE query LIKE 'LISTEN todo_turns_insert%' AND pid <> pg_backend_pid();"
+            )
+        turns.conn.commit()
+        await wait_for(lambda: not cache.stats()["feed_connected"], timeout=2.0)
+        _, round_trips = await lookup(cache, client)
+        check("disconnected: verified", round_trips == 1, f"{round_trips} round trips")
+        reconnected = await wait_for(lambda: feeds[0].connects > connects, timeout=10.0)
+        await lookup(cache, client)
+        _, round_trips = await lookup(cache, client)
+        check("reconnected: trusted again", reconnected and round_trips == 0)
+    finally:
+        for feed in feeds:
+            await feed.close()
+        turns.cleanup()
+
+    if latencies:
+        latencies.sort()
+        print(
+            f"insert to notification: p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"max {latencies[-1] * 1000:.1f} ms over {len(latencies)} inserts"
+        )
+    print(f"cache stats: {cache.stats()}")
+    return 0 if all(results) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the todo_turns change feed")
+    parser.add_argument("--inserts", type=int, default=50, help="Inserts to time")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Time to the first processed audio frame in a cold vs a prewarmed instance.
+
+Copies the files the Dockerfile copies into a temporary app directory and
+starts `python warmup.py --self-check` there in a fresh interpreter, timing
+from process start until the first audio frame has been through the Silero
+VAD and reached the LLM:
+  cold        the app as the image had it before warm-up: installed
+              packages compiled by pip, the app itself not compiled and no
+              cached VAD model
+  prewarmed   after the image's warm-up step (`python warmup.py`) has run in
+              the app directory; like the image build, this also compiles
+              this environment's site-packages
+  no_bytecode (with --no-bytecode) nothing compiled at all, not even the
+              standard library, as when an image is built with pip
+              --no-compile
+Runs alternate between the variants so drift affects them equally. All runs
+read files from the OS page cache, so disk reads a real cold container does
+are not included.
+Usage (from the pipecat directory):
+    python -m benchmarks.cold_start [--runs 5] [--frames 50] [--no-bytecode]
+        [--output report.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+PIPECAT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def image_files() -> List[str]:
+    """Sources of the Dockerfile's COPY lines that make up the app."""
+    files = []
+    with open(os.path.join(PIPECAT_DIR, "Dockerfile")) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[0] == "COPY" and parts[1] != "./requirements.txt":
+                files.append(os.path.normpath(parts[1]))
+    return files
+
+
+def copy_app(dest: str):
+    for name in image_files():
+        source = os.path.join(PIPECAT_DIR, name)
+        if os.path.isdir(source):
+            shutil.copytree(
+                source, os.path.join(dest, name), ignore=shutil.ignore_patterns("__pycache__")
+            )
+        else:
+            shutil.copy2(source, os.path.join(dest, name))
+
+
+def child_env(app_dir: str, vad_cache: str, extra: Dict[str, str]) -> Dict[str, str]:
+    env = {
+        **os.environ,
+        "PYTHONPATH": app_dir,
+        "SILERO_VAD_CACHE": vad_cache,
+        # nothing the self-check does should write to the app directory
+        "TRANSCRIPT_WAL_DIR": "",
+        "SESSION_TRACE_LOG": "",
+    }
+    env.pop("PYTHONPYCACHEPREFIX", None)
+    env.update(extra)
+    return env
+
+
+def first_frame(app_dir: str, env: Dict[str, str], frames: int) -> Dict[str, float]:
+    """Run one self-check; seconds from process start to its first audio frame."""
+    started = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, "warmup.py", "--self-check", "--frames", str(frames)],
+        cwd=app_dir,
+        env={**env, "PYTHONDONTWRITEBYTECODE": "1"},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    result = {}
+    for line in child.stdout:
+        if line.strip() == "first_audio_frame":
+            result["first_audio_frame_s"] = time.perf_counter() - started
+        elif line.startswith("{"):
+            timings = json.loads(line)
+            result.update(imports_s=timings["imports_s"], vad_load_s=timings["vad_load_s"])
+    if child.wait() != 0 or "first_audio_frame_s" not in result:
+        raise RuntimeError(f"self-check failed in {app_dir} (exit {child.returncode})")
+    return result
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        metric: {
+            "median_ms": round(statistics.median(run[metric] for run in runs) * 1000, 1),
+            "min_ms": round(min(run[metric] for run in runs) * 1000, 1),
+            "max_ms": round(max(run[metric] for run in runs) * 1000, 1),
+        }
+        for metric in ("first_audio_frame_s", "imports_s", "vad_load_s")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs prewarmed time to first audio frame")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per variant")
+    parser.add_argument("--frames", type=int, default=50, help="Audio frames per self-check")
+    parser.add_argument(
+        "--no-bytecode", action="store_true", help="Also time an instance with no bytecode at all"
+    )
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cold_dir = os.path.join(tmp, "cold")
+        warm_dir = os.path.join(tmp, "prewarmed")
+        for app_dir in (cold_dir, warm_dir):
+            os.makedirs(app_dir)
+            copy_app(app_dir)
+        variants = {
+            "cold": (cold_dir, child_env(cold_dir, os.path.join(tmp, "missing.ort"), {})),
+            "prewarmed": (
+                warm_dir,
+                child_env(warm_dir, os.path.join(warm_dir, "vad-cache", "silero_vad.ort"), {}),
+            ),
+        }
+        if args.no_bytecode:
+            empty = os.path.join(tmp, "no-pycache")
+            variants["no_bytecode"] = (
+                cold_dir,
+                child_env(cold_dir, os.path.join(tmp, "missing.ort"), {"PYTHONPYCACHEPREFIX": empty}),
+            )
+
+        print("Running the image warm-up step in the prewarmed app directory...")
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "warmup.py", "--frames", str(args.frames)],
+            cwd=warm_dir,
+            env=variants["prewarmed"][1],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        warmup_s = time.perf_counter() - started
+
+        results: Dict[str, List[Dict[str, float]]] = {name: [] for name in variants}
+        for _ in range(args.runs):
+            for name, (app_dir, env) in variants.items():
+                results[name].append(first_frame(app_dir, env, args.frames))
+
+    report = {
+        "runs": args.runs,
+        "warmup_step_s": round(warmup_s, 1),
+        "variants": {name: summarize(runs) for name, runs in results.items()},
+    }
+    print(f"warm-up step took {warmup_s:.1f} s")
+    print(f"{'variant':<12} {'first frame':>12} {'imports':>10} {'VAD load':>10}   (median ms)")
+    for name, summary in report["variants"].items():
+        print(
+            f"{name:<12} {summary['first_audio_frame_s']['median_ms']:>12.0f} "
+            f"{summary['imports_s']['median_ms']:>10.0f} {summary['vad_load_s']['median_ms']:>10.1f}"
+        )
+    cold = report["variants"]["cold"]["first_audio_frame_s"]["median_ms"]
+    warm = report["variants"]["prewarmed"]["first_audio_frame_s"]["median_ms"]
+    print(f"prewarmed saves {cold - warm:.0f} ms ({(cold - warm) / cold:.0%}) to the first frame")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+In-process stand-in for the Supabase/PostgREST client, backed by SQLite.
+
+Implements the slice of the supabase-py query builder that the bot and the
+supa/utils helpers use, adds a configurable per-request latency, and counts
+round trips so benchmarks can compare access patterns without a network.
+"""
+
+import asyncio
+import sqlite3
+from datetime import datetime
+from typing import Any, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS todo_turns (
+    id integer PRIMARY KEY AUTOINCREMENT,
+    timestamp text NOT NULL,
+    user_id text NOT NULL,
+    conversation_id text NOT NULL,
+    role text NOT NULL,
+    content text NOT NULL,
+    turn_key text
+);
+CREATE UNIQUE INDEX IF NOT EXISTS todo_turns_turn_key_idx ON todo_turns (turn_key, timestamp);
+CREATE TABLE IF NOT EXISTS conversations (
+    user_id text NOT NULL,
+    conversation_id text NOT NULL,
+    first_ts text NOT NULL,
+    last_ts text NOT NULL,
+    turn_count integer NOT NULL DEFAULT 0,
+    byte_count integer NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, conversation_id)
+);
+CREATE TABLE IF NOT EXISTS todos (
+    id integer PRIMARY KEY AUTOINCREMENT,
+    user_id text NOT NULL,
+    title text NOT NULL,
+    list_name text NOT NULL DEFAULT 'todo',
+    status text NOT NULL DEFAULT 'open',
+    due_date text,
+    notes text,
+    created_at text DEFAULT CURRENT_TIMESTAMP,
+    completed_at text
+);
+CREATE TABLE IF NOT EXISTS conversation_summaries (
+    user_id text NOT NULL,
+    conversation_id text NOT NULL,
+    turn_count integer NOT NULL,
+    summary text NOT NULL,
+    model text NOT NULL,
+    created_at text,
+    PRIMARY KEY (user_id, conversation_id)
+);
+CREATE TRIGGER IF NOT EXISTS todo_turns_update_conversations
+AFTER INSERT ON todo_turns
+BEGIN
+    INSERT INTO conversations
+        (user_id, conversation_id, first_ts, last_ts, turn_count, byte_count)
+    VALUES
+        (NEW.user_id, NEW.conversation_id, NEW.timestamp, NEW.timestamp, 1, length(CAST(NEW.content AS blob)))
+    ON CONFLICT (user_id, conversation_id) DO UPDATE SET
+        first_ts = MIN(first_ts, excluded.first_ts),
+        last_ts = MAX(last_ts, excluded.last_ts),
+        turn_count = turn_count + 1,
+        byte_count = byte_count + excluded.byte_count;
+END;
+"""
+
+
+def _sql_value(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class FakeResponse:
+    def __init__(self, data: List[dict]):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeAsyncClient", table: str):
+        self._client = client
+        self._table = table
+        self._where: List[str] = []
+        self._params: List[Any] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+        self._rows: Optional[List[dict]] = None
+        self._insert_verb = "INSERT"
+
+    def select(self, columns: str = "*"):
+        return self
+
+    def _filter(self, column: str, op: str, value: Any):
+        self._where.append(f'"{column}" {op} ?')
+        self._params.append(_sql_value(value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "=", value)
+
+    def gt(self, column, value):
+        return self._filter(column, ">", value)
+
+    def gte(self, column, value):
+        return self._filter(column, ">=", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "<", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "<=", value)
+
+    def in_(self, column, values):
+        values = list(values)
+        placeholders = ", ".join("?" for _ in values) or "NULL"
+        self._where.append(f'"{column}" IN ({placeholders})')
+        self._params.extend(_sql_value(v) for v in values)
+        return self
+
+    def order(self, column, desc: bool = False, nullsfirst: Optional[bool] = None):
+        nulls = "" if nullsfirst is None else (" NULLS FIRST" if nullsfirst else " NULLS LAST")
+        self._order.append(f'"{column}" {"DESC" if desc else "ASC"}{nulls}')
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def insert(self, rows):
+        self._rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict: str = "", ignore_duplicates: bool = False):
+        self._insert_verb = "INSERT OR IGNORE" if ignore_duplicates else "INSERT OR REPLACE"
+        return self.insert(rows)
+
+    def _select_sql(self):
+        sql = f"SELECT * FROM {self._table}"
+        if self._where:
+            sql += " WHERE " + " AND ".join(self._where)
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit}"
+            if self._offset:
+                sql += f" OFFSET {self._offset}"
+        return sql
+
+    async def execute(self):
+        self._client.round_trips += 1
+        if self._client.latency:
+            await asyncio.sleep(self._client.latency)
+        conn = self._client.conn
+        if self._rows is not None:
+            for row in self._rows:
+                columns = ", ".join(f'"{c}"' for c in row)
+                placeholders = ", ".join("?" for _ in row)
+                conn.execute(
+                    f"{self._insert_verb} INTO {self._table} ({columns}) VALUES ({placeholders})",
+                    [_sql_value(v) for v in row.values()],
+                )
+            conn.commit()
+            return FakeResponse(self._rows)
+        cursor = conn.execute(self._select_sql(), self._params)
+        columns = [c[0] for c in cursor.description]
+        return FakeResponse([dict(zip(columns, row)) for row in cursor.fetchall()])
+
+
+class FakeAsyncClient:
+    """Minimal AsyncClient look-alike: ``client.from_(table)...execute()``."""
+
+    def __init__(self, latency: float = 0.0, path: str = ":memory:"):
+        self.latency = latency
+        self.round_trips = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def from_(self, table: str) -> FakeQuery:
+        return FakeQuery(self, table)
+
+    table = from_
+
+    def seed(self, rows: List[dict]):
+        self.conn.executemany(
+            "INSERT INTO todo_turns (timestamp, user_id, conversation_id, role, content)"
+            " VALUES (:timestamp, :user_id, :conversation_id, :role, :content)",
+            rows,
+        )
+        self.conn.commit()
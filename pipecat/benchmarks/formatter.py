@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for formatting the recent-conversations block.
+
+Compares the original string-concatenation formatter (isoparse and
+format_datetime per conversation) with the streaming iter_formatted_history
+for histories of 10 to 100k turns, reporting wall time and peak memory.
+"joined" assembles the whole block like fetch_and_format; "consumed"
+writes chunks out as they arrive like fetch_todo_turn.py.
+Usage (from the pipecat directory):
+    python -m benchmarks.formatter [--sizes 10 100 1000 10000 100000]
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from babel.dates import format_datetime
+from dateutil.parser import isoparse
+
+from supa.utils.supabase_helpers import iter_formatted_history
+
+TURNS_PER_CONVERSATION = 20
+
+
+def make_turns(count: int):
+    start = datetime.now(timezone.utc) - timedelta(days=13)
+    turns = []
+    for i in range(count):
+        conversation = i // TURNS_PER_CONVERSATION
+        turns.append(
+            {
+                "timestamp": (start + timedelta(minutes=conversation * 30, seconds=i)).isoformat(),
+                "user_id": "bench_user",
+                "conversation_id": f"conversation-{conversation:06d}",
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"Remind me to water the plants on day {i}. " * 3,
+            }
+        )
+    return turns
+
+
+def concatenating_formatter(turns):
+    grouped = {}
+    for turn in turns:
+        grouped.setdefault(turn["conversation_id"], []).append(turn)
+    text_block = ""
+    for conversation_turns in grouped.values():
+        dt = isoparse(conversation_turns[0]["timestamp"]).astimezone()
+        conversation_start_human = format_datetime(
+            dt, "EEEE MMMM d, yyyy hh:mm:ss", locale="en_US"
+        )
+        text_block += f"---- Conversation: {conversation_start_human} ---\n\n"
+        for turn in conversation_turns:
+            text_block += f"{turn['role']}: {turn['content']}\n\n"
+        text_block += "\n"
+    return text_block
+
+
+async def _rows(turns):
+    for turn in turns:
+        yield turn
+
+
+async def streaming_formatter(turns):
+    return "".join([chunk async for chunk in iter_formatted_history(_rows(turns))])
+
+
+async def streaming_consumer(turns):
+    # what fetch_todo_turn.py does: write each chunk out and drop it
+    size = 0
+    async for chunk in iter_formatted_history(_rows(turns)):
+        size += len(chunk)
+    return size
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark history formatting")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(
+        f"{'turns':>8} {'concat ms':>10} {'concat MiB':>11} {'joined ms':>10}"
+        f" {'joined MiB':>11} {'consumed ms':>12} {'consumed MiB':>13}"
+    )
+    for size in args.sizes:
+        turns = make_turns(size)
+        old, old_time, old_peak = measure(lambda: concatenating_formatter(turns))
+        new, new_time, new_peak = measure(lambda: asyncio.run(streaming_formatter(turns)))
+        _, streamed_time, streamed_peak = measure(
+            lambda: asyncio.run(streaming_consumer(turns))
+        )
+        if old != new:
+            raise SystemExit(f"formatters disagree at {size} turns")
+        print(
+            f"{size:8d} {old_time * 1000:10.1f} {old_peak / 2**20:11.2f}"
+            f" {new_time * 1000:10.1f} {new_peak / 2**20:11.2f}"
+            f" {streamed_time * 1000:12.1f} {streamed_peak / 2**20:13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
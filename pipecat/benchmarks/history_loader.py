@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Compare the per-conversation history loop with the batched loader.
+
+Runs both access patterns against the SQLite PostgREST stand-in with a
+simulated round-trip latency and reports round trips and wall time.
+Usage (from the pipecat directory):
+    python -m benchmarks.history_loader [--conversations 40] [--turns 30] [--latency-ms 40]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.fake_supabase import FakeAsyncClient
+from supa.utils.supabase_helpers import (
+    fetch_conversation_turns,
+    fetch_conversations,
+    fetch_user_history,
+)
+
+USER_ID = "bench_user"
+
+
+def make_rows(conversations: int, turns: int):
+    rows = []
+    start = datetime.now(timezone.utc) - timedelta(days=13)
+    for c in range(conversations):
+        conv_start = start + timedelta(hours=7 * c)
+        conversation_id = conv_start.strftime("%Y-%m-%d_%H-%M-%S")
+        for t in range(turns):
+            rows.append(
+                {
+                    "timestamp": (conv_start + timedelta(seconds=10 * t)).isoformat(),
+                    "user_id": USER_ID,
+                    "conversation_id": conversation_id,
+                    "role": "user" if t % 2 == 0 else "assistant",
+                    "content": f"turn {t} of conversation {c}",
+                }
+            )
+    return rows
+
+
+async def per_conversation_loop(client, oldest):
+    conversations = await fetch_conversations(client, USER_ID, oldest=oldest)
+    return [
+        (c["conversation_id"], await fetch_conversation_turns(client, USER_ID, c["conversation_id"]))
+        for c in reversed(conversations)
+    ]
+
+
+async def batched_loader(client, oldest):
+    return await fetch_user_history(client, USER_ID, oldest=oldest)
+
+
+async def run(args):
+    rows = make_rows(args.conversations, args.turns)
+    oldest = datetime.now(timezone.utc) - timedelta(weeks=2)
+    results = {}
+    for name, loader in (
+        ("per-conversation loop", per_conversation_loop),
+        ("batched loader", batched_loader),
+    ):
+        client = FakeAsyncClient(latency=args.latency_ms / 1000)
+        client.seed(rows)
+        started = time.perf_counter()
+        history = await loader(client, oldest)
+        elapsed = time.perf_counter() - started
+        results[name] = history
+        print(
+            f"{name:>22}: {client.round_trips:4d} round trips, "
+            f"{elapsed * 1000:8.1f} ms, {sum(len(t) for _, t in history)} turns"
+        )
+    if results["per-conversation loop"] != results["batched loader"]:
+        raise SystemExit("loaders returned different histories")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark history loading")
+    parser.add_argument("--conversations", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=30, help="Turns per conversation")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Simulated round-trip latency")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
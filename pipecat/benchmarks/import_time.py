@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Check module import time against a budget using `python -X importtime`.
+
+Each target in the budget file (default benchmarks/import_budget.json) is
+imported in a fresh interpreter `runs` times; the median total import time
+must stay within the target's budget_ms, and none of its `deferred` modules
+may be imported at load time. Prints the slowest direct imports of each
+target and exits 1 if any budget is exceeded.
+
+Budgets are about 1.2x the slowest median measured on a development
+machine, tight enough that a regression of a few hundred ms fails. On a
+slower machine pass --scale; on shared CI runners, where timing is noisier
+still, use --deferred-only: it imports each target once and checks only
+the `deferred` lists, which is deterministic.
+Usage (from the pipecat directory):
+    python -m benchmarks.import_time [--budget FILE] [--runs N] [--scale 1.5]
+        [--top 8] [--deferred-only] [target ...]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+PIPECAT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(PIPECAT_DIR, "benchmarks", "import_budget.json")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[int, int, str]]:
+    """(depth, cumulative microseconds, module) for every -X importtime line."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, int(cumulative), name.strip()))
+    return entries
+
+
+def profile(module: str, cwd: str) -> List[Tuple[int, int, str]]:
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    # importing bot builds genai clients lazily, but some modules read the key at import
+    env.setdefault("GOOGLE_API_KEY", "import-time")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.join(PIPECAT_DIR, cwd),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def check_target(
+    name: str, target: Dict, runs: int, scale: float, top: int, timed: bool = True
+) -> List[str]:
+    totals = []
+    for _ in range(runs):
+        entries = profile(name, target.get("cwd", "."))
+        totals.append(sum(cumulative for depth, cumulative, _ in entries if depth == 0) / 1000)
+    total_ms = statistics.median(totals)
+    budget_ms = target["budget_ms"] * scale
+    imported = {module for _, _, module in entries}
+
+    problems = []
+    if timed and total_ms > budget_ms:
+        problems.append(f"{total_ms:.0f} ms exceeds the {budget_ms:.0f} ms budget")
+    for module in target.get("deferred", []):
+        if module in imported:
+            problems.append(f"{module} is imported at load time")
+
+    print(
+        f"{name:<22} {total_ms:8.0f} ms  budget {budget_ms:6.0f} ms  "
+        f"{'FAIL' if problems else 'ok'}"
+    )
+    # the last run's direct imports of the target, slowest first
+    direct = sorted(
+        ((cumulative, module) for depth, cumulative, module in entries if depth == 1),
+        reverse=True,
+    )
+    for cumulative, module in direct[:top]:
+        print(f"    {cumulative / 1000:8.1f} ms  {module}")
+    for problem in problems:
+        print(f"    FAIL: {problem}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import time against a budget")
+    parser.add_argument("targets", nargs="*", help="Targets to check (default: all)")
+    parser.add_argument("--budget", default=DEFAULT_BUDGET, help="Budget file")
+    parser.add_argument("--runs", type=int, help="Imports per target; the median counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply budgets, for slower machines")
+    parser.add_argument("--top", type=int, default=8, help="Slowest direct imports to list")
+    parser.add_argument(
+        "--deferred-only",
+        action="store_true",
+        help="Import each target once and check only its deferred modules",
+    )
+    args = parser.parse_args()
+
+    with open(args.budget) as f:
+        config = json.load(f)
+    targets = config["targets"]
+    unknown = [name for name in args.targets if name not in targets]
+    if unknown:
+        parser.error(f"Not in {args.budget}: {', '.join(unknown)}")
+
+    runs = 1 if args.deferred_only else args.runs or config.get("runs", 3)
+    failed = []
+    for name in args.targets or targets:
+        if check_target(
+            name, targets[name], runs, args.scale, args.top, timed=not args.deferred_only
+        ):
+            failed.append(name)
+    if failed:
+        print(f"Import budget exceeded: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Load test: run many simulated bot sessions concurrently through bot.main.
+
+Daily, Gemini Live and Supabase are replaced by local fakes. The fake
+transport streams 20 ms input audio frames and the fake Gemini Live service
+produces user transcriptions and spoken, word-by-word assistant replies with
+output audio at conversational rates, so the real pipeline, transcript
+handler, turn writer and history loading run under load. Supabase is the
+SQLite stand-in from fake_supabase.py with a simulated round-trip latency.
+
+The report has event-loop lag, process RSS per session, transcript insert
+throughput and startup latency percentiles, and is written as JSON so runs
+from different releases can be compared with --compare.
+Usage (from the pipecat directory):
+    python -m benchmarks.load_test [--sessions 20] [--duration 60] [--ramp 10]
+        [--turn-interval 6] [--supabase-ms 30] [--report load-report.json]
+        [--compare baseline.json] [--tolerance 0.1]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from importlib import metadata
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from benchmarks.fake_supabase import FakeAsyncClient
+
+REPORT_VERSION = 1
+INPUT_SAMPLE_RATE = 16000
+OUTPUT_SAMPLE_RATE = 24000
+AUDIO_FRAME_SECONDS = 0.02
+WORDS = (
+    "remind me to buy milk and call the dentist tomorrow morning before work "
+    "then add a note about the project review on friday with the design team"
+).split()
+
+# metric -> True if larger is better; used by --compare
+COMPARED_METRICS = {
+    "startup_ms.p50": False,
+    "startup_ms.p95": False,
+    "startup_ms.p99": False,
+    "loop_lag_ms.p50": False,
+    "loop_lag_ms.p99": False,
+    "loop_lag_ms.max": False,
+    "rss_per_session_mb": False,
+    "inserts.rows_per_second": True,
+    "inserts.persisted_ratio": True,
+    "sessions.failed": False,
+}
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank percentiles, rounded for the report."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 2)
+
+    return {"p50": rank(50), "p95": rank(95), "p99": rank(99), "max": round(ordered[-1], 2)}
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class LoopMonitor:
+    """Samples event-loop lag and process memory at a fixed interval."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lags: List[float] = []
+        self.peak_rss = 0
+        self.peak_active = 0
+        self.rss_at_peak_active = 0
+        self.active = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected) * 1000)
+            rss = rss_bytes()
+            self.peak_rss = max(self.peak_rss, rss)
+            if self.active >= self.peak_active:
+                self.peak_active = self.active
+                self.rss_at_peak_active = max(self.rss_at_peak_active, rss)
+
+
+class SimulatedSession:
+    def __init__(self, index: int, user_id: str):
+        self.index = index
+        self.user_id = user_id
+        self.session_id = f"load-{index}"
+        self.room_url = f"https://load-test.daily.co/session-{index}"
+        self.transport = None
+        self.started = asyncio.Event()
+        self.main_called = 0.0
+        self.start_latency: Optional[float] = None
+        self.turns = 0
+        self.audio_frames_in = 0
+        self.audio_frames_out = 0
+        self.system_instruction_bytes = 0
+        self.error: Optional[str] = None
+
+
+def build_fakes(args, sessions: Dict[str, SimulatedSession]):
+    """Fake transport and Gemini Live classes bound to the running sessions."""
+    from pipecat.adapters.services.gemini_adapter import GeminiLLMAdapter
+    from pipecat.frames.frames import (
+        BotStartedSpeakingFrame,
+        BotStoppedSpeakingFrame,
+        CancelFrame,
+        EndFrame,
+        InputAudioRawFrame,
+        LLMFullResponseEndFrame,
+        LLMFullResponseStartFrame,
+        OutputAudioRawFrame,
+        StartFrame,
+        TranscriptionFrame,
+        TTSAudioRawFrame,
+        TTSTextFrame,
+    )
+    from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+    from pipecat.services.gemini_multimodal_live.gemini import (
+        GeminiMultimodalLiveAssistantContextAggregator,
+        GeminiMultimodalLiveContext,
+        GeminiMultimodalLiveContextAggregatorPair,
+        GeminiMultimodalLiveUserContextAggregator,
+    )
+    from pipecat.services.llm_service import LLMService
+    from pipecat.utils.time import time_now_iso8601
+
+    by_session_id = {session.session_id: session for session in sessions.values()}
+    input_chunk = bytes(int(INPUT_SAMPLE_RATE * AUDIO_FRAME_SECONDS) * 2)
+    output_chunk = bytes(int(OUTPUT_SAMPLE_RATE * AUDIO_FRAME_SECONDS) * 2)
+
+    class FakeInputTransport(FrameProcessor):
+        """Streams silent microphone audio in real time."""
+
+        def __init__(self, session: SimulatedSession):
+            super().__init__()
+            self._session = session
+            self._audio_task = None
+
+        async def process_frame(self, frame, direction):
+            await super().process_frame(frame, direction)
+            await self.push_frame(frame, direction)
+            if isinstance(frame, StartFrame):
+                self._session.start_latency = time.perf_counter() - self._session.main_called
+                self._session.started.set()
+                if args.audio:
+                    self._audio_task = self.create_task(self._stream_audio())
+            elif isinstance(frame, (EndFrame, CancelFrame)) and self._audio_task:
+                await self.cancel_task(self._audio_task)
+                self._audio_task = None
+
+        async def _stream_audio(self):
+            next_frame = time.monotonic()
+            while True:
+                await self.push_frame(
+                    InputAudioRawFrame(
+                        audio=input_chunk, sample_rate=INPUT_SAMPLE_RATE, num_channels=1
+                    )
+                )
+                self._session.audio_frames_in += 1
+                next_frame += AUDIO_FRAME_SECONDS
+                await asyncio.sleep(max(0.0, next_frame - time.monotonic()))
+
+    class FakeOutputTransport(FrameProcessor):
+        def __init__(self, session: SimulatedSession):
+            super().__init__()
+            self._session = session
+
+        async def process_frame(self, frame, direction):
+            await super().process_frame(frame, direction)
+            if isinstance(frame, OutputAudioRawFrame):
+                self._session.audio_frames_out += 1
+            await self.push_frame(frame, direction)
+
+    class FakeDailyTransport:
+        def __init__(self, bot_name, room_url, token, params):
+            self.session = sessions[room_url]
+            self.session.transport = self
+            self._handlers: Dict[str, List] = {}
+            self._input = FakeInputTransport(self.session)
+            self._output = FakeOutputTransport(self.session)
+
+        def input(self):
+            return self._input
+
+        def output(self):
+            return self._output
+
+        def event_handler(self, name):
+            def decorator(handler):
+                self._handlers.setdefault(name, []).append(handler)
+                return handler
+
+            return decorator
+
+        async def fire(self, name, *args):
+            for handler in self._handlers.get(name, []):
+                await handler(self, *args)
+
+    class FakeGeminiLive(LLMService):
+        """Talks like Gemini Live: user transcriptions upstream, spoken replies downstream."""
+
+        adapter_class = GeminiLLMAdapter
+
+        def __init__(self, *, system_instruction="", **kwargs):
+            super().__init__()
+            self._system_instruction = system_instruction
+            self._session: Optional[SimulatedSession] = None
+            self._conversation = None
+
+        def create_context_aggregator(self, context, **kwargs):
+            context.set_llm_adapter(self.get_llm_adapter())
+            GeminiMultimodalLiveContext.upgrade(context)
+            return GeminiMultimodalLiveContextAggregatorPair(
+                _user=GeminiMultimodalLiveUserContextAggregator(context),
+                _assistant=GeminiMultimodalLiveAssistantContextAggregator(context),
+            )
+
+        async def process_frame(self, frame, direction):
+            await super().process_frame(frame, direction)
+            if isinstance(frame, InputAudioRawFrame):
+                return  # sent to Gemini, not down the pipeline
+            await self.push_frame(frame, direction)
+            if isinstance(frame, StartFrame):
+                self._conversation = self.create_task(self._converse())
+            elif isinstance(frame, (EndFrame, CancelFrame)) and self._conversation:
+                await self.cancel_task(self._conversation)
+                self._conversation = None
+
+        async def _converse(self):
+            rng = random.Random(self._session.index)
+            while True:
+                await asyncio.sleep(args.turn_interval * rng.uniform(0.5, 1.5))
+                words = rng.sample(WORDS, rng.randint(4, 12))
+                await self.push_frame(
+                    TranscriptionFrame(
+                        text=" ".join(words),
+                        user_id=self._session.user_id,
+                        timestamp=time_now_iso8601(),
+                    ),
+                    FrameDirection.UPSTREAM,
+                )
+                self._session.turns += 1
+
+                await asyncio.sleep(args.response_delay)
+                await self.push_frame(BotStartedSpeakingFrame())
+                await self.push_frame(LLMFullResponseStartFrame())
+                for word in rng.choices(WORDS, k=rng.randint(8, 30)):
+                    await self.push_frame(TTSTextFrame(text=word))
+                    for _ in range(round(args.seconds_per_word / AUDIO_FRAME_SECONDS)):
+                        if args.audio:
+                            await self.push_frame(
+                                TTSAudioRawFrame(
+                                    audio=output_chunk,
+                                    sample_rate=OUTPUT_SAMPLE_RATE,
+                                    num_channels=1,
+                                )
+                            )
+                        await asyncio.sleep(AUDIO_FRAME_SECONDS)
+                await self.push_frame(LLMFullResponseEndFrame())
+                await self.push_frame(BotStoppedSpeakingFrame())
+                self._session.turns += 1
+
+    class FakeGeminiLiveTodo:
+        """The real GeminiLiveTodo, including history loading, on the fake service."""
+
+        def __init__(self, supabase, user_id, *a, **kw):
+            import gemini_live
+
+            self._todo = gemini_live.GeminiLiveTodo(supabase, user_id, *a, **kw)
+            self._session = by_session_id[kw["trace"].session_id]
+
+        async def llm(self):
+            llm = await self._todo.llm()
+            llm._session = self._session
+            self._session.system_instruction_bytes = len(llm._system_instruction.encode("utf-8"))
+            return llm
+
+    class FakeVAD:
+        pass
+
+    class FakeClientRegistry:
+        def __init__(self, client):
+            self._client = client
+
+        async def supabase(self, url, key, access_token=None):
+            return self._client
+
+    return FakeDailyTransport, FakeGeminiLive, FakeGeminiLiveTodo, FakeVAD, FakeClientRegistry
+
+
+def seed_history(client: FakeAsyncClient, users: List[str], conversations: int, turns: int):
+    rows = []
+    start = datetime.now(timezone.utc) - timedelta(days=12)
+    for user_id in users:
+        for c in range(conversations):
+            conv_start = start + timedelta(hours=11 * c)
+            conversation_id = conv_start.strftime("%Y-%m-%d_%H-%M-%S")
+            for t in range(turns):
+                rows.append(
+                    {
+                        "timestamp": (conv_start + timedelta(seconds=8 * t)).isoformat(),
+                        "user_id": user_id,
+                        "conversation_id": conversation_id,
+                        "role": "user" if t % 2 == 0 else "assistant",
+                        "content": " ".join(WORDS[(t + c) % 10 : (t + c) % 10 + 12]),
+                    }
+                )
+    client.seed(rows)
+
+
+async def run_session(bot, session: SimulatedSession, args, monitor: LoopMonitor):
+    from pipecatcloud.agent import DailySessionArguments
+
+    session_args = DailySessionArguments(
+        room_url=session.room_url,
+        token="",
+        session_id=session.session_id,
+        body={"user_id": session.user_id},
+    )
+    session.main_called = time.perf_counter()
+    main = asyncio.create_task(bot.main(session_args))
+    try:
+        await asyncio.wait_for(session.started.wait(), args.startup_timeout)
+        monitor.active += 1
+        try:
+            await session.transport.fire("on_client_connected", {"id": session.index})
+            await asyncio.sleep(args.duration)
+            # like Daily, the event arrives outside the pipeline's own tasks
+            await session.transport.fire("on_client_disconnected", {"id": session.index})
+        finally:
+            monitor.active -= 1
+        await asyncio.wait_for(main, args.shutdown_timeout)
+    except Exception as e:
+        session.error = f"{type(e).__name__}: {e}"
+        main.cancel()
+        await asyncio.gather(main, return_exceptions=True)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run(args) -> Dict:
+    import bot
+
+    logger.remove()
+    logger.add(args.log_file, level=args.log_level)
+
+    client = FakeAsyncClient(latency=args.supabase_ms / 1000)
+    users = [f"load-user-{i}" for i in range(min(args.users or args.sessions, args.sessions))]
+    seed_history(client, users, args.history_conversations, args.history_turns)
+    sessions = {}
+    for i in range(args.sessions):
+        session = SimulatedSession(i, users[i % len(users)])
+        sessions[session.room_url] = session
+
+    transport, service, todo, vad, registry = build_fakes(args, sessions)
+    import gemini_live
+
+    gemini_live.GeminiMultimodalLiveLLMService = service
+    bot.DailyTransport = transport
+    bot.DailyParams = dict
+    bot.load_vad_analyzer = vad
+    bot.GeminiLiveTodo = todo
+    fake_registry = registry(client)
+    bot.get_client_registry = lambda: fake_registry
+
+    monitor = LoopMonitor()
+    monitor_task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.5)
+    baseline_rss = rss_bytes()
+    if args.tracemalloc:
+        tracemalloc.start()
+    round_trips_before = client.round_trips
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _delayed(args.ramp * i / max(1, args.sessions - 1), run_session(bot, session, args, monitor))
+            for i, session in enumerate(sessions.values())
+        )
+    )
+    elapsed = time.perf_counter() - started
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    if args.tracemalloc:
+        tracemalloc.stop()
+    monitor_task.cancel()
+    await asyncio.gather(monitor_task, return_exceptions=True)
+
+    all_sessions = list(sessions.values())
+    rows = client.conn.execute(
+        "SELECT COUNT(*) FROM todo_turns WHERE turn_key IS NOT NULL"
+    ).fetchone()[0]
+    turns = sum(s.turns for s in all_sessions)
+    failed = [s for s in all_sessions if s.error]
+    peak_active = max(1, monitor.peak_active)
+    return {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "pipecat": metadata.version("pipecat-ai"),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("report", "compare", "log_file")
+        },
+        "results": {
+            "elapsed_s": round(elapsed, 2),
+            "sessions": {
+                "started": sum(1 for s in all_sessions if s.started.is_set()),
+                "failed": len(failed),
+                "peak_concurrent": monitor.peak_active,
+                "errors": sorted({s.error for s in failed})[:10],
+            },
+            "startup_ms": percentiles(
+                [s.start_latency * 1000 for s in all_sessions if s.started.is_set()]
+            ),
+            "loop_lag_ms": percentiles(monitor.lags),
+            "rss_baseline_mb": round(baseline_rss / 2**20, 1),
+            "rss_peak_mb": round(monitor.peak_rss / 2**20, 1),
+            "rss_per_session_mb": round(
+                (monitor.rss_at_peak_active - baseline_rss) / peak_active / 2**20, 2
+            ),
+            "traced_peak_per_session_kb": (
+                round(traced_peak / peak_active / 1024, 1) if traced_peak else None
+            ),
+            "inserts": {
+                "turns_spoken": turns,
+                "rows_persisted": rows,
+                "persisted_ratio": round(rows / turns, 4) if turns else None,
+                "rows_per_second": round(rows / elapsed, 2),
+                "supabase_requests": client.round_trips - round_trips_before,
+            },
+            "audio_frames": {
+                "in": sum(s.audio_frames_in for s in all_sessions),
+                "out": sum(s.audio_frames_out for s in all_sessions),
+            },
+            "system_instruction_kb": round(
+                max(s.system_instruction_bytes for s in all_sessions) / 1024, 1
+            ),
+        },
+    }
+
+
+async def _delayed(delay: float, coro):
+    await asyncio.sleep(delay)
+    return await coro
+
+
+def lookup(results: Dict, metric: str):
+    value = results
+    for part in metric.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print metric changes against a baseline report; return regressions."""
+    regressions = []
+    print(f"{'metric':<28} {'baseline':>12} {'current':>12} {'change':>9}")
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        old = lookup(baseline["results"], metric)
+        new = lookup(report["results"], metric)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance and not (old == 0 and new == 0):
+            flag = "  REGRESSION"
+            regressions.append(metric)
+        print(f"{metric:<28} {old:>12} {new:>12} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test bot.main with simulated sessions")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--users", type=int, help="Distinct users (default: one per session)")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds each session stays connected")
+    parser.add_argument("--ramp", type=float, default=10, help="Seconds over which sessions start")
+    parser.add_argument("--turn-interval", type=float, default=6, help="Mean seconds between user turns")
+    parser.add_argument("--response-delay", type=float, default=0.8)
+    parser.add_argument("--seconds-per-word", type=float, default=0.4)
+    parser.add_argument("--no-audio", dest="audio", action="store_false", help="Don't stream audio frames")
+    parser.add_argument("--supabase-ms", type=float, default=30, help="Simulated Supabase round trip")
+    parser.add_argument("--history-conversations", type=int, default=8)
+    parser.add_argument("--history-turns", type=int, default=30)
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--shutdown-timeout", type=float, default=30)
+    parser.add_argument("--tracemalloc", action="store_true", help="Also trace Python heap (slow)")
+    parser.add_argument("--log-level", default="DEBUG")
+    parser.add_argument("--log-file", default=os.devnull, help="Bot log output (default: discarded)")
+    parser.add_argument("--report", default="load-report.json")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    # before bot is imported; these are read at import time
+    wal_dir = tempfile.mkdtemp(prefix="load-test-wal-")
+    os.environ["TRANSCRIPT_WAL_DIR"] = wal_dir
+    os.environ["SESSION_TRACE_LOG"] = ""
+    os.environ["HISTORY_TOKEN_BUDGET"] = "0"  # no summary calls to Gemini
+    os.environ.setdefault("GOOGLE_API_KEY", "load-test")
+
+    try:
+        report = asyncio.run(run(args))
+        # turns the writers could not deliver are still in the WAL
+        report["results"]["inserts"]["wal_files_left"] = len(
+            [name for name in os.listdir(wal_dir) if name.endswith(".sqlite3")]
+        )
+    finally:
+        shutil.rmtree(wal_dir, ignore_errors=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Report written to {args.report}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        ignored = ("tolerance", "log_level")
+        changed = [
+            key
+            for key, value in report["config"].items()
+            if key not in ignored and baseline.get("config", {}).get(key) != value
+        ]
+        if changed:
+            print(f"Note: run configuration differs from the baseline in {', '.join(changed)}")
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
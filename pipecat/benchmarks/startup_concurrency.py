@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Measure the critical path of bot startup with mocked services.
+
+Replaces the Supabase client, Silero VAD model, Daily transport and Gemini
+Live setup in bot.py with fakes that take configurable time, then compares
+the original sequential startup order with bot.start_services.
+Usage (from the pipecat directory):
+    python -m benchmarks.startup_concurrency [--supabase-ms 120] [--history-ms 350]
+        [--vad-ms 400] [--llm-ms 150] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from pipecatcloud.agent import DailySessionArguments
+
+import bot
+from session_trace import SessionTrace
+
+
+def install_fakes(args):
+    class FakeClientRegistry:
+        async def supabase(self, url, key, access_token=None):
+            await asyncio.sleep(args.supabase_ms / 1000)
+            return object()
+
+    class FakeVAD:
+        def __init__(self):
+            # model load is CPU-bound, so block the calling thread
+            time.sleep(args.vad_ms / 1000)
+
+    class FakeTransport:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+    class FakeGeminiLiveTodo:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def llm(self):
+            await asyncio.sleep(args.history_ms / 1000)  # history fetch
+            time.sleep(args.llm_ms / 1000)  # service construction
+            return object()
+
+    registry = FakeClientRegistry()
+    bot.get_client_registry = lambda: registry
+    bot.load_vad_analyzer = FakeVAD
+    bot.DailyTransport = FakeTransport
+    bot.DailyParams = dict
+    bot.GeminiLiveTodo = FakeGeminiLiveTodo
+
+
+async def sequential_startup(session_args, messages, trace):
+    """The startup order bot.main used before start_services."""
+    supabase = await bot.get_client_registry().supabase(bot.SUPABASE_URL, bot.SUPABASE_KEY)
+    transport = bot.DailyTransport(
+        bot_name="todo helper",
+        room_url=session_args.room_url,
+        token=session_args.token,
+        params=bot.DailyParams(
+            audio_in_enabled=True,
+            audio_out_enabled=True,
+            vad_analyzer=bot.load_vad_analyzer(),
+        ),
+    )
+    llm = await bot.GeminiLiveTodo(supabase, "bench_user", "", messages=messages).llm()
+    return supabase, llm, transport
+
+
+async def concurrent_startup(session_args, messages, trace):
+    return await bot.start_services(session_args, "bench_user", messages, trace)
+
+
+async def run(args):
+    install_fakes(args)
+    session_args = DailySessionArguments(
+        room_url="https://example.daily.co/bench", token="", session_id="bench", body={}
+    )
+    for name, startup in (("sequential", sequential_startup), ("concurrent", concurrent_startup)):
+        times = []
+        for _ in range(args.runs):
+            trace = SessionTrace("bench")
+            started = time.perf_counter()
+            await startup(session_args, [], trace)
+            times.append(time.perf_counter() - started)
+        print(
+            f"{name:>10}: median {statistics.median(times) * 1000:7.1f} ms, "
+            f"max {max(times) * 1000:7.1f} ms over {args.runs} runs"
+        )
+    critical = max(args.supabase_ms + args.history_ms + args.llm_ms, args.vad_ms)
+    total = args.supabase_ms + args.history_ms + args.llm_ms + args.vad_ms
+    print(f"expected: sequential ~{total:.0f} ms, concurrent ~{critical:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bot startup concurrency")
+    parser.add_argument("--supabase-ms", type=float, default=120)
+    parser.add_argument("--history-ms", type=float, default=350)
+    parser.add_argument("--vad-ms", type=float, default=400)
+    parser.add_argument("--llm-ms", type=float, default=150)
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
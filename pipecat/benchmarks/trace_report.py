@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Aggregate session-start traces written by bot.py.
+
+Reads one or more JSON-lines files produced by session_trace.SessionTrace
+and prints, for every span name, percentiles of its duration and of the
+offset at which it finished (time since bot.main started).
+Usage (from the pipecat directory):
+    python -m benchmarks.trace_report /tmp/session-traces.jsonl [more.jsonl ...] [--json]
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, round(p / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def load_traces(paths):
+    for path in paths:
+        with open(path) as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"{path}:{line_number}: skipping invalid line", file=sys.stderr)
+
+
+def aggregate(traces):
+    durations = defaultdict(list)
+    ends = defaultdict(list)
+    sessions = 0
+    for trace in traces:
+        sessions += 1
+        for span in trace.get("spans", []):
+            durations[span["name"]].append(span["duration"])
+            ends[span["name"]].append(span["end"])
+
+    report = {"sessions": sessions, "spans": {}}
+    for name in sorted(ends, key=lambda n: percentile(sorted(ends[n]), 50)):
+        d = sorted(durations[name])
+        e = sorted(ends[name])
+        report["spans"][name] = {
+            "count": len(d),
+            "duration": {f"p{p}": percentile(d, p) for p in PERCENTILES},
+            "end": {f"p{p}": percentile(e, p) for p in PERCENTILES},
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate bot session traces")
+    parser.add_argument("paths", nargs="+", help="JSON-lines trace files")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = aggregate(load_traces(args.paths))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['sessions']} sessions")
+    header = "".join(f"{'dur p' + str(p):>10}" for p in PERCENTILES) + "".join(
+        f"{'end p' + str(p):>10}" for p in PERCENTILES
+    )
+    print(f"{'span':32s}{'count':>7}{header}")
+    for name, stats in report["spans"].items():
+        values = list(stats["duration"].values()) + list(stats["end"].values())
+        cells = "".join(f"{v * 1000:9.1f}ms" for v in values)
+        print(f"{name:32s}{stats['count']:7d}{cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Fault-injection checks for the transcript write-ahead log.
+
+Runs a stub PostgREST server on localhost that stores todo_turns rows and
+honors `resolution=ignore-duplicates` on turn_key, and points a real
+supabase-py client at it. Each scenario injects faults into the stub
+(errors, hung requests that commit anyway, commits that report an error, a
+bot process killed mid-session), then checks that every turn ends up in the
+table exactly once and in order, and that put() never waits on Supabase.
+Exits 1 if any scenario fails.
+Usage (from the pipecat directory):
+    python -m benchmarks.wal_fault_injection [--turns 60]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from supabase import acreate_client
+
+from transcript_wal import TranscriptWAL, recover_transcript_wals
+from turn_writer import TodoTurnWriter
+
+# not a real key; supabase-py only checks that it looks like a JWT
+STUB_KEY = "stub.stub.stub"
+WRITER_OPTIONS = dict(
+    batch_size=5,
+    flush_interval=0.05,
+    max_retries=3,
+    retry_base_delay=0.01,
+    request_timeout=0.3,
+    max_backoff=0.2,
+)
+
+
+class StubPostgREST:
+    """Just enough PostgREST to receive todo_turns inserts, with faults.
+
+    `faults` is consumed one entry per request: "error" answers 500 without
+    storing, "hang" stores the rows but answers only after the client has
+    timed out, "commit_error" stores the rows and answers 500.
+    """
+
+    def __init__(self, hang_seconds: float = 1.0):
+        self.rows: List[Dict] = []
+        self.faults: List[str] = []
+        self.requests = 0
+        self.hang_seconds = hang_seconds
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                rows = body if isinstance(body, list) else [body]
+                ignore = "ignore-duplicates" in self.headers.get("Prefer", "")
+                keyed = "turn_key" in parse_qs(urlparse(self.path).query).get("on_conflict", [""])[0]
+                with stub._lock:
+                    stub.requests += 1
+                    fault = stub.faults.pop(0) if stub.faults else "ok"
+                    if fault != "error":
+                        inserted = stub._store(rows, ignore and keyed)
+                if fault == "hang":
+                    time.sleep(stub.hang_seconds)
+                if fault in ("error", "commit_error"):
+                    self._reply(500, {"message": f"injected {fault}"})
+                else:
+                    self._reply(201, inserted)
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def _store(self, rows, ignore_duplicates):
+        keys = {(row.get("turn_key"), row["timestamp"]) for row in self.rows}
+        inserted = []
+        for row in rows:
+            key = (row.get("turn_key"), row["timestamp"])
+            if ignore_duplicates and key in keys:
+                continue
+            keys.add(key)
+            inserted.append(row)
+        self.rows.extend(inserted)
+        return inserted
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def make_turns(n: int, conversation_id: str) -> List[Dict]:
+    return [
+        {
+            "timestamp": f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}+00:00",
+            "user_id": "fault-user",
+            "conversation_id": conversation_id,
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"turn {i}",
+        }
+        for i in range(n)
+    ]
+
+
+def check(stub: StubPostgREST, conversation_id: str, n: int) -> List[str]:
+    """Problems with the rows the stub holds for one conversation."""
+    contents = [row["content"] for row in stub.rows if row["conversation_id"] == conversation_id]
+    expected = [f"turn {i}" for i in range(n)]
+    problems = []
+    if len(contents) != len(set(contents)):
+        problems.append(f"{len(contents) - len(set(contents))} duplicate rows")
+    if set(contents) != set(expected):
+        problems.append(f"{len(set(expected) - set(contents))} turns missing")
+    elif contents != expected:
+        problems.append("turns out of order")
+    return problems
+
+
+async def run_session(stub, wal_dir, conversation_id, n, faults):
+    """Put n turns through a WAL-backed writer while faults are injected."""
+    supabase = await acreate_client(stub.url, STUB_KEY)
+    stub.faults = list(faults)
+    writer = TodoTurnWriter(
+        supabase, wal=TranscriptWAL.create(wal_dir, conversation_id), **WRITER_OPTIONS
+    )
+    put_latencies = []
+    for record in make_turns(n, conversation_id):
+        started = time.perf_counter()
+        await writer.put(record)
+        put_latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.005)
+    await writer.close()
+    return supabase, writer.stats(), max(put_latencies)
+
+
+async def scenario_faults(stub, wal_dir, name, faults, n):
+    supabase, stats, max_put = await run_session(stub, wal_dir, name, n, faults)
+    recovered = await recover_transcript_wals(supabase, wal_dir)
+    return check(stub, name, n), {
+        "retries": stats["retries"],
+        "left_in_wal": stats["queue_depth"],
+        "recovered": recovered,
+        "max_put_ms": round(max_put * 1000, 2),
+    }
+
+
+async def scenario_crash(stub, wal_dir, n):
+    """Kill a bot process after it logged turns, then recover them."""
+    name = "crash"
+    # the first requests fail, so the process dies with turns still unwritten
+    stub.faults = ["error"] * 4
+    pipecat_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    child = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--crash-child", wal_dir, stub.url, name, str(n)],
+        env={**os.environ, "PYTHONPATH": pipecat_dir},
+    )
+    before = len([row for row in stub.rows if row["conversation_id"] == name])
+
+    # a log held open by a live session must not be touched by recovery
+    live = TranscriptWAL.create(wal_dir, "live")
+    live.append(make_turns(1, "live")[0])
+    supabase = await acreate_client(stub.url, STUB_KEY)
+    stub.faults = ["hang", "commit_error"]
+    recovered = await recover_transcript_wals(supabase, wal_dir)
+    live_untouched = live.pending_count == 1 and not any(
+        row["conversation_id"] == "live" for row in stub.rows
+    )
+    live.close()
+
+    problems = check(stub, name, n)
+    if child.returncode != 17:
+        problems.append(f"crash child exited {child.returncode}")
+    if not live_untouched:
+        problems.append("recovery touched a live session's log")
+    leftovers = [f for f in os.listdir(wal_dir) if f.startswith(name)]
+    if leftovers:
+        problems.append(f"recovered logs not removed: {leftovers}")
+    return problems, {"written_before_crash": before, "recovered": recovered}
+
+
+async def crash_child(wal_dir, url, name, n):
+    supabase = await acreate_client(url, STUB_KEY)
+    writer = TodoTurnWriter(
+        supabase, wal=TranscriptWAL.create(wal_dir, name), **WRITER_OPTIONS
+    )
+    for record in make_turns(n, name):
+        await writer.put(record)
+    await asyncio.sleep(0.2)
+    os._exit(17)  # no close(), no flush, no atexit
+
+
+async def run(args):
+    stub = StubPostgREST(hang_seconds=WRITER_OPTIONS["request_timeout"] * 3)
+    scenarios = [
+        ("healthy", []),
+        ("errors", ["error"] * 6),
+        ("hung_requests", ["hang"] * 3),
+        ("commit_then_error", ["commit_error", "ok", "commit_error"] * 2),
+        # every attempt made before close fails; the turns wait for recovery
+        ("outage", ["error"] * 400),
+    ]
+    failed = False
+    try:
+        with tempfile.TemporaryDirectory() as wal_dir:
+            for name, faults in scenarios:
+                if name == "outage":
+                    # the outage ends before the next session starts recovery
+                    supabase, stats, max_put = await run_session(stub, wal_dir, name, args.turns, faults)
+                    stub.faults = []
+                    recovered = await recover_transcript_wals(supabase, wal_dir)
+                    problems = check(stub, name, args.turns)
+                    details = {
+                        "left_in_wal": stats["queue_depth"],
+                        "recovered": recovered,
+                        "max_put_ms": round(max_put * 1000, 2),
+                    }
+                else:
+                    problems, details = await scenario_faults(stub, wal_dir, name, faults, args.turns)
+                failed |= bool(problems)
+                print(f"{name:<20} {'FAIL' if problems else 'ok':<5} {details} {'; '.join(problems)}")
+            problems, details = await scenario_crash(stub, wal_dir, args.turns)
+            failed |= bool(problems)
+            print(f"{'crash':<20} {'FAIL' if problems else 'ok':<5} {details} {'; '.join(problems)}")
+    finally:
+        stub.close()
+    print(f"{stub.requests} requests to the stub PostgREST server")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fault-injection checks for the transcript WAL")
+    parser.add_argument("--turns", type=int, default=60, help="Turns per scenario")
+    parser.add_argument("--crash-child", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.crash_child:
+        wal_dir, url, name, n = args.crash_child
+        asyncio.run(crash_child(wal_dir, url, name, int(n)))
+        return
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
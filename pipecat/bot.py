@@ -9,13 +9,12 @@ import sys
 import argparse
 import os
 from datetime import datetime, timezone, timedelta
-from typing import List, Any
+from typing import TYPE_CHECKING, List, Any, Optional
 import json
 
 from dotenv import load_dotenv
 from loguru import logger
 
-from pipecat.audio.vad.silero import SileroVADAnalyzer
 from pipecat.frames.frames import (
     TranscriptionMessage,
     TranscriptionUpdateFrame,
@@ -27,11 +26,6 @@ from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
 from pipecat.processors.transcript_processor import TranscriptProcessor
 
 from pipecat.transports.services.daily import DailyParams, DailyTransport
-from pipecatcloud.agent import (
-    DailySessionArguments,
-    SessionArguments,
-)
-from supabase import acreate_client, AsyncClient
 
 
 from pipecat.processors.frameworks.rtvi import (
@@ -41,7 +35,24 @@ from pipecat.processors.frameworks.rtvi import (
     RTVIServerMessageFrame,
 )
 
+from client_registry import close_client_registry, get_client_registry
 from gemini_live import GeminiLiveTodo
+from generation_jobs import GenerationJobManager
+from session_memory import close_session_memory, deep_size, open_session_memory
+from session_trace import SessionTrace, SessionTraceObserver
+from todo_turns_feed import close_todo_turns_feed, start_todo_turns_feed
+from transcript_buffer import TranscriptBuffer
+from transcript_wal import TRANSCRIPT_WAL_DIR, TranscriptWAL, recover_transcript_wals
+from turn_writer import TodoTurnWriter
+from vad_cache import load_silero_vad
+
+# Imported where they are used: onnxruntime (Silero) is only needed by the
+# VAD thread in start_services, and the Pipecat Cloud runtime has already
+# imported pipecatcloud (and fastapi) by the time it calls bot().
+if TYPE_CHECKING:
+    from pipecat.audio.vad.silero import SileroVADAnalyzer
+    from pipecatcloud.agent import DailySessionArguments, SessionArguments
+    from supabase import AsyncClient
 
 load_dotenv(override=True)
 
@@ -61,18 +72,32 @@ OLDEST_CONVERSATION_DATETIME = datetime.now(timezone.utc) - timedelta(weeks=2)
 DAILY_ROOM_URL = os.getenv("DAILY_ROOM_URL")
 DAILY_TOKEN = os.getenv("DAILY_TOKEN")
 
+# seconds a session waits at shutdown for recovery of older transcript logs
+TRANSCRIPT_WAL_RECOVERY_TIMEOUT = 10
+# seconds a session waits at shutdown for its turns to reach Supabase; the
+# rest stay in its transcript log for recovery
+TRANSCRIPT_CLOSE_TIMEOUT = 5
+
 
 class TranscriptHandler:
     """Handles real-time transcript processing and output."""
 
-    def __init__(self, supabase: AsyncClient, user_id: str):
+    def __init__(self, supabase: "AsyncClient", user_id: str, session_id: str):
         """Initialize handler."""
-        self.messages: List[TranscriptionMessage] = []
+        # only the latest turns; all of them are in the LLM context and Supabase
+        self.messages = TranscriptBuffer()
 
         self._user_id = user_id
         # _conversation_id should be a user-readable timestamp with 1s granularity
         self._conversation_id = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S")
-        self._supabase: AsyncClient = supabase
+        self._supabase: "AsyncClient" = supabase
+        # turns are logged locally first so a Supabase outage or crash loses none
+        wal = (
+            TranscriptWAL.create(TRANSCRIPT_WAL_DIR, self._conversation_id)
+            if TRANSCRIPT_WAL_DIR
+            else None
+        )
+        self._writer = TodoTurnWriter(supabase, wal=wal, session_id=session_id)
         logger.debug("TranscriptHandler initialized")
 
     async def save_message(self, message: TranscriptionMessage):
@@ -92,9 +117,8 @@ class TranscriptHandler:
             "content": message.content,
         }
 
-        response = await self._supabase.from_("todo_turns").insert(record).execute()
-        if hasattr(response, "error") and response.error:
-            logger.error(f"Error inserting todo_turn: {response.error}")
+        # logged and queued for a batched insert so Supabase latency stays off the pipeline
+        await self._writer.put(record)
 
         timestamp = f"[{message.timestamp}] " if message.timestamp else ""
         line = f"{timestamp}{message.role}: {message.content}"
@@ -118,8 +142,28 @@ class TranscriptHandler:
             self.messages.append(msg)
             await self.save_message(msg)
 
+    def writer_stats(self):
+        """Queue depth and flush-latency metrics for the turn writer."""
+        return self._writer.stats()
+
+    async def close(self):
+        """Write any queued turns to Supabase and stop the writer."""
+        await self._writer.close(timeout=TRANSCRIPT_CLOSE_TIMEOUT)
+
+
+def load_vad_analyzer() -> "SileroVADAnalyzer":
+    """Import onnxruntime and load the Silero model; slow, so run it in a thread.
+
+    Uses the pre-optimized model warmup.py caches in the image, if present.
+    """
+    return load_silero_vad()
+
+
+async def main(
+    args: "SessionArguments", vad_analyzer: Optional["SileroVADAnalyzer"] = None
+):
+    from pipecatcloud.agent import DailySessionArguments
 
-async def main(args: SessionArguments):
     logger.info(f"Starting bot")
 
     if isinstance(args, DailySessionArguments):
@@ -130,23 +174,103 @@ async def main(args: SessionArguments):
 
     if args.body:
         user_id = args.body.get("user_id", os.getenv("USER_ID", "generic_user"))
+        # a user JWT scopes Supabase requests to that user via row-level security
+        access_token = args.body.get("access_token")
     else:
         user_id = os.getenv("USER_ID", "generic_user")
+        access_token = None
 
-    logger.debug(f"Creating Supabase client")
-    supabase: AsyncClient = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
-
-    transport = DailyTransport(
-        bot_name="todo helper",
-        room_url=args.room_url,
-        token=args.token,
-        params=DailyParams(
-            audio_in_enabled=True,
-            audio_out_enabled=True,
-            vad_analyzer=SileroVADAnalyzer(),
-        ),
-    )
+    trace = SessionTrace(args.session_id or "local", user_id=user_id)
+    try:
+        await run_session(args, user_id, trace, vad_analyzer, access_token)
+    finally:
+        # exporting to a collector can block on network retries
+        await asyncio.to_thread(trace.write)
+
+
+async def gather_or_cancel(*aws):
+    """Await concurrently; if one fails or we are cancelled, cancel the rest.
+
+    Unlike asyncio.gather, the remaining tasks are not left running in the
+    background, and the first exception is raised as-is.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
+
+async def start_services(
+    args: "DailySessionArguments",
+    user_id: str,
+    messages: List,
+    trace: SessionTrace,
+    vad_analyzer: Optional["SileroVADAnalyzer"] = None,
+    jobs: Optional[GenerationJobManager] = None,
+    access_token: Optional[str] = None,
+):
+    """Create the Supabase client, LLM service and Daily transport.
+
+    The Supabase client -> history fetch -> Gemini Live service chain runs
+    concurrently with loading the Silero VAD model (in a thread, since it is
+    CPU-bound) and constructing the transport.
+    """
+
+    async def create_supabase():
+        logger.debug(f"Creating Supabase client")
+        with trace.span("acreate_client"):
+            return await get_client_registry().supabase(
+                SUPABASE_URL, SUPABASE_KEY, access_token
+            )
+
+    async def create_llm(supabase_task):
+        supabase = await supabase_task
+        gemini_live_todo = GeminiLiveTodo(
+            supabase,
+            user_id,
+            os.path.abspath(
+                os.path.join(os.path.dirname(__file__), "system-instruction.txt")
+            ),
+            messages=messages,
+            trace=trace,
+            jobs=jobs,
+        )
+        with trace.span("gemini_live_todo.llm"):
+            return await gemini_live_todo.llm()
+
+    async def create_transport():
+        with trace.span("daily_transport", preloaded_vad=vad_analyzer is not None):
+            vad = vad_analyzer or await asyncio.to_thread(load_vad_analyzer)
+            return DailyTransport(
+                bot_name="todo helper",
+                room_url=args.room_url,
+                token=args.token,
+                params=DailyParams(
+                    audio_in_enabled=True,
+                    audio_out_enabled=True,
+                    vad_analyzer=vad,
+                ),
+            )
+
+    with trace.span("start_services"):
+        supabase_task = asyncio.ensure_future(create_supabase())
+        supabase, llm, transport = await gather_or_cancel(
+            supabase_task, create_llm(supabase_task), create_transport()
+        )
+    return supabase, llm, transport
+
+
+async def run_session(
+    args: "DailySessionArguments",
+    user_id: str,
+    trace: SessionTrace,
+    vad_analyzer: Optional["SileroVADAnalyzer"] = None,
+    access_token: Optional[str] = None,
+):
     # todo: move this inside GeminiLiveTodo?
     messages = [
         {
@@ -154,16 +278,15 @@ async def main(args: SessionArguments):
             "content": 'Please say the exact phrase "I am ready". Say it now.',
         }
     ]
-    gemini_live_todo = GeminiLiveTodo(
-        supabase,
-        user_id,
-        os.path.abspath(
-            os.path.join(os.path.dirname(__file__), "system-instruction.txt")
-        ),
-        messages=messages,
+    # keeps this process's cached history in step with turns other instances write
+    start_todo_turns_feed()
+    # app generations run as jobs that are cancelled when the client leaves
+    jobs = GenerationJobManager()
+    supabase, llm, transport = await start_services(
+        args, user_id, messages, trace, vad_analyzer, jobs, access_token
     )
-    llm = await gemini_live_todo.llm()
 
+    trace.mark("pipeline_build")
     rtvi = RTVIProcessor(config=RTVIConfig(config=[]))
 
     context = OpenAILLMContext(messages)
@@ -171,7 +294,7 @@ async def main(args: SessionArguments):
 
     # Create transcript processor and handler
     transcript = TranscriptProcessor()
-    transcript_handler = TranscriptHandler(supabase, user_id)
+    transcript_handler = TranscriptHandler(supabase, user_id, trace.session_id)
 
     pipeline = Pipeline(
         [
@@ -189,12 +312,13 @@ async def main(args: SessionArguments):
     task = PipelineTask(
         pipeline,
         params=PipelineParams(allow_interruptions=True),
-        observers=[RTVIObserver(rtvi)],
+        observers=[RTVIObserver(rtvi), SessionTraceObserver(trace)],
     )
 
     @rtvi.event_handler("on_client_ready")
     async def on_client_ready(rtvi):
         logger.info("Pipecat client ready")
+        trace.mark("on_client_ready")
         await rtvi.set_bot_ready()
         await task.queue_frames([context_aggregator.user().get_context_frame()])
         logger.info("Sending server message frame")
@@ -205,6 +329,11 @@ async def main(args: SessionArguments):
     @transport.event_handler("on_client_connected")
     async def on_client_connected(transport, client):
         logger.info("Client connected")
+        trace.mark("on_client_connected")
+
+    @transport.event_handler("on_joined")
+    async def on_joined(transport, data):
+        trace.mark("daily_joined")
 
     # Register event handler for transcript updates
     @transcript.event_handler("on_transcript_update")
@@ -214,34 +343,67 @@ async def main(args: SessionArguments):
     @transport.event_handler("on_client_disconnected")
     async def on_client_disconnected(transport, client):
         logger.info(f"Client disconnected")
+        await jobs.cancel_all()
+        # tear the pipeline down first; a slow Supabase only delays the writer
         await task.cancel()
+        await transcript_handler.close()
 
     @transport.event_handler("on_client_closed")
     async def on_client_closed(transport, client):
         logger.info(f"Client closed connection")
+        await jobs.cancel_all()
         await task.cancel()
+        await transcript_handler.close()
 
     runner = PipelineRunner(handle_sigint=False)
-    await runner.run(task)
-
-
-async def bot(args: SessionArguments):
+    trace.mark("runner_start")
+    # replay turns that crashed or unreachable earlier sessions left behind
+    recovery = (
+        asyncio.create_task(recover_transcript_wals(supabase))
+        if TRANSCRIPT_WAL_DIR
+        else None
+    )
+    # bytes this session holds, reported by the worker pool
+    memory = open_session_memory(trace.session_id, user_id)
+    memory.track("transcript", lambda: transcript_handler.messages.size_bytes)
+    memory.track("llm_context", lambda: deep_size(context.messages))
     try:
-        await main(args)
+        await runner.run(task)
+    finally:
+        logger.info(f"Session memory: {close_session_memory(memory)}")
+        await jobs.cancel_all()
+        await transcript_handler.close()
+        if recovery is not None:
+            try:
+                await asyncio.wait_for(recovery, TRANSCRIPT_WAL_RECOVERY_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Transcript log recovery unfinished, continuing next session")
+
+
+async def bot(
+    args: "SessionArguments", vad_analyzer: Optional["SileroVADAnalyzer"] = None
+):
+    try:
+        await main(args, vad_analyzer)
         logger.info("Bot process completed")
     except Exception as e:
         logger.exception(f"Error in bot process: {str(e)}")
         raise
 
 
-async def local_dev_runner(body: Any):
+async def local_dev_runner(
+    body: Any, vad_analyzer: Optional["SileroVADAnalyzer"] = None
+):
+    from pipecatcloud.agent import DailySessionArguments
+
     await bot(
         DailySessionArguments(
             room_url=DAILY_ROOM_URL,
             token=DAILY_TOKEN,
             session_id="local-dev",
             body=body,
-        )
+        ),
+        vad_analyzer,
     )
 
 
@@ -250,4 +412,12 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         print(f"parsing json: {sys.argv[1]}")
         body_json = json.loads(sys.argv[1])
-    asyncio.run(local_dev_runner(body_json))
+
+    async def run_once():
+        try:
+            await local_dev_runner(body_json)
+        finally:
+            await close_todo_turns_feed()
+            await close_client_registry()
+
+    asyncio.run(run_once())
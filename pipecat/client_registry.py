@@ -0,0 +1,135 @@
+import asyncio
+import os
+from typing import TYPE_CHECKING, Dict, Optional
+
+import httpx
+from loguru import logger
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+
+if TYPE_CHECKING:
+    from google import genai
+
+
+class ClientRegistry:
+    """Async API clients shared by every session running on one event loop.
+
+    Supabase clients are created per session so that auth headers never leak
+    between users, but they all send requests through one keep-alive HTTP/2
+    connection pool. genai clients hold no per-user state and are shared
+    outright, one per API version.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        timeout: float = 120.0,
+    ):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http2 = http2
+        self._timeout = timeout
+        self._http: Optional[httpx.AsyncClient] = None
+        self._genai: Dict[Optional[str], "genai.Client"] = {}
+        self.supabase_clients = 0
+
+    def stats(self) -> Dict:
+        return {
+            "supabase_clients": self.supabase_clients,
+            "genai_clients": len(self._genai),
+            "http_pool_open": self._http is not None and not self._http.is_closed,
+        }
+
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                http2=self._http2,
+                limits=self._limits,
+                timeout=self._timeout,
+                follow_redirects=True,
+            )
+        return self._http
+
+    async def supabase(
+        self, url: str, key: str, access_token: Optional[str] = None
+    ) -> AsyncClient:
+        """Supabase client on the shared pool.
+
+        Requests are made with `key`, or with the user's `access_token` when
+        given so that row-level security applies to that user. Sessions are
+        not persisted or refreshed, so nothing carries over to the next user.
+        """
+        headers = {"Authorization": f"Bearer {access_token}"} if access_token else {}
+        options = AsyncClientOptions(
+            headers=headers,
+            auto_refresh_token=False,
+            persist_session=False,
+            httpx_client=self.http_client(),
+        )
+        self.supabase_clients += 1
+        return await acreate_client(url, key, options)
+
+    def genai(self, api_version: Optional[str] = None) -> "genai.Client":
+        client = self._genai.get(api_version)
+        if client is None:
+            # google.genai takes about a second to import and most sessions never need it
+            from google import genai
+
+            client = genai.Client(
+                api_key=os.getenv("GOOGLE_API_KEY"),
+                http_options=genai.types.HttpOptions(
+                    api_version=api_version,
+                    async_client_args={"limits": self._limits},
+                ),
+            )
+            self._genai[api_version] = client
+        return client
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        for client in self._genai.values():
+            # google-genai 1.x has no public close for its async transport
+            http = getattr(client._api_client, "_async_httpx_client", None)
+            if http is not None:
+                await http.aclose()
+        self._genai.clear()
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client_registry() -> ClientRegistry:
+    """Registry for the running event loop, configured from CLIENT_* env variables.
+
+    Connections cannot move between event loops, so a new registry is made
+    if this is called from a different loop than last time.
+    """
+    global _registry, _registry_loop
+    loop = asyncio.get_running_loop()
+    if _registry is None or _registry_loop is not loop:
+        _registry = ClientRegistry(
+            max_connections=int(os.getenv("CLIENT_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("CLIENT_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("CLIENT_KEEPALIVE_EXPIRY", "30")),
+            http2=os.getenv("CLIENT_HTTP2", "1") != "0",
+        )
+        _registry_loop = loop
+    return _registry
+
+
+async def close_client_registry():
+    """Close the shared connections at process shutdown."""
+    global _registry, _registry_loop
+    if _registry is not None:
+        logger.debug(f"Closing client registry: {_registry.stats()}")
+        await _registry.aclose()
+    _registry = None
+    _registry_loop = None
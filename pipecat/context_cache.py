@@ -0,0 +1,565 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from loguru import logger
+from supabase import AsyncClient
+
+from history_compaction import HistoryCompactor, history_compactor_from_env
+from supa.utils.supabase_helpers import (
+    fetch_turns_since,
+    fetch_user_history,
+    format_history,
+    format_turns,
+    group_turns,
+)
+
+# How far back conversations are preloaded into the system instruction.
+# Anything older is still reachable through search_past_conversations. The
+# todos table carries the current task state, so this can be shrunk, or set
+# to 0 to leave raw transcripts out entirely.
+HISTORY_WINDOW = timedelta(days=float(os.getenv("HISTORY_WINDOW_DAYS", "14")))
+
+# How long a session waits for a prefetch still running when it starts,
+# counted from when the prefetch started, before fetching history itself.
+CONTEXT_PREFETCH_WAIT = float(os.getenv("CONTEXT_PREFETCH_WAIT", "5"))
+# How long after it finished a prefetched entry is used without checking
+# Supabase for newer turns.
+CONTEXT_PREFETCH_MAX_AGE = float(os.getenv("CONTEXT_PREFETCH_MAX_AGE", "60"))
+PREFETCH_POLL_INTERVAL = 0.05
+
+# (started_at, finished_at) of a user's latest prefetch; finished_at is None
+# while it runs
+PrefetchState = Tuple[float, Optional[float]]
+
+
+@dataclass
+class CachedContext:
+    """Formatted history for one user, plus what is needed to extend it."""
+
+    text: str
+    # timestamp of the newest turn included in text, as returned by PostgREST
+    high_water: Optional[str]
+    # largest todo_turns id included in text; turns replayed from a
+    # transcript log get later ids but may be older than high_water
+    high_water_id: Optional[int]
+    last_conversation_id: Optional[str]
+    built_at: float
+    # text was condensed by the compactor, so new turns cannot be appended
+    compacted: bool = False
+
+    @property
+    def size(self) -> int:
+        return len(self.text.encode("utf-8"))
+
+
+def context_cache_key(
+    user_id: str, oldest: Optional[datetime] = None, limit: Optional[int] = None
+) -> str:
+    """Cache key for user_id's history over a window.
+
+    `oldest` moves with the clock, so the window is keyed by its length in
+    whole hours; a prefetch and the session it serves share a key.
+    """
+    hours = "all" if oldest is None else str(round((time.time() - oldest.timestamp()) / 3600))
+    return "\0".join([user_id, hours, str(limit or "all")])
+
+
+def _key_user(key: str) -> str:
+    return key.split("\0", 1)[0]
+
+
+class MemoryContextBackend:
+    """In-process LRU store, bounded by the total size of cached text."""
+
+    # every call returns at once, so ContextCache calls it on the event loop
+    blocking = False
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedContext]" = OrderedDict()
+        self._bytes = 0
+        self._prefetches: Dict[str, PrefetchState] = {}
+
+    def get(self, key: str) -> Optional[CachedContext]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedContext):
+        self.delete(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self._max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def delete_user(self, user_id: str):
+        for key in [key for key in self._entries if _key_user(key) == user_id]:
+            self.delete(key)
+
+    def get_prefetch(self, user_id: str) -> Optional[PrefetchState]:
+        return self._prefetches.get(user_id)
+
+    def put_prefetch(self, user_id: str, state: PrefetchState):
+        self._prefetches[user_id] = state
+
+    def delete_prefetch(self, user_id: str):
+        self._prefetches.pop(user_id, None)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+class SQLiteContextBackend:
+    """SQLite-backed LRU store, so prebuilt context survives restarts.
+
+    Several processes can share the file: the local dev server prefetches
+    into it and the bot processes read from it. Every call does disk I/O,
+    so ContextCache makes them from worker threads; a lock serializes them.
+    """
+
+    blocking = True
+    # bump when the tables change; older files are emptied on open
+    SCHEMA_VERSION = 4
+
+    def __init__(self, path: str, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # the entries are users' conversations
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # readers do not block the writer in another process
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS context_prefetch")
+            self._conn.execute("DROP TABLE IF EXISTS context_cache")
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS context_prefetch (
+                user_id text PRIMARY KEY,
+                started_at real NOT NULL,
+                finished_at real
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS context_cache (
+                key text PRIMARY KEY,
+                user_id text NOT NULL,
+                text text NOT NULL,
+                high_water text,
+                high_water_id integer,
+                last_conversation_id text,
+                built_at real NOT NULL,
+                compacted integer NOT NULL,
+                size integer NOT NULL,
+                last_used real NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        # as of this process's last write; stats() must not touch the disk
+        self._size_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM context_cache"
+        ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[CachedContext]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, high_water, high_water_id, last_conversation_id, built_at,"
+                " compacted"
+                " FROM context_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE context_cache SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+        return CachedContext(*row[:-1], compacted=bool(row[-1]))
+
+    def put(self, key: str, entry: CachedContext):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO context_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    _key_user(key),
+                    entry.text,
+                    entry.high_water,
+                    entry.high_water_id,
+                    entry.last_conversation_id,
+                    entry.built_at,
+                    int(entry.compacted),
+                    entry.size,
+                    time.time(),
+                ),
+            )
+            # evict least recently used entries, always keeping the newest one
+            rows = self._conn.execute(
+                "SELECT key, size FROM context_cache ORDER BY last_used DESC"
+            ).fetchall()
+            total = kept = 0
+            for i, (cached_key, size) in enumerate(rows):
+                total += size
+                if i > 0 and total > self._max_bytes:
+                    self._conn.execute("DELETE FROM context_cache WHERE key = ?", (cached_key,))
+                else:
+                    kept += size
+            self._conn.commit()
+            self._size_bytes = kept
+
+    def delete(self, key: str):
+        self._delete("key", key)
+
+    def delete_user(self, user_id: str):
+        self._delete("user_id", user_id)
+
+    def _delete(self, column: str, value: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM context_cache WHERE {column} = ?", (value,))
+            self._conn.commit()
+            self._size_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM context_cache"
+            ).fetchone()[0]
+
+    def get_prefetch(self, user_id: str) -> Optional[PrefetchState]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT started_at, finished_at FROM context_prefetch WHERE user_id = ?",
+                (user_id,),
+            ).fetchone()
+
+    def put_prefetch(self, user_id: str, state: PrefetchState):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO context_prefetch VALUES (?, ?, ?)", (user_id, *state)
+            )
+            self._conn.commit()
+
+    def delete_prefetch(self, user_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM context_prefetch WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size_bytes
+
+
+class ContextCache:
+    """Per-user cache of the formatted recent-conversations block.
+
+    Entries are keyed by user and history window (context_cache_key), so
+    callers asking for different windows or limits never share text.
+
+    A hit only fetches turns inserted after the cached high-water id and
+    appends them; if any of them are older than the newest cached turn
+    (replayed late from a transcript log), or the compactor condensed the
+    entry, it is rebuilt instead. Entries older than `max_age` seconds, or
+    that have grown past the compactor's token budget, are rebuilt from
+    scratch so the history window keeps sliding forward.
+
+    An entry prefetched when the user connected is used as-is, with no
+    Supabase round trip, by the first session that asks for it within
+    `prefetch_max_age` seconds, unless new turns for the user were inserted
+    since the prefetch started; a session that starts while the prefetch
+    is still running waits up to `prefetch_wait` seconds from its start.
+
+    While a change feed (todo_turns_feed.py) is connected, every process
+    hears about new todo_turns rows. An entry this process has synced with
+    Supabase since the feed connected, with no new turns for its user
+    since, is used without a round trip; note_new_turns() sends the next
+    request for that user back to fetching the turns after the high-water
+    id.
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_age: float = 3600,
+        compactor: Optional[HistoryCompactor] = None,
+        prefetch_wait: float = CONTEXT_PREFETCH_WAIT,
+        prefetch_max_age: float = CONTEXT_PREFETCH_MAX_AGE,
+    ):
+        self._backend = backend
+        self._max_age = max_age
+        self._compactor = compactor
+        self._prefetch_wait = prefetch_wait
+        self._prefetch_max_age = prefetch_max_age
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.unchanged = 0
+        self.notifications = 0
+        self._feed_connected = False
+        self._feed_drain: Optional[Callable[[], bool]] = None
+        # user_id -> {cache key: high-water id of the entry known to be current}
+        self._verified: Dict[str, Dict[str, Optional[int]]] = {}
+        # user_id -> {cache key: whether a sync now running can mark it current}
+        self._syncing: Dict[str, Dict[str, bool]] = {}
+        # user_id -> when the change feed last reported new turns for them
+        self._notified_at: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "prefetched": self.prefetched,
+            "unchanged": self.unchanged,
+            "notifications": self.notifications,
+            "feed_connected": self._feed_connected,
+            "size_bytes": self._backend.size_bytes,
+        }
+
+    async def invalidate(self, user_id: str):
+        self._verified.pop(user_id, None)
+        await self._call(self._backend.delete_user, user_id)
+
+    def set_feed_connected(
+        self, connected: bool, drain: Optional[Callable[[], bool]] = None
+    ):
+        """Called by the change feed; while it is down nothing counts as current.
+
+        `drain` handles notifications not read yet and returns False if the
+        feed's connection is gone; it is called before an entry is trusted.
+        """
+        self._feed_connected = connected
+        self._feed_drain = drain if connected else None
+        if not connected:
+            self._verified.clear()
+            for syncing in self._syncing.values():
+                for key in syncing:
+                    syncing[key] = False
+
+    def note_new_turns(self, user_id: str):
+        """Called by the change feed when todo_turns rows for user_id are inserted."""
+        self.notifications += 1
+        self._notified_at[user_id] = time.time()
+        self._verified.pop(user_id, None)
+        for key in self._syncing.get(user_id, {}):
+            self._syncing[user_id][key] = False
+        # a finished prefetch no longer has everything; the session extends
+        # it. Other processes sharing the backend learn it from there.
+        task = asyncio.create_task(self._drop_finished_prefetch(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drop_finished_prefetch(self, user_id: str):
+        state = await self._call(self._backend.get_prefetch, user_id)
+        if state is not None and state[1] is not None:
+            await self._call(self._backend.delete_prefetch, user_id)
+
+    async def mark_prefetching(self, user_id: str):
+        """Make sessions starting from now on wait for a prefetch of user_id.
+
+        Await it before starting prefetch() in the background, so a session
+        that starts before the task runs does not fetch the history too.
+        """
+        await self._call(self._backend.put_prefetch, user_id, (time.time(), None))
+
+    async def prefetch(
+        self,
+        client: AsyncClient,
+        user_id: str,
+        oldest: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ):
+        """Build or refresh user_id's entry ahead of their session."""
+        await self.mark_prefetching(user_id)
+        started = time.time()
+        finished = False
+        try:
+            key = context_cache_key(user_id, oldest, limit)
+            await self._refresh(client, user_id, key, oldest, limit)
+            finished = True
+        except Exception as e:
+            logger.warning(f"Context prefetch for {user_id} failed: {e or type(e).__name__}")
+        finally:
+            if finished:
+                await self._call(self._backend.put_prefetch, user_id, (started, time.time()))
+                logger.debug(f"Prefetched context for {user_id} in {time.time() - started:.2f}s")
+            else:
+                # sessions waiting for it fetch the history themselves
+                await self.cancel_prefetch(user_id)
+
+    async def cancel_prefetch(self, user_id: str):
+        await self._call(self._backend.delete_prefetch, user_id)
+
+    async def get_history(
+        self,
+        client: AsyncClient,
+        user_id: str,
+        oldest: Optional[datetime] = None,
+        limit: Optional[int] = None,
+    ) -> str:
+        key = context_cache_key(user_id, oldest, limit)
+        entry = await self._take_prefetched(user_id, key)
+        if entry is not None:
+            self.prefetched += 1
+            logger.debug(f"Context cache for {user_id}: {self.stats()}")
+            return entry.text
+        return await self._refresh(client, user_id, key, oldest, limit)
+
+    async def _take_prefetched(self, user_id: str, key: str) -> Optional[CachedContext]:
+        """The entry a prefetch just built, waiting for one still running."""
+        # notifications of newer turns cancel the hand-over
+        self._feed_current()
+        while True:
+            state = await self._call(self._backend.get_prefetch, user_id)
+            if state is None:
+                return None
+            started_at, finished_at = state
+            if finished_at is not None:
+                # each prefetch serves one session; later ones check for new turns
+                await self._call(self._backend.delete_prefetch, user_id)
+                if time.time() - finished_at > self._prefetch_max_age:
+                    return None
+                if self._notified_at.get(user_id, 0) >= started_at:
+                    return None
+                return await self._call(self._backend.get, key)
+            if time.time() - started_at > self._prefetch_wait:
+                logger.debug(f"Context prefetch for {user_id} not ready, fetching")
+                return None
+            await asyncio.sleep(PREFETCH_POLL_INTERVAL)
+
+    async def _refresh(self, client, user_id, key, oldest, limit) -> str:
+        entry = await self._call(self._backend.get, key)
+        if (
+            entry is not None
+            and entry.high_water_id is not None
+            and time.time() - entry.built_at < self._max_age
+            and not (self._compactor and self._compactor.over_budget(entry.text))
+        ):
+            verified = self._verified.get(user_id, {}).get(key, -1)
+            if self._feed_current() and verified == entry.high_water_id:
+                self.unchanged += 1
+                logger.debug(f"Context cache for {user_id}: {self.stats()}")
+                return entry.text
+            self.hits += 1
+            sync = self._extend(client, user_id, entry, oldest, limit)
+        else:
+            self.misses += 1
+            sync = self._build(client, user_id, oldest, limit)
+
+        # turns inserted while the sync runs may or may not be in its result
+        syncing = self._syncing.setdefault(user_id, {})
+        syncing[key] = self._feed_current()
+        try:
+            entry = await sync
+        finally:
+            current = syncing.pop(key, False)
+            if not syncing:
+                self._syncing.pop(user_id, None)
+        if current:
+            self._verified.setdefault(user_id, {})[key] = entry.high_water_id
+        await self._call(self._backend.put, key, entry)
+        logger.debug(f"Context cache for {user_id}: {self.stats()}")
+        return entry.text
+
+    async def _call(self, method, *args):
+        """Call a backend method, from a worker thread if it blocks on disk."""
+        if self._backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def _feed_current(self) -> bool:
+        """Whether every insert notified so far has been handled."""
+        if self._feed_drain is not None and not self._feed_drain():
+            self.set_feed_connected(False)
+        return self._feed_connected
+
+    async def _build(self, client, user_id, oldest, limit) -> CachedContext:
+        built_at = time.time()
+        history = await fetch_user_history(client, user_id, limit, oldest)
+        text = format_history(history)
+        compacted = False
+        if self._compactor is not None:
+            full = text
+            text = await self._compactor.compact(client, user_id, history)
+            compacted = text != full
+        return CachedContext(
+            text=text,
+            high_water=max(
+                (turn["timestamp"] for _, turns in history for turn in turns),
+                default=None,
+            ),
+            high_water_id=max(
+                (turn["id"] for _, turns in history for turn in turns),
+                default=None,
+            ),
+            last_conversation_id=history[-1][0] if history else None,
+            built_at=built_at,
+            compacted=compacted,
+        )
+
+    async def _extend(
+        self, client, user_id, entry: CachedContext, oldest, limit
+    ) -> CachedContext:
+        new_turns = await fetch_turns_since(client, user_id, entry.high_water_id)
+        if not new_turns:
+            return entry
+        if entry.compacted or new_turns[0]["timestamp"] < entry.high_water:
+            # the new turns do not go at the end of the text as it is: it
+            # was condensed, or a replayed turn belongs before its end
+            return await self._build(client, user_id, oldest, limit)
+
+        new_history = group_turns(new_turns)
+        last_conversation_id = new_history[-1][0]
+        text = entry.text
+        if new_history[0][0] == entry.last_conversation_id:
+            # the conversation continued: append before its trailing blank line
+            _, turns = new_history.pop(0)
+            text = text[:-1] + format_turns(turns) + "\n"
+        text += format_history(new_history)
+
+        return CachedContext(
+            text=text,
+            high_water=max(turn["timestamp"] for turn in new_turns),
+            high_water_id=max(turn["id"] for turn in new_turns),
+            last_conversation_id=last_conversation_id,
+            built_at=entry.built_at,
+        )
+
+
+_context_cache: Optional[ContextCache] = None
+
+
+def get_context_cache() -> ContextCache:
+    """Process-wide cache, configured from CONTEXT_CACHE_* env variables."""
+    global _context_cache
+    if _context_cache is None:
+        max_bytes = int(os.getenv("CONTEXT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        if os.getenv("CONTEXT_CACHE_BACKEND", "memory") == "sqlite":
+            path = os.getenv(
+                "CONTEXT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "context-cache.sqlite3")
+            )
+            backend = SQLiteContextBackend(path, max_bytes)
+        else:
+            backend = MemoryContextBackend(max_bytes)
+        _context_cache = ContextCache(
+            backend,
+            max_age=float(os.getenv("CONTEXT_CACHE_MAX_AGE", "3600")),
+            compactor=history_compactor_from_env(),
+        )
+    return _context_cache
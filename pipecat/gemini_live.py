@@ -5,11 +5,21 @@ from pipecat.services.gemini_multimodal_live.gemini import (
 )
 from pipecat.adapters.schemas.tools_schema import AdapterType, ToolsSchema
 from loguru import logger
+import asyncio
 import os
 from typing import Optional, List
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from supabase import AsyncClient
-from supa.utils.supabase_helpers import fetch_and_format
+from context_cache import HISTORY_WINDOW, ContextCache, get_context_cache
+from generation_jobs import GenerationJobManager
+from session_trace import SessionTrace
+from supa.utils.supabase_helpers import (
+    add_todo,
+    complete_todo,
+    format_todos,
+    list_todos,
+    search_turns,
+)
 
 from pipecat.processors.frameworks.rtvi import (
     RTVIServerMessageFrame,
@@ -18,7 +28,11 @@ from pipecat.processors.frameworks.rtvi import (
 from genai_single_page_app import GenaiSinglePageApp
 
 
-OLDEST_CONVERSATION_DATETIME = datetime.now(timezone.utc) - timedelta(weeks=2)
+# Most open todos listed in the system instruction.
+MAX_INJECTED_TODOS = 200
+
+# Longest turn text returned by search_past_conversations.
+SEARCH_RESULT_CHARS = 500
 
 
 async def show_text_on_screen(params: FunctionCallParams):
@@ -50,6 +64,90 @@ show_text_on_screen_schema = FunctionSchema(
 )
 
 
+search_past_conversations_schema = FunctionSchema(
+    name="search_past_conversations",
+    description="Search everything the user and you have said in past conversations, including conversations older than the recent ones you were given. Call this when the user refers to something that is not in the recent conversations.",
+    properties={
+        "query": {
+            "description": "Words to search for, for example 'dentist appointment' or 'book recommendations'.",
+            "type": "string",
+        },
+        "limit": {
+            "description": "Maximum number of matching messages to return (default 10).",
+            "type": "integer",
+        },
+    },
+    required=["query"],
+)
+
+
+add_todo_schema = FunctionSchema(
+    name="add_todo",
+    description="Add an item to one of the user's lists. Call this whenever the user mentions a new task, errand, purchase, book, show or other item to track.",
+    properties={
+        "title": {
+            "description": "Short description of the item, e.g. 'buy milk' or 'call the dentist'.",
+            "type": "string",
+        },
+        "list_name": {
+            "description": "Which list the item belongs on, e.g. 'todo', 'groceries', 'reading', 'movies'. Defaults to 'todo'.",
+            "type": "string",
+        },
+        "due_date": {
+            "description": "When the item is due, as YYYY-MM-DD, if the user gave one.",
+            "type": "string",
+        },
+        "notes": {
+            "description": "Any extra detail worth keeping.",
+            "type": "string",
+        },
+    },
+    required=["title"],
+)
+
+complete_todo_schema = FunctionSchema(
+    name="complete_todo",
+    description="Mark an item done when the user says they finished, bought or no longer need it.",
+    properties={
+        "todo_id": {
+            "description": "The item's id, shown as #id in the current todos.",
+            "type": "integer",
+        },
+    },
+    required=["todo_id"],
+)
+
+list_todos_schema = FunctionSchema(
+    name="list_todos",
+    description="Get the user's current items, optionally for one list or including completed ones.",
+    properties={
+        "list_name": {
+            "description": "Only return items on this list.",
+            "type": "string",
+        },
+        "include_completed": {
+            "description": "Also return items that are already done.",
+            "type": "boolean",
+        },
+    },
+    required=[],
+)
+
+
+def parse_due_date(value: Optional[str]) -> Optional[str]:
+    """ISO date for a due date the model passed, which may be free text."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        pass
+    import dateparser
+
+    parsed = dateparser.parse(value, settings={"PREFER_DATES_FROM": "future"})
+    return parsed.date().isoformat() if parsed else None
+
+
 async def generate_single_page_app(params: FunctionCallParams):
     """Generate a single page app from a prompt and stream the results."""
     prompt = params.arguments.get("prompt", "")
@@ -90,57 +188,155 @@ class GeminiLiveTodo:
         user_id: str,
         system_instruction_file,
         messages: Optional[List] = None,
+        context_cache: Optional[ContextCache] = None,
+        trace: Optional[SessionTrace] = None,
+        jobs: Optional[GenerationJobManager] = None,
     ):
         if messages is None:
             messages = []
+        if context_cache is None:
+            context_cache = get_context_cache()
         self._system_instruction_file = system_instruction_file
         self._messages = messages
         self._supabase = supabase
         self._user_id = user_id
+        self._context_cache = context_cache
+        # spans are only written if the caller writes its trace
+        self._trace = trace or SessionTrace("untraced", user_id=user_id)
+        self._jobs = jobs
         self._llm_service = None
 
     async def llm(self):
         if self._llm_service is None:
-            self._gen_app = GenaiSinglePageApp()
+            with self._trace.span("genai_single_page_app"):
+                self._gen_app = GenaiSinglePageApp(jobs=self._jobs)
 
             logger.debug(f"gen app schema {generate_single_page_app_schema}")
 
-            self._llm_service = GeminiMultimodalLiveLLMService(
-                api_key=os.getenv("GOOGLE_API_KEY"),
-                model=os.getenv(
-                    "CONVERSATION_MODEL",
-                    "models/gemini-2.5-flash-preview-native-audio-dialog",
-                ),
-                system_instruction=await self.load_system_instruction(
+            with self._trace.span("load_system_instruction"):
+                system_instruction = await self.load_system_instruction(
                     self._system_instruction_file
-                ),
-                voice_id="Puck",  # Aoede, Charon, Fenrir, Kore, Puck
-                tools=ToolsSchema(
-                    standard_tools=[
-                        show_text_on_screen_schema,
-                        generate_single_page_app_schema,
-                    ],
-                    custom_tools={AdapterType.GEMINI: [{"google_search": {}}]},
-                ),
-            )
+                )
+
+            with self._trace.span("gemini_live_service"):
+                self._llm_service = GeminiMultimodalLiveLLMService(
+                    api_key=os.getenv("GOOGLE_API_KEY"),
+                    model=os.getenv(
+                        "CONVERSATION_MODEL",
+                        "models/gemini-2.5-flash-preview-native-audio-dialog",
+                    ),
+                    system_instruction=system_instruction,
+                    voice_id="Puck",  # Aoede, Charon, Fenrir, Kore, Puck
+                    tools=ToolsSchema(
+                        standard_tools=[
+                            show_text_on_screen_schema,
+                            search_past_conversations_schema,
+                            add_todo_schema,
+                            complete_todo_schema,
+                            list_todos_schema,
+                            generate_single_page_app_schema,
+                        ],
+                        custom_tools={AdapterType.GEMINI: [{"google_search": {}}]},
+                    ),
+                )
             self._llm_service.register_function(
                 "show_text_on_screen", show_text_on_screen
             )
+            self._llm_service.register_function(
+                "search_past_conversations", self.search_past_conversations
+            )
+            self._llm_service.register_function("add_todo", self.add_todo)
+            self._llm_service.register_function("complete_todo", self.complete_todo)
+            self._llm_service.register_function("list_todos", self.list_todos)
             self._llm_service.register_function(
                 "generate_single_page_app", self._gen_app.generate_single_page_app
             )
         return self._llm_service
 
-    async def load_system_instruction(self, filename: str):
-        with open(filename, "r") as f:
-            core_instruction = f.read()
+    async def search_past_conversations(self, params: FunctionCallParams):
+        query = params.arguments.get("query", "")
+        limit = min(int(params.arguments.get("limit") or 10), 50)
+        logger.info(f"Searching past conversations for: {query}")
+        turns = await search_turns(self._supabase, self._user_id, query, limit)
+        matches = [
+            {
+                "timestamp": turn["timestamp"],
+                "conversation_id": turn["conversation_id"],
+                "role": turn["role"],
+                "content": turn["content"][:SEARCH_RESULT_CHARS],
+            }
+            for turn in turns
+        ]
+        await params.result_callback({"result": "success", "matches": matches})
 
-        recent_conversations = await fetch_and_format(
-            self._supabase, self._user_id, oldest=OLDEST_CONVERSATION_DATETIME
+    async def add_todo(self, params: FunctionCallParams):
+        args = params.arguments
+        logger.info(f"Adding todo: {args}")
+        todo = await add_todo(
+            self._supabase,
+            self._user_id,
+            args["title"],
+            list_name=args.get("list_name") or "todo",
+            due_date=parse_due_date(args.get("due_date")),
+            notes=args.get("notes"),
         )
+        if todo is None:
+            await params.result_callback({"result": "error", "error": "Could not save the item"})
+            return
+        await params.result_callback({"result": "success", "todo": todo})
+
+    async def complete_todo(self, params: FunctionCallParams):
+        todo_id = int(params.arguments["todo_id"])
+        logger.info(f"Completing todo {todo_id}")
+        todo = await complete_todo(self._supabase, self._user_id, todo_id)
+        if todo is None:
+            await params.result_callback(
+                {"result": "error", "error": f"No item with id {todo_id}"}
+            )
+            return
+        await params.result_callback({"result": "success", "todo": todo})
+
+    async def list_todos(self, params: FunctionCallParams):
+        args = params.arguments
+        todos = await list_todos(
+            self._supabase,
+            self._user_id,
+            status=None if args.get("include_completed") else "open",
+            list_name=args.get("list_name"),
+        )
+        await params.result_callback({"result": "success", "todos": format_todos(todos)})
+
+    async def load_system_instruction(self, filename: str):
+        with self._trace.span("read_system_instruction_file"):
+            with open(filename, "r") as f:
+                core_instruction = f.read()
+
+        async def fetch_history():
+            if not HISTORY_WINDOW:
+                return ""
+            with self._trace.span("fetch_history"):
+                return await self._context_cache.get_history(
+                    self._supabase,
+                    self._user_id,
+                    oldest=datetime.now(timezone.utc) - HISTORY_WINDOW,
+                )
+
+        async def fetch_todos():
+            with self._trace.span("fetch_todos"):
+                return await list_todos(
+                    self._supabase, self._user_id, limit=MAX_INJECTED_TODOS
+                )
+
+        recent_conversations, todos = await asyncio.gather(fetch_history(), fetch_todos())
         system_instruction = f"""
 The current date and time now is {datetime.now().astimezone().strftime("%A, %B %d, %Y, at %I:%M %p")}.
 
+# Current Todos
+
+These are the user's open items from the todos table, grouped by list. Use the #id with complete_todo.
+
+{format_todos(todos) or "(no open items)"}
+
 {core_instruction}
 
 {recent_conversations}
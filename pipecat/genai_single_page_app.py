@@ -2,10 +2,17 @@ from pipecat.adapters.schemas.function_schema import FunctionSchema
 from pipecat.services.llm_service import FunctionCallParams
 from pipecat.processors.frameworks.rtvi import RTVIServerMessageFrame
 from loguru import logger
+import asyncio
 import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
 
-# google generative ai imports
-from google import genai
+from app_cache import AppCache, app_cache_key, get_app_cache
+from client_registry import get_client_registry
+from generation_jobs import GenerationJobManager
+
+# APP_MODEL = "gemini-2.5-pro-preview-05-06"
+APP_MODEL = "gemini-2.5-flash-preview-05-20"
 
 system_instruction = """
 You are an expert AI programmer specialized in generating single page JavaScript apps.
@@ -39,15 +46,124 @@ As an example, here is a very simple app.
 """
 
 
+# Generated code is merged into frames of up to this many bytes, or whatever
+# arrived within this many milliseconds, whichever comes first.
+CODE_FRAME_MAX_BYTES = int(os.getenv("CODE_FRAME_MAX_BYTES", "4096"))
+CODE_FRAME_MAX_DELAY_MS = float(os.getenv("CODE_FRAME_MAX_DELAY_MS", "50"))
+
+
+class CodeFrameCoalescer:
+    """Merges streamed model chunks into fewer RTVI server-message frames.
+
+    Text is buffered until `max_bytes` is reached or `max_delay` seconds have
+    passed since the first buffered chunk, then pushed as a single frame.
+    Call flush() before sending anything that must follow the buffered text,
+    such as web-application-end.
+    """
+
+    def __init__(
+        self,
+        push_frame: Callable[[RTVIServerMessageFrame], Awaitable[None]],
+        key: str = "web-application-code",
+        max_bytes: int = CODE_FRAME_MAX_BYTES,
+        max_delay: float = CODE_FRAME_MAX_DELAY_MS / 1000,
+    ):
+        self._push_frame = push_frame
+        self._key = key
+        self._max_bytes = max_bytes
+        self._max_delay = max_delay
+        self._parts: List[str] = []
+        self._size = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        self._chunks_in = 0
+        self._frames_out = 0
+        self._bytes_out = 0
+        self._last_push: Optional[float] = None
+        self._intervals: List[float] = []
+
+    def stats(self) -> Dict:
+        intervals = self._intervals
+        return {
+            "chunks": self._chunks_in,
+            "frames": self._frames_out,
+            "bytes": self._bytes_out,
+            "avg_frame_interval": sum(intervals) / len(intervals) if intervals else None,
+            "min_frame_interval": min(intervals) if intervals else None,
+            "max_frame_interval": max(intervals) if intervals else None,
+        }
+
+    async def add(self, text: str):
+        self._chunks_in += 1
+        self._parts.append(text)
+        self._size += len(text.encode("utf-8"))
+        if self._size >= self._max_bytes:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        async with self._lock:
+            if not self._parts:
+                return
+            text = "".join(self._parts)
+            self._parts = []
+            self._size = 0
+            await self._push_frame(RTVIServerMessageFrame(data={self._key: text}))
+
+            now = time.monotonic()
+            if self._last_push is not None:
+                self._intervals.append(now - self._last_push)
+            self._last_push = now
+            self._frames_out += 1
+            self._bytes_out += len(text.encode("utf-8"))
+
+    async def close(self):
+        """Stop the pending flush timer without sending buffered text."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def _flush_later(self):
+        await asyncio.sleep(self._max_delay)
+        await self.flush()
+
+
 class GenaiSinglePageApp:
     """Helper service to generate a single page app using Google's GenAI."""
 
-    def __init__(self):
-        # initialize the genai client
-        self._client = genai.Client(
-            api_key=os.getenv("GOOGLE_API_KEY"),
-            http_options=genai.types.HttpOptions(api_version="v1alpha"),
-        )
+    def __init__(
+        self,
+        app_cache: Optional[AppCache] = None,
+        jobs: Optional[GenerationJobManager] = None,
+    ):
+        self._app_cache = app_cache if app_cache is not None else get_app_cache()
+        self._jobs = jobs
+
+    async def _generate(self, prompt: str) -> AsyncIterator[str]:
+        """Stream the model output for prompt."""
+        from google.genai import types
+
+        # shared with other sessions in this process; created on first use
+        # so sessions that never generate an app don't import google.genai
+        client = get_client_registry().genai("v1alpha")
+        async for chunk in await client.aio.models.generate_content_stream(
+            model=APP_MODEL,
+            config=types.GenerateContentConfig(
+                system_instruction=system_instruction,
+                thinking_config=types.ThinkingConfig(
+                    include_thoughts=True, thinking_budget=6144
+                ),
+            ),
+            contents=prompt,
+        ):
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
 
     async def generate_single_page_app(self, params: FunctionCallParams):
         """Generate a single page app from a prompt and stream the results."""
@@ -61,39 +177,45 @@ class GenaiSinglePageApp:
                 "response_content": "I will generate that application for you. Please be patient.",
             }
         )
-        await params.llm.push_frame(
-            RTVIServerMessageFrame(data={"display-pre-text": "Generating app..."})
+        if self._jobs is None:
+            await self._stream_app(prompt, params.llm.push_frame)
+            return
+        # run in the background so the user can interrupt or ask for another app
+        await self._jobs.submit(
+            "generate_single_page_app",
+            self._stream_app(prompt, params.llm.push_frame),
+            params.llm.push_frame,
         )
-        await params.llm.push_frame(RTVIServerMessageFrame(data={"web-application-start": True}))
 
+    async def _stream_app(
+        self, prompt: str, push_frame: Callable[[RTVIServerMessageFrame], Awaitable[None]]
+    ):
+        await push_frame(RTVIServerMessageFrame(data={"display-pre-text": "Generating app..."}))
+        await push_frame(RTVIServerMessageFrame(data={"web-application-start": True}))
+
+        coalescer = CodeFrameCoalescer(push_frame)
+        if self._app_cache is not None:
+            # replays a cached app, or shares an identical generation in progress
+            key = app_cache_key(prompt, APP_MODEL, system_instruction)
+            stream = self._app_cache.stream(key, lambda: self._generate(prompt))
+        else:
+            stream = self._generate(prompt)
         try:
-            # stream the model output
-            async for chunk in await self._client.aio.models.generate_content_stream(
-                # model="gemini-2.5-pro-preview-05-06",
-                model="gemini-2.5-flash-preview-05-20",
-                config=genai.types.GenerateContentConfig(
-                    system_instruction=system_instruction,
-                    thinking_config=genai.types.ThinkingConfig(
-                        include_thoughts=True, thinking_budget=6144
-                    ),
-                ),
-                contents=prompt,
-            ):
-                text = getattr(chunk, "text", "")
-                logger.debug(f"Generated chunk: {text}")
-                if not text:
-                    continue
-                await params.llm.push_frame(
-                    RTVIServerMessageFrame(data={"web-application-code": text})
-                )
+            async for text in stream:
+                await coalescer.add(text)
+            await coalescer.flush()
         except Exception as e:
-            await params.llm.push_frame(RTVIServerMessageFrame(data={"web-application-end": True}))
+            await coalescer.flush()
+            await push_frame(RTVIServerMessageFrame(data={"web-application-end": True}))
             logger.error(f"Error generating single page app: {e}")
-            await params.llm.push_frame(
-                RTVIServerMessageFrame(data={"display-pre-text": f"Error: {e}"})
-            )
+            await push_frame(RTVIServerMessageFrame(data={"display-pre-text": f"Error: {e}"}))
             return
-        await params.llm.push_frame(RTVIServerMessageFrame(data={"web-application-end": True}))
+        finally:
+            # a cancelled job must also stop the upstream generation
+            await stream.aclose()
+            await coalescer.close()
+            logger.debug(f"Generated code frames: {coalescer.stats()}")
+        await push_frame(RTVIServerMessageFrame(data={"web-application-end": True}))
 
     def generate_single_page_app_schema(self):
         return FunctionSchema(
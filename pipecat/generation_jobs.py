@@ -0,0 +1,121 @@
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Coroutine, Dict, List, Optional
+
+from loguru import logger
+from pipecat.processors.frameworks.rtvi import RTVIServerMessageFrame
+
+
+@dataclass
+class GenerationJob:
+    id: int
+    kind: str
+    push_frame: Callable[[RTVIServerMessageFrame], Awaitable[None]]
+    task: Optional[asyncio.Task] = None
+    started_at: float = field(default_factory=time.monotonic)
+    status: str = "running"
+
+
+class GenerationJobManager:
+    """Runs long generations for one session outside the function-call handler.
+
+    Jobs run as their own tasks, so the LLM service is free as soon as the
+    handler returns. At most `max_concurrent` jobs of a kind run at once;
+    submitting another cancels the oldest running one, since the user has
+    asked for something newer. cancel_all() stops everything when the client
+    goes away. Each status change is sent to the client as a
+    `generation-job` RTVI server message.
+    """
+
+    def __init__(self, max_concurrent: int = 1):
+        self._max_concurrent = max_concurrent
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, GenerationJob] = {}
+        self._closed = False
+        self._counts = {"completed": 0, "cancelled": 0, "failed": 0}
+
+    def stats(self) -> Dict:
+        return {"running": len(self._jobs), **self._counts}
+
+    async def submit(
+        self,
+        kind: str,
+        coro: Coroutine,
+        push_frame: Callable[[RTVIServerMessageFrame], Awaitable[None]],
+    ) -> Optional[GenerationJob]:
+        if self._closed:
+            coro.close()
+            return None
+
+        running = sorted(
+            (job for job in self._jobs.values() if job.kind == kind),
+            key=lambda job: job.started_at,
+        )
+        for job in running[: max(0, len(running) - self._max_concurrent + 1)]:
+            logger.info(f"Cancelling superseded {kind} job {job.id}")
+            job.status = "superseded"
+            if job.task is not None:
+                job.task.cancel()
+
+        job = GenerationJob(id=next(self._ids), kind=kind, push_frame=push_frame)
+        self._jobs[job.id] = job
+        # report before starting so "running" always reaches the client first
+        await self._report(job)
+        if self._closed or job.status == "superseded":
+            self._jobs.pop(job.id)
+            coro.close()
+            return None
+        job.task = asyncio.create_task(self._run(job.id, coro))
+        return job
+
+    async def cancel_all(self):
+        """Cancel every running job and refuse new ones."""
+        self._closed = True
+        tasks: List[asyncio.Task] = [
+            job.task for job in self._jobs.values() if job.task is not None
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            logger.info(f"Cancelled {len(tasks)} generation job(s)")
+
+    async def _run(self, job_id: int, coro: Coroutine):
+        try:
+            await coro
+            status = "completed"
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except Exception as e:
+            logger.exception(f"Generation job {job_id} failed: {e}")
+            status = "failed"
+
+        job = self._jobs.pop(job_id)
+        self._counts[status] += 1
+        if job.status != "superseded":
+            job.status = status
+        logger.debug(
+            f"{job.kind} job {job.id} {job.status} after "
+            f"{time.monotonic() - job.started_at:.2f}s"
+        )
+        # nobody is listening once the session is shutting down
+        if not self._closed:
+            await self._report(job)
+
+    async def _report(self, job: GenerationJob):
+        try:
+            await job.push_frame(
+                RTVIServerMessageFrame(
+                    data={
+                        "generation-job": {
+                            "id": job.id,
+                            "kind": job.kind,
+                            "status": job.status,
+                        }
+                    }
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Could not report {job.kind} job {job.id} status: {e}")
@@ -0,0 +1,209 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from supabase import AsyncClient
+
+from client_registry import get_client_registry
+from supa.utils.supabase_helpers import (
+    fetch_conversation_summaries,
+    format_conversation_header,
+    format_history,
+    format_turn,
+    save_conversation_summary,
+)
+
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-2.5-flash")
+
+summary_instruction = """
+Summarize this conversation between a user and their todo-list assistant.
+
+Keep every task, deadline, priority and decision the user mentioned, and
+whether each task was completed. Drop greetings and small talk. Answer with
+short plain-text lines, no markdown.
+"""
+
+# Placeholder length for conversations whose summary is not computed yet.
+EXCERPT_CHARS = 400
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Gemini text, about four characters per token."""
+    return (len(text) + 3) // 4
+
+
+class HistoryCompactor:
+    """Fits the recent-conversations block into a token budget.
+
+    The newest conversations are kept verbatim for as long as they fit; if
+    the newest one alone does not, its latest turns are kept instead, so
+    the block never comes back empty. Older ones are replaced by their stored summary from the
+    conversation_summaries table. Missing or stale summaries are computed in
+    the background and saved, and this time the conversation is represented
+    by a short excerpt so session start never waits on the summarizer.
+    """
+
+    def __init__(self, token_budget: int, genai_client=None, model: str = SUMMARY_MODEL):
+        self._token_budget = token_budget
+        self._genai_client = genai_client
+        self._model = model
+        self._pending: Set[Tuple[str, str]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.compactions = 0
+        self.last_tokens_before = 0
+        self.last_tokens_after = 0
+
+    @property
+    def token_budget(self) -> int:
+        return self._token_budget
+
+    def stats(self) -> Dict:
+        return {
+            "compactions": self.compactions,
+            "token_budget": self._token_budget,
+            "last_tokens_before": self.last_tokens_before,
+            "last_tokens_after": self.last_tokens_after,
+        }
+
+    def over_budget(self, text: str) -> bool:
+        return estimate_tokens(text) > self._token_budget
+
+    async def compact(
+        self,
+        client: AsyncClient,
+        user_id: str,
+        history: List[Tuple[str, List[Dict]]],
+    ) -> str:
+        blocks = [format_history([conversation]) for conversation in history]
+        self.last_tokens_before = sum(estimate_tokens(b) for b in blocks)
+        if self.last_tokens_before <= self._token_budget:
+            self.last_tokens_after = self.last_tokens_before
+            return "".join(blocks)
+
+        # keep the newest conversations verbatim while they fit
+        remaining = self._token_budget
+        verbatim = len(history)
+        while verbatim > 0 and estimate_tokens(blocks[verbatim - 1]) <= remaining:
+            verbatim -= 1
+            remaining -= estimate_tokens(blocks[verbatim])
+
+        older = history[:verbatim]
+        latest = ""
+        if verbatim == len(history):
+            latest = _latest_turns(history[-1][1], remaining)
+            remaining -= estimate_tokens(latest)
+            older = history[:-1]
+        summaries = await fetch_conversation_summaries(
+            client, user_id, [cid for cid, _ in older]
+        )
+
+        # then add summaries, newest first, dropping whatever no longer fits
+        compacted: List[str] = []
+        for conversation_id, turns in reversed(older):
+            stored = summaries.get(conversation_id)
+            if stored and stored["turn_count"] == len(turns):
+                body = stored["summary"].strip()
+                note = " (summary)"
+            else:
+                self._schedule_summary(client, user_id, conversation_id, turns)
+                body = _excerpt(turns)
+                note = " (excerpt)"
+            block = format_conversation_header(turns[0]["timestamp"], note) + body + "\n\n\n"
+            if estimate_tokens(block) > remaining:
+                break
+            remaining -= estimate_tokens(block)
+            compacted.append(block)
+
+        text = "".join(reversed(compacted)) + latest + "".join(blocks[verbatim:])
+        self.compactions += 1
+        self.last_tokens_after = estimate_tokens(text)
+        logger.info(
+            f"Compacted history for {user_id}: {self.last_tokens_before} -> "
+            f"{self.last_tokens_after} tokens, {len(history) - verbatim} verbatim, "
+            f"{1 if latest else 0} cut to its latest turns, "
+            f"{len(compacted)} condensed, {len(older) - len(compacted)} dropped"
+        )
+        return text
+
+    def _schedule_summary(self, client, user_id, conversation_id, turns):
+        key = (user_id, conversation_id)
+        if key in self._pending:
+            return
+        self._pending.add(key)
+        task = asyncio.create_task(
+            self._summarize(client, user_id, conversation_id, turns)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, client, user_id, conversation_id, turns):
+        from google.genai import types
+
+        try:
+            response = await self._genai().aio.models.generate_content(
+                model=self._model,
+                config=types.GenerateContentConfig(
+                    system_instruction=summary_instruction
+                ),
+                contents=format_history([(conversation_id, turns)]),
+            )
+            summary = getattr(response, "text", "") or ""
+            if summary.strip():
+                await save_conversation_summary(
+                    client,
+                    {
+                        "user_id": user_id,
+                        "conversation_id": conversation_id,
+                        "turn_count": len(turns),
+                        "summary": summary.strip(),
+                        "model": self._model,
+                    },
+                )
+        except Exception as e:
+            logger.error(f"Error summarizing conversation {conversation_id}: {e}")
+        finally:
+            self._pending.discard((user_id, conversation_id))
+
+    def _genai(self):
+        # this compactor outlives event loops in pool workers, so the shared
+        # client is looked up for the current loop every time
+        return self._genai_client or get_client_registry().genai()
+
+
+def _excerpt(turns: List[Dict]) -> str:
+    text = " / ".join(f"{t['role']}: {t['content']}" for t in turns)
+    if len(text) > EXCERPT_CHARS:
+        text = text[:EXCERPT_CHARS].rstrip() + " ..."
+    return text
+
+
+def _latest_turns(turns: List[Dict], token_budget: int) -> str:
+    """A conversation block with as many of its newest turns as fit token_budget.
+
+    If not even the last turn fits, the end of it is kept, at least
+    EXCERPT_CHARS characters.
+    """
+    header = format_conversation_header(turns[0]["timestamp"], " (latest turns)")
+    remaining = token_budget - estimate_tokens(header) - 1
+    kept: List[str] = []
+    for turn in reversed(turns):
+        block = format_turn(turn)
+        if estimate_tokens(block) > remaining:
+            break
+        remaining -= estimate_tokens(block)
+        kept.append(block)
+    if not kept:
+        content = turns[-1]["content"]
+        chars = max(remaining * 4, EXCERPT_CHARS)
+        if len(content) > chars:
+            content = "... " + content[-chars:].lstrip()
+        kept.append(format_turn({"role": turns[-1]["role"], "content": content}))
+    return header + "".join(reversed(kept)) + "\n"
+
+
+def history_compactor_from_env() -> Optional[HistoryCompactor]:
+    """HistoryCompactor using HISTORY_TOKEN_BUDGET, or None if it is 0."""
+    budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "16000"))
+    return HistoryCompactor(budget) if budget > 0 else None
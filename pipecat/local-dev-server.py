@@ -1,5 +1,7 @@
+import asyncio
 import os
-from typing import Dict, Any
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Set
 from fastapi import HTTPException
 from fastapi import Request
 import subprocess
@@ -10,12 +12,38 @@ import json
 
 import dotenv
 
+from client_registry import close_client_registry, get_client_registry
+from context_cache import HISTORY_WINDOW, get_context_cache
+from todo_turns_feed import close_todo_turns_feed, start_todo_turns_feed
+from worker_pool import WorkerPool
+
 dotenv.load_dotenv()
 
 
 DAILY_ROOM_URL = os.getenv("DAILY_ROOM_URL")
 DAILY_TOKEN = os.getenv("DAILY_TOKEN")
 
+# Number of pre-started bot workers; 0 starts a fresh bot.py process per connect.
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "0"))
+BOT_WORKER_MAX_SESSIONS = int(os.getenv("BOT_WORKER_MAX_SESSIONS", "20"))
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# Fetch the user's history while the bot starts. Bots run in other
+# processes (pool workers or one per connect), so a memory cache here is
+# never seen by them: this needs the shared sqlite context cache. Sessions
+# started through Pipecat Cloud (client/src/app/api/connect) get no
+# prefetch either; their bot fetches its history itself.
+CONTEXT_PREFETCH_REQUESTED = os.getenv("CONTEXT_PREFETCH", "1") != "0" and bool(HISTORY_WINDOW)
+CONTEXT_PREFETCH = (
+    CONTEXT_PREFETCH_REQUESTED
+    and os.getenv("CONTEXT_CACHE_BACKEND", "memory") == "sqlite"
+)
+
+pool: Optional[WorkerPool] = None
+prefetches: Set[asyncio.Task] = set()
+
 app = FastAPI()
 
 app.add_middleware(
@@ -27,6 +55,62 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def start_worker_pool():
+    global pool
+    if BOT_WORKERS > 0:
+        pool = WorkerPool(BOT_WORKERS, max_sessions=BOT_WORKER_MAX_SESSIONS)
+        await pool.start()
+    if CONTEXT_PREFETCH:
+        # a prefetched entry is handed over unchecked, unless new turns arrive
+        start_todo_turns_feed()
+    elif CONTEXT_PREFETCH_REQUESTED:
+        print("Context prefetch is off: bots run in other processes, set CONTEXT_CACHE_BACKEND=sqlite")
+
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    if pool:
+        await pool.stop()
+    for task in prefetches:
+        task.cancel()
+    await asyncio.gather(*prefetches, return_exceptions=True)
+    await close_todo_turns_feed()
+    await close_client_registry()
+
+
+async def prefetch_context(user_id: str, access_token: Optional[str]):
+    cache = get_context_cache()
+    try:
+        supabase = await get_client_registry().supabase(
+            SUPABASE_URL, SUPABASE_KEY, access_token
+        )
+    except Exception as e:
+        print(f"Context prefetch for {user_id} failed: {e!r}")
+        await cache.cancel_prefetch(user_id)
+        return
+    await cache.prefetch(supabase, user_id, oldest=datetime.now(timezone.utc) - HISTORY_WINDOW)
+
+
+async def start_context_prefetch(body: Optional[Dict]):
+    """Start loading the user's history into the context cache for their bot."""
+    body = body or {}
+    # the same user_id the bot will use
+    user_id = body.get("user_id", os.getenv("USER_ID", "generic_user"))
+    await get_context_cache().mark_prefetching(user_id)
+    task = asyncio.create_task(prefetch_context(user_id, body.get("access_token")))
+    prefetches.add(task)
+    task.add_done_callback(prefetches.discard)
+
+
+@app.get("/pool")
+async def pool_stats() -> Dict[Any, Any]:
+    """Worker pool state and cold/warm time-to-bot-start."""
+    if pool is None:
+        raise HTTPException(status_code=404, detail="Worker pool is disabled")
+    return pool.stats()
+
+
 @app.post("/connect")
 async def rtvi_connect(request: Request) -> Dict[Any, Any]:
     """RTVI connect endpoint that creates a room and returns connection credentials.
@@ -45,6 +129,16 @@ async def rtvi_connect(request: Request) -> Dict[Any, Any]:
     body = await request.json()
     print(f"Body: {body}")
 
+    if CONTEXT_PREFETCH:
+        await start_context_prefetch(body)
+
+    if pool is not None:
+        try:
+            await pool.dispatch(body)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to dispatch bot: {e}")
+        return {"room_url": room_url, "token": token}
+
     # Start the bot process
     try:
         bot_file = "bot.py"
@@ -74,8 +168,22 @@ if __name__ == "__main__":
     parser.add_argument("--host", type=str, default=default_host, help="Host address")
     parser.add_argument("--port", type=int, default=default_port, help="Port number")
     parser.add_argument("--reload", action="store_true", help="Reload code on change")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=BOT_WORKERS,
+        help="Pre-started bot workers (0 starts a new process per connect)",
+    )
+    parser.add_argument(
+        "--worker-max-sessions",
+        type=int,
+        default=BOT_WORKER_MAX_SESSIONS,
+        help="Recycle a worker after this many sessions",
+    )
 
     config = parser.parse_args()
+    BOT_WORKERS = config.workers
+    BOT_WORKER_MAX_SESSIONS = config.worker_max_sessions
 
     # Start the FastAPI server
     uvicorn.run(
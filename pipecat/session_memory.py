@@ -0,0 +1,69 @@
+import sys
+from typing import Callable, Dict, List, Optional
+
+
+def deep_size(obj, _seen: Optional[set] = None) -> int:
+    """Approximate bytes held by a tree of dicts, lists, tuples and strings."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_size(key, _seen) + deep_size(value, _seen)
+    elif isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            size += deep_size(item, _seen)
+    return size
+
+
+class SessionMemory:
+    """Bytes a session holds in memory, by component.
+
+    Components register a function that returns their current size, so a
+    snapshot always reflects the live objects and costs nothing between
+    snapshots.
+    """
+
+    def __init__(self, session_id: str, user_id: Optional[str] = None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self._sources: Dict[str, Callable[[], int]] = {}
+
+    def track(self, name: str, size: Callable[[], int]):
+        self._sources[name] = size
+
+    def snapshot(self) -> Dict:
+        components = {name: size() for name, size in self._sources.items()}
+        return {
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "components": components,
+            "total_bytes": sum(components.values()),
+        }
+
+
+# session ids are not unique (local runs all use "local-dev"), so sessions
+# are tracked by identity
+_sessions: List[SessionMemory] = []
+
+
+def open_session_memory(session_id: str, user_id: Optional[str] = None) -> SessionMemory:
+    """Start accounting for a session; call close_session_memory when it ends."""
+    memory = SessionMemory(session_id, user_id)
+    _sessions.append(memory)
+    return memory
+
+
+def close_session_memory(memory: SessionMemory) -> Dict:
+    """Stop accounting for a session, returning its last snapshot."""
+    if memory in _sessions:
+        _sessions.remove(memory)
+    return memory.snapshot()
+
+
+def session_memory_report() -> List[Dict]:
+    """Snapshots of every session running in this process."""
+    return [memory.snapshot() for memory in _sessions]
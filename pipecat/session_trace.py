@@ -0,0 +1,156 @@
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from loguru import logger
+from pipecat.frames.frames import BotStartedSpeakingFrame
+from pipecat.observers.base_observer import BaseObserver, FramePushed
+
+# One JSON line per session is appended here; set to "" to disable. Kept
+# out of the working directory, which is the source tree in local runs.
+SESSION_TRACE_LOG = os.getenv(
+    "SESSION_TRACE_LOG", os.path.join(tempfile.gettempdir(), "session-traces.jsonl")
+)
+
+
+class SessionTrace:
+    """Named spans on the bot's session-start path.
+
+    Offsets are monotonic seconds since the trace was created (the start of
+    bot.main). Spans can nest; marks are zero-length events such as the
+    client becoming ready.
+    """
+
+    def __init__(self, session_id: str, **attributes):
+        self.session_id = session_id
+        self.attributes = attributes
+        self.spans: List[Dict] = []
+        self._started = time.monotonic()
+        self._started_at = datetime.now(timezone.utc)
+        # the enclosing span, tracked per asyncio task so concurrent steps nest correctly
+        self._parent: ContextVar[Optional[str]] = ContextVar(
+            f"session_trace_parent_{id(self)}", default=None
+        )
+        self._written = False
+
+    def _offset(self) -> float:
+        return time.monotonic() - self._started
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        start = self._offset()
+        parent = self._parent.get()
+        token = self._parent.set(name)
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._parent.reset(token)
+            span = {
+                "name": name,
+                "start": start,
+                "end": self._offset(),
+                "parent": parent,
+            }
+            span["duration"] = span["end"] - span["start"]
+            if attributes:
+                span["attributes"] = attributes
+            if error:
+                span["error"] = error
+            self.spans.append(span)
+
+    def mark(self, name: str, once: bool = True, **attributes):
+        if once and any(s["name"] == name for s in self.spans):
+            return
+        offset = self._offset()
+        span = {"name": name, "start": offset, "end": offset, "duration": 0.0, "parent": None}
+        if attributes:
+            span["attributes"] = attributes
+        self.spans.append(span)
+
+    def to_record(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "started_at": self._started_at.isoformat(),
+            "attributes": self.attributes,
+            "spans": sorted(self.spans, key=lambda s: s["start"]),
+        }
+
+    def write(self, path: Optional[str] = SESSION_TRACE_LOG):
+        """Append the trace as one JSON line and export it if configured."""
+        if self._written:
+            return
+        self._written = True
+        if path:
+            try:
+                with open(path, "a") as f:
+                    f.write(json.dumps(self.to_record()) + "\n")
+            except OSError as e:
+                logger.error(f"Error writing session trace: {e}")
+        if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+            self._export_otel()
+
+    def _export_otel(self):
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                OTLPSpanExporter,
+            )
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+            from opentelemetry.trace import set_span_in_context
+        except ImportError:
+            logger.warning(
+                "OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk and "
+                "opentelemetry-exporter-otlp-proto-http are not installed"
+            )
+            return
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": "todo-bot"})
+        )
+        provider.add_span_processor(SimpleSpanProcessor(OTLPSpanExporter()))
+        tracer = provider.get_tracer("session_trace")
+
+        base_ns = int(self._started_at.timestamp() * 1e9)
+        end = max((s["end"] for s in self.spans), default=0.0)
+        root = tracer.start_span(
+            "session",
+            start_time=base_ns,
+            attributes={"session_id": self.session_id, **self.attributes},
+        )
+        contexts = {None: set_span_in_context(root)}
+        # parents finish after their children, so open spans by start time
+        for span in sorted(self.spans, key=lambda s: s["start"]):
+            otel_span = tracer.start_span(
+                span["name"],
+                context=contexts.get(span["parent"], contexts[None]),
+                start_time=base_ns + int(span["start"] * 1e9),
+                attributes=span.get("attributes"),
+            )
+            contexts[span["name"]] = set_span_in_context(otel_span)
+            otel_span.end(end_time=base_ns + int(span["end"] * 1e9))
+        root.end(end_time=base_ns + int(end * 1e9))
+        provider.shutdown()
+
+
+class SessionTraceObserver(BaseObserver):
+    """Marks the first time the bot starts speaking."""
+
+    def __init__(self, trace: SessionTrace):
+        super().__init__()
+        self._trace = trace
+        self._seen = False
+
+    async def on_push_frame(self, data: FramePushed):
+        if not self._seen and isinstance(data.frame, BotStartedSpeakingFrame):
+            self._seen = True
+            self._trace.mark("first_bot_speech")
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Moves old conversations out of todo_turns into compressed local archive files.
+Usage: archive_todo_turns.py --archive_dir DIR [--older_than_days DAYS]
+                             [--format parquet|ndjson.gz] [--batch_conversations N]
+                             [--drop_empty_partitions] [--dry_run]
+
+The archive directory must be an absolute path (--archive_dir or
+TODO_TURNS_ARCHIVE_DIR), since the manifest only records file names and
+fetch_todo_turn.py has to find the same files later from wherever it runs.
+
+Run it on a schedule (e.g. nightly cron). Conversations whose last turn is
+older than the horizon are archived whole, a batch at a time: the batch's
+turns are written to one archive file first, then deleted from todo_turns and
+conversations and recorded in the archived_conversations manifest in one
+short transaction. A failed run leaves at most an unreferenced file behind.
+
+fetch_todo_turn.py reads archived conversations back through the manifest.
+Parquet archives use the bulk_todo_turns.py column layout, so they can also
+be restored with `bulk_todo_turns.py import`. Parquet needs pyarrow; use
+--format ndjson.gz without it.
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import uuid
+import argparse
+import psycopg2
+import psycopg2.extras
+import logging
+from datetime import datetime, timedelta, timezone
+
+ARCHIVE_DIR = os.getenv("TODO_TURNS_ARCHIVE_DIR")
+ARCHIVE_COLUMNS = ["id", "timestamp", "user_id", "conversation_id", "role", "content"]
+
+select_conversations_query = """
+SELECT user_id, conversation_id
+FROM conversations
+WHERE last_ts < %s
+ORDER BY last_ts
+LIMIT %s;
+"""
+
+# timestamps are stored as ISO 8601 text, the same as PostgREST returns them
+select_turns_query = """
+SELECT t.id, to_json(t.timestamp) #>> '{}', t.user_id, t.conversation_id, t.role, t.content
+FROM todo_turns t
+JOIN unnest(%s::text[], %s::text[]) AS c(user_id, conversation_id)
+    ON t.user_id = c.user_id AND t.conversation_id = c.conversation_id
+WHERE t.timestamp < %s
+ORDER BY t.user_id, t.conversation_id, t.timestamp, t.id;
+"""
+
+# a conversation that received a turn after it was selected is left alone
+delete_conversations_query = """
+DELETE FROM conversations c
+USING unnest(%s::text[], %s::text[]) AS b(user_id, conversation_id)
+WHERE c.user_id = b.user_id AND c.conversation_id = b.conversation_id
+    AND c.last_ts < %s
+RETURNING c.user_id, c.conversation_id;
+"""
+
+# Deletes every turn of the archived conversations rather than the ids
+# read earlier, so a turn inserted in between (a transcript log replayed
+# late keeps its old timestamp) shows up as a count mismatch instead of
+# being left behind without a conversations row.
+delete_turns_query = """
+DELETE FROM todo_turns t
+USING unnest(%s::text[], %s::text[]) AS b(user_id, conversation_id)
+WHERE t.user_id = b.user_id AND t.conversation_id = b.conversation_id
+    AND t.timestamp < %s;
+"""
+
+partitions_query = """
+SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'todo_turns'::regclass;
+"""
+
+
+# ---------------------------------------------------------------------------
+# archive files
+
+
+def write_archive_file(path, rows, fmt):
+    """Write rows (tuples in ARCHIVE_COLUMNS order) to a compressed file."""
+    tmp_path = path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow
+        import pyarrow.parquet
+
+        schema = pyarrow.schema(
+            [("id", pyarrow.int64())] + [(c, pyarrow.string()) for c in ARCHIVE_COLUMNS[1:]]
+        )
+        columns = list(zip(*rows))
+        table = pyarrow.Table.from_arrays(
+            [pyarrow.array(list(values), type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        )
+        pyarrow.parquet.write_table(table, tmp_path, compression="zstd")
+    else:
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(dict(zip(ARCHIVE_COLUMNS, row))) + "\n")
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_archive_file(path, user_id=None, conversation_ids=None):
+    """Turns from an archive file as dicts, optionally filtered."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            print(f"Reading {path} needs pyarrow: pip install pyarrow", file=sys.stderr)
+            sys.exit(1)
+        rows = pyarrow.parquet.read_table(path).to_pylist()
+    else:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [
+        row
+        for row in rows
+        if (user_id is None or row["user_id"] == user_id)
+        and (conversation_ids is None or row["conversation_id"] in conversation_ids)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# archiving
+
+
+def archive_batch(conn, horizon, archive_dir, fmt, batch_conversations, lock_timeout_ms):
+    """Archive up to batch_conversations conversations.
+
+    Returns (selected, archived, turns); selected is below batch_conversations
+    once nothing older than horizon is left. If turns were added to the
+    batch's conversations after they were read, the batch is rolled back
+    and (selected, 0, 0) returned, to be selected again.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(select_conversations_query, (horizon, batch_conversations))
+        batch = cur.fetchall()
+        if not batch:
+            conn.commit()
+            return 0, 0, 0
+        user_ids = [user_id for user_id, _ in batch]
+        conversation_ids = [conversation_id for _, conversation_id in batch]
+        cur.execute(select_turns_query, (user_ids, conversation_ids, horizon))
+        rows = cur.fetchall()
+        conn.commit()
+
+        file_name = f"todo_turns-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.{fmt}"
+        if rows:
+            write_archive_file(os.path.join(archive_dir, file_name), rows, fmt)
+
+        cur.execute("SET LOCAL lock_timeout = %s;", (f"{int(lock_timeout_ms)}ms",))
+        cur.execute(delete_conversations_query, (user_ids, conversation_ids, horizon))
+        archived = set(cur.fetchall())
+        turns = {}
+        for row in rows:
+            key = (row[2], row[3])
+            if key in archived:
+                turns.setdefault(key, []).append(row)
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO archived_conversations
+                (user_id, conversation_id, archive_file, first_ts, last_ts, turn_count)
+            VALUES %s
+            ON CONFLICT DO NOTHING;
+            """,
+            [
+                (user_id, conversation_id, file_name, t[0][1], t[-1][1], len(t))
+                for (user_id, conversation_id), t in turns.items()
+            ],
+        )
+        # the conversations rows deleted above stay locked until commit, so
+        # inserts into these conversations from now on wait for it
+        archived_keys = list(turns)
+        cur.execute(
+            delete_turns_query,
+            ([k[0] for k in archived_keys], [k[1] for k in archived_keys], horizon),
+        )
+        deleted = cur.rowcount
+        expected = sum(len(t) for t in turns.values())
+        if deleted != expected:
+            conn.rollback()
+            logging.warning(
+                f"Turns were added to {len(archived)} conversations while archiving them "
+                f"({deleted} to delete, {expected} archived), retrying the batch"
+            )
+            if rows:
+                os.remove(os.path.join(archive_dir, file_name))
+            return len(batch), 0, 0
+        conn.commit()
+        return len(batch), len(archived), deleted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def drop_empty_partitions(conn, horizon):
+    """Detach and drop monthly partitions that end before horizon and are empty."""
+    cur = conn.cursor()
+    dropped = []
+    try:
+        cur.execute(partitions_query)
+        for name, bound in cur.fetchall():
+            match = re.search(r"TO \('([^']+)'\)", bound or "")
+            if not match:
+                continue  # the default partition
+            upper = datetime.fromisoformat(match.group(1))
+            if upper.tzinfo is None:
+                upper = upper.replace(tzinfo=timezone.utc)
+            if upper > horizon:
+                continue
+            cur.execute(f'SELECT EXISTS (SELECT 1 FROM "{name}");')
+            if cur.fetchone()[0]:
+                continue
+            cur.execute(f'ALTER TABLE todo_turns DETACH PARTITION "{name}";')
+            cur.execute(f'DROP TABLE "{name}";')
+            conn.commit()
+            dropped.append(name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return dropped
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Archive old todo_turns conversations")
+    parser.add_argument(
+        "--older_than_days",
+        type=float,
+        default=float(os.getenv("TODO_TURNS_ARCHIVE_DAYS", "90")),
+        help="Archive conversations whose last turn is older than this (default: 90)",
+    )
+    parser.add_argument(
+        "--archive_dir",
+        default=ARCHIVE_DIR,
+        help="Absolute path of the directory for archive files (default: TODO_TURNS_ARCHIVE_DIR)",
+    )
+    parser.add_argument("--format", choices=["parquet", "ndjson.gz"], default="parquet")
+    parser.add_argument("--batch_conversations", type=int, default=500, help="Conversations per batch (default: 500)")
+    parser.add_argument("--lock_timeout_ms", type=int, default=2000, help="Give up a batch if locks take longer (default: 2000)")
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds to sleep between batches (default: 0.1)")
+    parser.add_argument("--drop_empty_partitions", action="store_true", help="Drop monthly partitions emptied by archiving")
+    parser.add_argument("--dry_run", action="store_true", help="Only report what would be archived")
+    args = parser.parse_args()
+
+    if args.format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            logging.error("Parquet archives need pyarrow: pip install pyarrow, or use --format ndjson.gz")
+            sys.exit(1)
+    if not args.dry_run:
+        if not args.archive_dir or not os.path.isabs(args.archive_dir):
+            logging.error("Set --archive_dir or TODO_TURNS_ARCHIVE_DIR to an absolute path")
+            sys.exit(1)
+        os.makedirs(args.archive_dir, exist_ok=True)
+    horizon = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+
+    db_url = os.getenv("SUPABASE_DB_URL") or input("Enter your Supabase database URL (postgres://...): ")
+    try:
+        conn = psycopg2.connect(db_url)
+    except Exception as e:
+        logging.error(f"Error connecting to database: {e}", exc_info=True)
+        sys.exit(1)
+
+    started = time.monotonic()
+    total_conversations = total_turns = 0
+    try:
+        if args.dry_run:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT COUNT(*), COALESCE(SUM(turn_count), 0) FROM conversations WHERE last_ts < %s;",
+                (horizon,),
+            )
+            conversations, turns = cur.fetchone()
+            cur.close()
+            logging.info(
+                f"Would archive {conversations} conversations, {turns} turns older than {horizon:%Y-%m-%d}"
+            )
+            return
+        while True:
+            selected, conversations, turns = archive_batch(
+                conn,
+                horizon,
+                args.archive_dir,
+                args.format,
+                args.batch_conversations,
+                args.lock_timeout_ms,
+            )
+            total_conversations += conversations
+            total_turns += turns
+            if conversations:
+                logging.info(f"Archived {total_conversations} conversations, {total_turns} turns")
+            elif selected:
+                continue  # rolled back after a concurrent insert
+            if selected < args.batch_conversations:
+                break
+            time.sleep(args.pause)
+        if args.drop_empty_partitions:
+            for name in drop_empty_partitions(conn, horizon):
+                logging.info(f"Dropped empty partition {name}")
+    except Exception as e:
+        logging.error(f"Error archiving todo_turns: {e}", exc_info=True)
+        sys.exit(1)
+    finally:
+        conn.close()
+    logging.info(
+        f"Archived {total_conversations} conversations, {total_turns} turns older than "
+        f"{horizon:%Y-%m-%d} in {time.monotonic() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Utility script to rebuild the conversations summary table from todo_turns.
+Usage: backfill_conversations.py [--user_id USER_ID]
+
+Run this once after creating the conversations table on a database that
+already has todo_turns rows. The insert trigger keeps it current after that.
+"""
+
+import os
+import sys
+import argparse
+import psycopg2
+import logging
+
+BACKFILL_QUERY = """
+INSERT INTO conversations
+    (user_id, conversation_id, first_ts, last_ts, turn_count, byte_count)
+SELECT
+    user_id,
+    conversation_id,
+    MIN(timestamp),
+    MAX(timestamp),
+    COUNT(*),
+    COALESCE(SUM(octet_length(content)), 0)
+FROM todo_turns
+{where}
+GROUP BY user_id, conversation_id
+ON CONFLICT (user_id, conversation_id) DO UPDATE SET
+    first_ts = EXCLUDED.first_ts,
+    last_ts = EXCLUDED.last_ts,
+    turn_count = EXCLUDED.turn_count,
+    byte_count = EXCLUDED.byte_count;
+"""
+
+
+def backfill(cur, user_id=None):
+    """Recompute conversation summaries, optionally for a single user.
+
+    Holds a SHARE lock on todo_turns for the duration so concurrent inserts
+    cannot slip between the aggregate and the upsert.
+    """
+    cur.execute("LOCK TABLE todo_turns IN SHARE MODE;")
+    if user_id:
+        cur.execute(BACKFILL_QUERY.format(where="WHERE user_id = %s"), (user_id,))
+    else:
+        cur.execute(BACKFILL_QUERY.format(where=""))
+    return cur.rowcount
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Backfill the conversations summary table")
+    parser.add_argument("--user_id", help="Only backfill this user (optional)")
+    args = parser.parse_args()
+
+    db_url = os.getenv("SUPABASE_DB_URL") or input("Enter your Supabase database URL (postgres://...): ")
+    try:
+        conn = psycopg2.connect(db_url)
+    except Exception as e:
+        logging.error(f"Error connecting to database: {e}", exc_info=True)
+        sys.exit(1)
+    cur = conn.cursor()
+    try:
+        count = backfill(cur, args.user_id)
+        conn.commit()
+        logging.info(f"Backfilled {count} conversations")
+    except Exception as e:
+        logging.error(f"Error backfilling conversations: {e}", exc_info=True)
+        conn.rollback()
+        sys.exit(1)
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Bulk export and import of todo_turns rows using COPY.
+Usage: bulk_todo_turns.py export --output FILE [--format ndjson|csv|parquet]
+                                 [--user_id USER_ID] [--since TS] [--until TS] [--restart]
+       bulk_todo_turns.py import --input FILE [--format ndjson|csv|parquet]
+                                 [--user_id USER_ID] [--since TS] [--until TS] [--restart]
+
+Rows are moved in chunks of --chunk_rows. Each import chunk is committed in
+its own transaction together with a checkpoint in the bulk_import_checkpoints
+table, so an interrupted import can be run again and continues after the
+last committed chunk. Exports write a FILE.checkpoint next to the output
+(not for Parquet) and continue from it the same way. Checkpoints record the
+filters they were made with; a run with different filters stops instead of
+resuming, and --restart discards the checkpoint. A finished run deletes its
+checkpoint.
+
+Parquet needs pyarrow (pip install pyarrow).
+"""
+
+import os
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+import psycopg2
+import logging
+from datetime import datetime
+
+COLUMNS = ["timestamp", "user_id", "conversation_id", "role", "content"]
+EXPORT_COLUMNS = ["id"] + COLUMNS
+
+create_checkpoints_query = """
+CREATE TABLE IF NOT EXISTS bulk_import_checkpoints (
+    name text PRIMARY KEY,
+    records bigint NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+ALTER TABLE bulk_import_checkpoints ADD COLUMN IF NOT EXISTS filters jsonb;
+"""
+
+# Keyset pagination on (timestamp, id); timestamps are exported as ISO 8601.
+export_chunk_query = """
+COPY (
+    SELECT id, to_json(timestamp) #>> '{{}}', user_id, conversation_id, role, content
+    FROM todo_turns
+    WHERE {where}
+    ORDER BY timestamp, id
+    LIMIT {limit}
+) TO STDOUT WITH CSV
+"""
+
+
+def filter_conditions(cur, user_id=None, since=None, until=None, after=None):
+    conditions = ["true"]
+    if user_id:
+        conditions.append(cur.mogrify("user_id = %s", (user_id,)).decode())
+    if since:
+        conditions.append(cur.mogrify("timestamp >= %s", (since,)).decode())
+    if until:
+        conditions.append(cur.mogrify("timestamp < %s", (until,)).decode())
+    if after:
+        conditions.append(cur.mogrify("(timestamp, id) > (%s::timestamptz, %s)", after).decode())
+    return " AND ".join(conditions)
+
+
+def parse_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def checkpoint_filters(user_id=None, since=None, until=None):
+    """The filters a checkpoint is only valid for, in a comparable form."""
+    since, until = parse_time(since), parse_time(until)
+    return {
+        "user_id": user_id or None,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+    }
+
+
+def check_checkpoint_filters(saved, filters, where):
+    if saved != filters:
+        raise ValueError(
+            f"{where} was made with filters {saved}, not {filters}; "
+            "run with the same filters to resume, or pass --restart"
+        )
+
+
+class Throughput:
+    """Logs rows per second for each chunk and overall."""
+
+    def __init__(self, label):
+        self.label = label
+        self.rows = 0
+        self.started = time.monotonic()
+
+    def chunk(self, rows, chunk_started):
+        self.rows += rows
+        now = time.monotonic()
+        logging.info(
+            f"{self.label} {self.rows} rows "
+            f"({rows / max(now - chunk_started, 1e-9):,.0f} rows/s this chunk, "
+            f"{self.rows / max(now - self.started, 1e-9):,.0f} rows/s overall)"
+        )
+
+    def done(self):
+        elapsed = time.monotonic() - self.started
+        logging.info(
+            f"{self.label} {self.rows} rows in {elapsed:.1f}s "
+            f"({self.rows / max(elapsed, 1e-9):,.0f} rows/s)"
+        )
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        logging.error("Parquet support needs pyarrow: pip install pyarrow")
+        sys.exit(1)
+    return pyarrow
+
+
+# ---------------------------------------------------------------------------
+# export
+
+
+class _TextExportWriter:
+    """Appends NDJSON or CSV to the output, resumable at chunk boundaries."""
+
+    def __init__(self, path, fmt, checkpoint):
+        self.fmt = fmt
+        offset = checkpoint["offset"] if checkpoint else 0
+        self.file = open(path, "r+b" if checkpoint else "wb")
+        # drop anything written after the last checkpoint
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        if fmt == "csv" and not checkpoint:
+            self.file.write((",".join(EXPORT_COLUMNS) + "\n").encode("utf-8"))
+
+    def write(self, raw_csv, rows):
+        if self.fmt == "csv":
+            # COPY output is already CSV in the export column order
+            self.file.write(raw_csv.encode("utf-8"))
+        else:
+            for row in rows:
+                record = dict(zip(EXPORT_COLUMNS, row))
+                record["id"] = int(record["id"])
+                self.file.write((json.dumps(record) + "\n").encode("utf-8"))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetExportWriter:
+    def __init__(self, path):
+        pa = _require_pyarrow()
+        self.pa = pa
+        self.schema = pa.schema(
+            [("id", pa.int64())] + [(column, pa.string()) for column in COLUMNS]
+        )
+        self.writer = pa.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, raw_csv, rows):
+        columns = list(zip(*rows))
+        arrays = [self.pa.array([int(v) for v in columns[0]], self.pa.int64())]
+        arrays += [self.pa.array(list(values), self.pa.string()) for values in columns[1:]]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return None
+
+    def close(self):
+        self.writer.close()
+
+
+def export_turns(
+    conn, path, fmt, user_id=None, since=None, until=None, chunk_rows=50_000, restart=False
+):
+    checkpoint_path = path + ".checkpoint"
+    filters = checkpoint_filters(user_id, since, until)
+    checkpoint = None
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    if fmt != "parquet" and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        check_checkpoint_filters(
+            checkpoint.get("filters"), filters, f"Export checkpoint {checkpoint_path}"
+        )
+        logging.info(f"Resuming export after {checkpoint['rows']} rows")
+
+    writer = _ParquetExportWriter(path) if fmt == "parquet" else _TextExportWriter(path, fmt, checkpoint)
+    throughput = Throughput("Exported")
+    throughput.rows = checkpoint["rows"] if checkpoint else 0
+    after = tuple(checkpoint["after"]) if checkpoint else None
+    cur = conn.cursor()
+    try:
+        while True:
+            chunk_started = time.monotonic()
+            where = filter_conditions(cur, user_id, since, until, after)
+            buffer = io.StringIO()
+            cur.copy_expert(export_chunk_query.format(where=where, limit=int(chunk_rows)), buffer)
+            conn.rollback()  # read-only; don't hold a snapshot between chunks
+            raw = buffer.getvalue()
+            rows = list(csv.reader(io.StringIO(raw)))
+            if not rows:
+                break
+            offset = writer.write(raw, rows)
+            after = (rows[-1][1], int(rows[-1][0]))
+            throughput.chunk(len(rows), chunk_started)
+            if offset is not None:
+                with open(checkpoint_path + ".tmp", "w") as f:
+                    json.dump(
+                        {"after": after, "rows": throughput.rows, "offset": offset, "filters": filters},
+                        f,
+                    )
+                os.replace(checkpoint_path + ".tmp", checkpoint_path)
+            if len(rows) < chunk_rows:
+                break
+    finally:
+        cur.close()
+        writer.close()
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    throughput.done()
+    return throughput.rows
+
+
+# ---------------------------------------------------------------------------
+# import
+
+
+def read_records(path, fmt):
+    """Yield records from the input file as dicts with at least COLUMNS."""
+    if fmt == "ndjson":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    else:
+        pa = _require_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(path)
+        for batch in parquet_file.iter_batches(columns=COLUMNS):
+            yield from batch.to_pylist()
+
+
+def _wanted(record, user_id, since, until):
+    if user_id and record["user_id"] != user_id:
+        return False
+    if since or until:
+        ts = datetime.fromisoformat(str(record["timestamp"]))
+        if since and ts < since:
+            return False
+        if until and ts >= until:
+            return False
+    return True
+
+
+def import_turns(
+    conn,
+    path,
+    fmt,
+    user_id=None,
+    since=None,
+    until=None,
+    chunk_rows=50_000,
+    checkpoint_name=None,
+    restart=False,
+):
+    """Copy records from path into todo_turns, one transaction per chunk.
+
+    Returns the number of rows inserted by this run.
+    """
+    checkpoint_name = checkpoint_name or os.path.abspath(path)
+    filters = checkpoint_filters(user_id, since, until)
+    cur = conn.cursor()
+    cur.execute(create_checkpoints_query)
+    if restart:
+        cur.execute("DELETE FROM bulk_import_checkpoints WHERE name = %s;", (checkpoint_name,))
+    cur.execute(
+        "SELECT records, filters FROM bulk_import_checkpoints WHERE name = %s;", (checkpoint_name,)
+    )
+    row = cur.fetchone()
+    conn.commit()
+    if row:
+        check_checkpoint_filters(row[1], filters, f"Import checkpoint {checkpoint_name!r}")
+    skip = row[0] if row else 0
+    if skip:
+        logging.info(f"Resuming import after {skip} input records")
+
+    since, until = parse_time(since), parse_time(until)
+    throughput = Throughput("Imported")
+    position = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+    chunk_started = time.monotonic()
+
+    def commit_chunk(last=False):
+        nonlocal buffer, writer, pending, chunk_started
+        buffer.seek(0)
+        cur.copy_expert(
+            f"COPY todo_turns ({', '.join(COLUMNS)}) FROM STDIN WITH CSV", buffer
+        )
+        if last:
+            # in the same transaction, so a finished import never leaves one behind
+            cur.execute("DELETE FROM bulk_import_checkpoints WHERE name = %s;", (checkpoint_name,))
+        else:
+            cur.execute(
+                """
+                INSERT INTO bulk_import_checkpoints (name, records, filters) VALUES (%s, %s, %s)
+                ON CONFLICT (name) DO UPDATE
+                SET records = EXCLUDED.records, filters = EXCLUDED.filters, updated_at = now();
+                """,
+                (checkpoint_name, position, json.dumps(filters)),
+            )
+        conn.commit()
+        throughput.chunk(pending, chunk_started)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        pending = 0
+        chunk_started = time.monotonic()
+
+    try:
+        for record in read_records(path, fmt):
+            position += 1
+            if position <= skip:
+                continue
+            missing = [column for column in COLUMNS if record.get(column) in (None, "")]
+            if missing:
+                raise ValueError(f"Record {position} is missing {', '.join(missing)}")
+            if _wanted(record, user_id, since, until):
+                writer.writerow([record[column] for column in COLUMNS])
+                pending += 1
+            if pending >= chunk_rows:
+                commit_chunk()
+        commit_chunk(last=True)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    throughput.done()
+    return throughput.rows
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Bulk export/import of todo_turns using COPY")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("--output", help="File to export to")
+    parser.add_argument("--input", help="File to import from")
+    parser.add_argument("--format", choices=["ndjson", "csv", "parquet"], help="Defaults to the file extension")
+    parser.add_argument("--user_id", help="Only this user's turns")
+    parser.add_argument("--since", help="Only turns at or after this ISO timestamp")
+    parser.add_argument("--until", help="Only turns before this ISO timestamp")
+    parser.add_argument("--chunk_rows", type=int, default=50_000, help="Rows per COPY and transaction")
+    parser.add_argument("--checkpoint", help="Import checkpoint name (default: absolute input path)")
+    parser.add_argument("--restart", action="store_true", help="Discard an existing checkpoint")
+    args = parser.parse_args()
+
+    path = args.output if args.command == "export" else args.input
+    if not path:
+        parser.error(f"{args.command} needs --{'output' if args.command == 'export' else 'input'}")
+    fmt = args.format or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt == "jsonl":
+        fmt = "ndjson"
+    if fmt not in ("ndjson", "csv", "parquet"):
+        parser.error("Pass --format ndjson, csv or parquet")
+
+    db_url = os.getenv("SUPABASE_DB_URL") or input("Enter your Supabase database URL (postgres://...): ")
+    try:
+        conn = psycopg2.connect(db_url)
+    except Exception as e:
+        logging.error(f"Error connecting to database: {e}", exc_info=True)
+        sys.exit(1)
+
+    try:
+        if args.command == "export":
+            export_turns(
+                conn, path, fmt, args.user_id, args.since, args.until, args.chunk_rows, args.restart
+            )
+        else:
+            import_turns(
+                conn,
+                path,
+                fmt,
+                args.user_id,
+                args.since,
+                args.until,
+                args.chunk_rows,
+                args.checkpoint,
+                args.restart,
+            )
+    except Exception as e:
+        logging.error(f"Error during {args.command}: {e}", exc_info=True)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
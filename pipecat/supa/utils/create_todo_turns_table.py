@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 """
 Utility script to create the todo_turns table in Supabase.
+Also creates the conversations summary table and the trigger that keeps it
+current on every insert, then applies pending migrations from migrations.py.
 Prompts for Supabase database URL.
 """
 
@@ -9,6 +11,62 @@ import sys
 import psycopg2
 import logging
 
+from backfill_conversations import backfill
+from migrations import apply_migrations
+
+# conversations used to be a GROUP BY view over todo_turns; replace it with a
+# table so listing a user's recent conversations only touches their rows.
+create_conversations_query = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_views WHERE viewname = 'conversations') THEN
+        DROP VIEW conversations;
+    END IF;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS conversations (
+    user_id text NOT NULL,
+    conversation_id text NOT NULL,
+    first_ts timestamptz NOT NULL,
+    last_ts timestamptz NOT NULL,
+    turn_count integer NOT NULL DEFAULT 0,
+    byte_count bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, conversation_id)
+);
+
+CREATE INDEX IF NOT EXISTS conversations_user_last_ts_idx
+    ON conversations (user_id, last_ts DESC);
+
+CREATE OR REPLACE FUNCTION todo_turns_update_conversations() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO conversations
+        (user_id, conversation_id, first_ts, last_ts, turn_count, byte_count)
+    SELECT
+        user_id,
+        conversation_id,
+        MIN(timestamp),
+        MAX(timestamp),
+        COUNT(*),
+        COALESCE(SUM(octet_length(content)), 0)
+    FROM new_turns
+    GROUP BY user_id, conversation_id
+    ON CONFLICT (user_id, conversation_id) DO UPDATE SET
+        first_ts = LEAST(conversations.first_ts, EXCLUDED.first_ts),
+        last_ts = GREATEST(conversations.last_ts, EXCLUDED.last_ts),
+        turn_count = conversations.turn_count + EXCLUDED.turn_count,
+        byte_count = conversations.byte_count + EXCLUDED.byte_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS todo_turns_update_conversations ON todo_turns;
+CREATE TRIGGER todo_turns_update_conversations
+    AFTER INSERT ON todo_turns
+    REFERENCING NEW TABLE AS new_turns
+    FOR EACH STATEMENT EXECUTE FUNCTION todo_turns_update_conversations();
+"""
+
 def main():
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
     logging.info("Starting create_todo_turns_table script")
@@ -47,8 +105,23 @@ def main():
         cur.execute("CREATE POLICY allow_authenticated ON todo_turns FOR ALL TO authenticated USING (true);")
         conn.commit()
         logging.info("RLS enabled and policy applied")
+        logging.info("Creating conversations table and insert trigger")
+        cur.execute("SELECT to_regclass('conversations') IS NOT NULL AND NOT EXISTS "
+                    "(SELECT 1 FROM pg_views WHERE viewname = 'conversations');")
+        conversations_existed = cur.fetchone()[0]
+        cur.execute(create_conversations_query)
+        cur.execute("ALTER TABLE IF EXISTS conversations ENABLE ROW LEVEL SECURITY;")
+        cur.execute("DROP POLICY IF EXISTS allow_authenticated ON conversations;")
+        cur.execute("CREATE POLICY allow_authenticated ON conversations FOR ALL TO authenticated USING (true);")
+        # the trigger keeps an existing table current; backfilling it again
+        # would lock out transcript inserts while it scans every turn
+        if not conversations_existed:
+            logging.info(f"Backfilled {backfill(cur)} conversations from existing turns")
+        conn.commit()
+        applied = apply_migrations(conn)
+        logging.info(f"Applied {len(applied)} schema migration(s)")
     except Exception as e:
-        logging.error(f"Error creating table: {e}", exc_info=True)
+        logging.error(f"Error creating tables: {e}", exc_info=True)
         conn.rollback()
         sys.exit(1)
     finally:
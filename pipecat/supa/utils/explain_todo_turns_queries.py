@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Utility script to check that the supabase_helpers queries use indexes.
+Usage: explain_todo_turns_queries.py [--user_id USER_ID] [--min_pages N] [--disable-seqscan]
+
+Runs EXPLAIN on the SQL that PostgREST generates for each helper query and
+exits non-zero if any of them falls back to a sequential scan of todo_turns,
+conversations or todos. Plans use the planner's default settings, so run it
+against a database with production-sized tables. Sequential scans of
+relations under --min_pages pages (empty partitions, small dev tables) are
+listed but do not fail the check, since there the planner rightly prefers
+them. --disable-seqscan only checks that a usable index exists.
+"""
+
+import os
+import sys
+import json
+import argparse
+import psycopg2
+from datetime import datetime, timezone, timedelta
+
+from supabase_helpers import HISTORY_PAGE_SIZE
+
+CHECKED_TABLES = ("todo_turns", "conversations", "todos")
+
+QUERIES = {
+    "fetch_conversation_turns": (
+        "SELECT * FROM todo_turns WHERE user_id = %(user_id)s"
+        " AND conversation_id = %(conversation_id)s ORDER BY timestamp"
+    ),
+    "fetch_turns_for_conversations": (
+        "SELECT * FROM todo_turns WHERE user_id = %(user_id)s"
+        " AND conversation_id = ANY(%(conversation_ids)s)"
+        f" AND id > 0 ORDER BY id LIMIT {HISTORY_PAGE_SIZE}"
+    ),
+    # also the context cache's extension query
+    "fetch_turns_since": (
+        "SELECT * FROM todo_turns WHERE user_id = %(user_id)s"
+        f" AND id > %(since_id)s ORDER BY id LIMIT {HISTORY_PAGE_SIZE}"
+    ),
+    "fetch_conversations": (
+        "SELECT * FROM conversations WHERE user_id = %(user_id)s"
+        " AND last_ts >= %(oldest)s ORDER BY last_ts DESC LIMIT 50"
+    ),
+    "search_turns": "SELECT * FROM search_todo_turns(%(user_id)s, %(search_query)s, 10)",
+    "list_todos": (
+        "SELECT * FROM todos WHERE user_id = %(user_id)s AND status = 'open'"
+        " ORDER BY due_date ASC NULLS LAST, created_at ASC LIMIT 50"
+    ),
+}
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def seq_scans(plan):
+    """Names of checked relations (or their partitions) read by a Seq Scan."""
+    return [
+        node["Relation Name"]
+        for node in plan_nodes(plan)
+        if node["Node Type"] == "Seq Scan"
+        and node.get("Relation Name", "").startswith(CHECKED_TABLES)
+    ]
+
+
+def relation_pages(cur, names):
+    """Current size in pages of each named relation."""
+    cur.execute(
+        "SELECT n, pg_relation_size(n::regclass) / current_setting('block_size')::int"
+        " FROM unnest(%s::text[]) AS n;",
+        (list(names),),
+    )
+    return dict(cur.fetchall())
+
+
+def index_names(plan):
+    return sorted({node["Index Name"] for node in plan_nodes(plan) if "Index Name" in node})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the supabase_helpers queries")
+    parser.add_argument("--user_id", default="generic_user", help="User ID to plan for")
+    parser.add_argument("--conversation_id", default="2025-01-01_00-00-00")
+    parser.add_argument("--search_query", default="grocery list")
+    parser.add_argument(
+        "--min_pages",
+        type=int,
+        default=100,
+        help="Sequential scans of smaller relations do not fail the check (default: 100)",
+    )
+    parser.add_argument(
+        "--disable-seqscan",
+        action="store_true",
+        help="Plan with sequential scans disabled, to check that an index is usable at all",
+    )
+    args = parser.parse_args()
+
+    db_url = os.getenv("SUPABASE_DB_URL") or input("Enter your Supabase database URL (postgres://...): ")
+    try:
+        conn = psycopg2.connect(db_url)
+    except Exception as e:
+        print(f"Error connecting to database: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    params = {
+        "user_id": args.user_id,
+        "conversation_id": args.conversation_id,
+        "conversation_ids": [args.conversation_id],
+        "oldest": datetime.now(timezone.utc) - timedelta(weeks=2),
+        "search_query": args.search_query,
+        "since_id": 0,
+    }
+    failed = False
+    cur = conn.cursor()
+    try:
+        if args.disable_seqscan:
+            cur.execute("SET enable_seqscan = off;")
+        for name, sql in QUERIES.items():
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0][0]["Plan"]
+            pages = relation_pages(cur, seq_scans(plan))
+            scans = sorted(r for r, n in pages.items() if n >= args.min_pages)
+            small = sorted(r for r, n in pages.items() if n < args.min_pages)
+            status = "FAIL" if scans else "ok"
+            failed = failed or bool(scans)
+            print(
+                f"{status:4s} {name}: indexes={index_names(plan)} seq_scans={scans}"
+                f" small_seq_scans={small}"
+            )
+            if scans:
+                print(json.dumps(plan, indent=2), file=sys.stderr)
+    finally:
+        cur.close()
+        conn.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 """
 Utility script to fetch todo_turns from Supabase using supabase-py.
-Usage: fetch_todo_turn.py --user_id USER_ID [--conversation_id CONV_ID]
+Usage: fetch_todo_turn.py --user_id USER_ID [--conversation_id CONV_ID] [--archived]
+
+Conversations moved out of todo_turns by archive_todo_turns.py are read from
+the archive files listed in the archived_conversations manifest.
 """
 
 import asyncio
@@ -10,11 +13,47 @@ import sys
 import argparse
 import json
 from supabase import acreate_client, AsyncClient
-from supabase_helpers import fetch_conversation_turns, fetch_and_format
-import dateparser
+from supabase_helpers import (
+    fetch_archived_conversations,
+    fetch_conversation_turns,
+    format_history,
+    group_turns,
+    iter_formatted_history,
+    iter_history_turns,
+)
+from archive_todo_turns import ARCHIVE_DIR, read_archive_file
 from datetime import datetime, timezone
 
 
+async def fetch_archived_turns(client, user_id, archive_dir, conversation_id=None, limit=None):
+    """Turns of archived conversations, oldest conversation first."""
+    manifest = await fetch_archived_conversations(client, user_id, conversation_id, limit)
+    files = {}
+    for entry in manifest:
+        files.setdefault(entry["archive_file"], set()).add(entry["conversation_id"])
+    if files and not archive_dir:
+        print(
+            f"{len(files)} archive file(s) hold these conversations;"
+            " set --archive_dir or TODO_TURNS_ARCHIVE_DIR",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    missing = [f for f in files if not os.path.exists(os.path.join(archive_dir, f))]
+    if missing:
+        print(
+            f"{len(missing)} of {len(files)} archive file(s) listed in archived_conversations"
+            f" are not in {os.path.abspath(archive_dir)}: {', '.join(sorted(missing))}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    turns = []
+    for archive_file, conversation_ids in files.items():
+        path = os.path.join(archive_dir, archive_file)
+        turns.extend(read_archive_file(path, user_id, conversation_ids))
+    turns.sort(key=lambda t: (t["timestamp"], t["id"]))
+    return turns
+
+
 async def main():
     parser = argparse.ArgumentParser(description="Fetch todo_turns from Supabase")
     parser.add_argument("--user_id", required=True, help="User ID")
@@ -29,6 +68,16 @@ async def main():
         "--oldest",
         help="Fetch conversations newer than this date (human-readable, e.g. 'two days ago')",
     )
+    parser.add_argument(
+        "--archived",
+        action="store_true",
+        help="Fetch archived conversations instead of recent ones",
+    )
+    parser.add_argument(
+        "--archive_dir",
+        default=ARCHIVE_DIR,
+        help="Directory holding archive files (default: TODO_TURNS_ARCHIVE_DIR)",
+    )
     args = parser.parse_args()
 
     supabase_url = os.getenv("SUPABASE_URL")
@@ -43,6 +92,9 @@ async def main():
 
     oldest = None
     if args.oldest:
+        # dateparser is slow to import; only --oldest needs it
+        import dateparser
+
         oldest_dt = dateparser.parse(args.oldest)
         if oldest_dt is None:
             print(f"Could not parse date '{args.oldest}'", file=sys.stderr)
@@ -56,10 +108,20 @@ async def main():
         data = await fetch_conversation_turns(
             supabase, args.user_id, args.conversation_id
         )
+        if not data:
+            data = await fetch_archived_turns(
+                supabase, args.user_id, args.archive_dir, args.conversation_id
+            )
         print(json.dumps(data, indent=2, default=str))
+    elif args.archived:
+        turns = await fetch_archived_turns(
+            supabase, args.user_id, args.archive_dir, limit=args.limit
+        )
+        print(format_history(group_turns(turns)), end="")
     else:
-        data = await fetch_and_format(supabase, args.user_id, args.limit, oldest)
-        print(data)
+        turns = iter_history_turns(supabase, args.user_id, args.limit, oldest)
+        async for chunk in iter_formatted_history(turns):
+            print(chunk, end="", flush=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the todo_turns tables.
+Usage: migrations.py [--status] [--target VERSION] [--partitions-ahead MONTHS]
+
+Each migration runs in its own transaction and is recorded in the
+schema_version table, so running this script again only applies migrations
+that have not been applied yet.
+
+todo_turns is partitioned by month. Unless the database has pg_cron (see
+migration 10), run `migrations.py --partitions-ahead 3` at least monthly,
+e.g. from cron, so new turns never pile up in the default partition;
+--status reports rows that have.
+"""
+
+import os
+import sys
+import argparse
+import psycopg2
+import logging
+
+create_schema_version_query = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version integer PRIMARY KEY,
+    description text NOT NULL,
+    applied_at timestamptz NOT NULL DEFAULT now()
+);
+"""
+
+# Arbitrary constant key for pg_advisory_xact_lock so that two concurrent
+# runs cannot apply the same migration twice.
+MIGRATION_LOCK_KEY = 7_041_866
+
+# Trigger and row-level security have to be recreated whenever todo_turns is
+# rebuilt. The trigger function itself is created by create_todo_turns_table.py.
+todo_turns_trigger_and_policy = """
+DROP TRIGGER IF EXISTS todo_turns_update_conversations ON todo_turns;
+CREATE TRIGGER todo_turns_update_conversations
+    AFTER INSERT ON todo_turns
+    REFERENCING NEW TABLE AS new_turns
+    FOR EACH STATEMENT EXECUTE FUNCTION todo_turns_update_conversations();
+
+ALTER TABLE todo_turns ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS allow_authenticated ON todo_turns;
+CREATE POLICY allow_authenticated ON todo_turns FOR ALL TO authenticated USING (true);
+"""
+
+MIGRATIONS = [
+    (
+        1,
+        "add surrogate key to todo_turns",
+        """
+        ALTER TABLE todo_turns
+            ADD COLUMN IF NOT EXISTS id bigint GENERATED BY DEFAULT AS IDENTITY;
+        ALTER TABLE todo_turns ADD CONSTRAINT todo_turns_pkey PRIMARY KEY (id);
+        """,
+    ),
+    (
+        2,
+        "add todo_turns lookup indexes",
+        """
+        CREATE INDEX IF NOT EXISTS todo_turns_user_conversation_ts_idx
+            ON todo_turns (user_id, conversation_id, timestamp);
+        CREATE INDEX IF NOT EXISTS todo_turns_user_ts_idx
+            ON todo_turns (user_id, timestamp DESC);
+        """,
+    ),
+    (
+        3,
+        "partition todo_turns by month",
+        """
+        ALTER TABLE todo_turns RENAME TO todo_turns_unpartitioned;
+        ALTER TABLE todo_turns_unpartitioned
+            RENAME CONSTRAINT todo_turns_pkey TO todo_turns_unpartitioned_pkey;
+        ALTER INDEX todo_turns_user_conversation_ts_idx
+            RENAME TO todo_turns_unpartitioned_user_conversation_ts_idx;
+        ALTER INDEX todo_turns_user_ts_idx
+            RENAME TO todo_turns_unpartitioned_user_ts_idx;
+
+        -- the partition key has to be part of the primary key
+        CREATE TABLE todo_turns (
+            id bigint GENERATED BY DEFAULT AS IDENTITY,
+            timestamp timestamptz NOT NULL,
+            user_id text NOT NULL,
+            conversation_id text NOT NULL,
+            role text NOT NULL,
+            content text NOT NULL,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp);
+        CREATE INDEX todo_turns_user_conversation_ts_idx
+            ON todo_turns (user_id, conversation_id, timestamp);
+        CREATE INDEX todo_turns_user_ts_idx
+            ON todo_turns (user_id, timestamp DESC);
+        CREATE TABLE todo_turns_default PARTITION OF todo_turns DEFAULT;
+
+        -- Creates one partition per month in [from_month, to_month]. Run it
+        -- ahead of time (see --partitions-ahead) so new rows never land in
+        -- the default partition.
+        CREATE OR REPLACE FUNCTION create_todo_turns_partitions(from_month date, to_month date)
+        RETURNS integer AS $$
+        DECLARE
+            month date := date_trunc('month', from_month);
+            created integer := 0;
+            partition_name text;
+        BEGIN
+            WHILE month <= to_month LOOP
+                partition_name := 'todo_turns_' || to_char(month, '"y"YYYY"m"MM');
+                IF to_regclass(partition_name) IS NULL THEN
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF todo_turns FOR VALUES FROM (%L) TO (%L)',
+                        partition_name, month, month + interval '1 month'
+                    );
+                    created := created + 1;
+                END IF;
+                month := month + interval '1 month';
+            END LOOP;
+            RETURN created;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        SELECT create_todo_turns_partitions(
+            LEAST(
+                COALESCE((SELECT MIN(timestamp) FROM todo_turns_unpartitioned), now()),
+                now()
+            )::date,
+            (now() + interval '3 months')::date
+        );
+
+        INSERT INTO todo_turns (id, timestamp, user_id, conversation_id, role, content)
+            SELECT id, timestamp, user_id, conversation_id, role, content
+            FROM todo_turns_unpartitioned;
+        SELECT setval(
+            pg_get_serial_sequence('todo_turns', 'id'),
+            COALESCE((SELECT MAX(id) FROM todo_turns), 0) + 1,
+            false
+        );
+        DROP TABLE todo_turns_unpartitioned;
+        """
+        + todo_turns_trigger_and_policy,
+    ),
+    (
+        4,
+        "add conversation_summaries table",
+        """
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            user_id text NOT NULL,
+            conversation_id text NOT NULL,
+            -- number of turns summarized; a different count means the
+            -- conversation continued and the summary is stale
+            turn_count integer NOT NULL,
+            summary text NOT NULL,
+            model text NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (user_id, conversation_id)
+        );
+        ALTER TABLE conversation_summaries ENABLE ROW LEVEL SECURITY;
+        DROP POLICY IF EXISTS allow_authenticated ON conversation_summaries;
+        CREATE POLICY allow_authenticated ON conversation_summaries
+            FOR ALL TO authenticated USING (true);
+        """,
+    ),
+    (
+        5,
+        "add archived_conversations manifest",
+        """
+        -- one row per conversation moved out of todo_turns by
+        -- archive_todo_turns.py; archive_file is relative to the archive directory
+        CREATE TABLE IF NOT EXISTS archived_conversations (
+            user_id text NOT NULL,
+            conversation_id text NOT NULL,
+            archive_file text NOT NULL,
+            first_ts timestamptz NOT NULL,
+            last_ts timestamptz NOT NULL,
+            turn_count integer NOT NULL,
+            archived_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (user_id, conversation_id, archive_file)
+        );
+        CREATE INDEX IF NOT EXISTS archived_conversations_user_last_ts_idx
+            ON archived_conversations (user_id, last_ts DESC);
+        -- lets the archiver find the oldest conversations across all users
+        CREATE INDEX IF NOT EXISTS conversations_last_ts_idx ON conversations (last_ts);
+        ALTER TABLE archived_conversations ENABLE ROW LEVEL SECURITY;
+        DROP POLICY IF EXISTS allow_authenticated ON archived_conversations;
+        CREATE POLICY allow_authenticated ON archived_conversations
+            FOR ALL TO authenticated USING (true);
+        """,
+    ),
+    (
+        6,
+        "add full-text search over todo_turns content",
+        """
+        -- created on the partitioned parent, so every partition gets one
+        CREATE INDEX IF NOT EXISTS todo_turns_content_search_idx
+            ON todo_turns USING GIN (to_tsvector('english', content));
+
+        -- Called through PostgREST rpc by the bot's search_past_conversations
+        -- tool. Relevance is divided by (1 + age / 30 days), so a match from a
+        -- month ago needs twice the text relevance to rank level with today's.
+        -- A plain SQL function so the planner can inline it and use the index.
+        CREATE OR REPLACE FUNCTION search_todo_turns(
+            search_user_id text, search_query text, match_limit integer DEFAULT 10
+        )
+        RETURNS TABLE (
+            id bigint,
+            "timestamp" timestamptz,
+            conversation_id text,
+            role text,
+            content text,
+            rank real
+        ) AS $$
+            SELECT t.id, t.timestamp, t.conversation_id, t.role, t.content,
+                (ts_rank_cd(to_tsvector('english', t.content), q)
+                    / (1 + extract(epoch FROM now() - t.timestamp) / (30 * 86400)))::real
+            FROM todo_turns t, websearch_to_tsquery('english', search_query) AS q
+            WHERE t.user_id = search_user_id
+                AND to_tsvector('english', t.content) @@ q
+            ORDER BY 6 DESC
+            LIMIT match_limit;
+        $$ LANGUAGE sql STABLE;
+        """,
+    ),
+    (
+        7,
+        "add todos table",
+        """
+        CREATE TABLE IF NOT EXISTS todos (
+            id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            user_id text NOT NULL,
+            title text NOT NULL,
+            -- which list the item is on, e.g. todo, groceries, reading
+            list_name text NOT NULL DEFAULT 'todo',
+            status text NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'done')),
+            due_date date,
+            notes text,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            completed_at timestamptz
+        );
+        -- open items for a user, soonest due first
+        CREATE INDEX IF NOT EXISTS todos_user_status_due_idx
+            ON todos (user_id, status, due_date);
+        ALTER TABLE todos ENABLE ROW LEVEL SECURITY;
+        DROP POLICY IF EXISTS allow_authenticated ON todos;
+        CREATE POLICY allow_authenticated ON todos FOR ALL TO authenticated USING (true);
+        """,
+    ),
+    (
+        8,
+        "add todo_turns idempotency key",
+        """
+        -- set by the bot's transcript write-ahead log; a turn that is sent
+        -- again after a timeout or crash is ignored instead of duplicated
+        ALTER TABLE todo_turns ADD COLUMN IF NOT EXISTS turn_key text;
+        -- the partition key has to be part of a unique index
+        CREATE UNIQUE INDEX IF NOT EXISTS todo_turns_turn_key_idx
+            ON todo_turns (turn_key, timestamp);
+        """,
+    ),
+    (
+        9,
+        "notify listeners of todo_turns inserts",
+        """
+        -- one notification per user per insert statement, for the bot's
+        -- change feed (todo_turns_feed.py) to mark cached history stale
+        CREATE OR REPLACE FUNCTION todo_turns_notify_insert() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'todo_turns_insert',
+                json_build_object('user_id', user_id, 'high_water', max("timestamp"))::text
+            )
+            FROM new_turns
+            GROUP BY user_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS todo_turns_notify_insert ON todo_turns;
+        CREATE TRIGGER todo_turns_notify_insert
+            AFTER INSERT ON todo_turns
+            REFERENCING NEW TABLE AS new_turns
+            FOR EACH STATEMENT EXECUTE FUNCTION todo_turns_notify_insert();
+        """,
+    ),
+    (
+        10,
+        "move default-partition rows into new todo_turns partitions",
+        """
+        -- A month's partition cannot be created while the default partition
+        -- holds rows for that month, so rows that landed there are moved
+        -- into a table that is then attached as the month's partition.
+        CREATE OR REPLACE FUNCTION create_todo_turns_partitions(from_month date, to_month date)
+        RETURNS integer AS $$
+        DECLARE
+            month date := date_trunc('month', from_month);
+            created integer := 0;
+            partition_name text;
+            stranded boolean;
+        BEGIN
+            WHILE month <= to_month LOOP
+                partition_name := 'todo_turns_' || to_char(month, '"y"YYYY"m"MM');
+                IF to_regclass(partition_name) IS NULL THEN
+                    -- blocks inserts into the default partition until commit
+                    LOCK TABLE todo_turns_default IN SHARE ROW EXCLUSIVE MODE;
+                    EXECUTE format(
+                        'SELECT EXISTS (SELECT 1 FROM todo_turns_default'
+                        ' WHERE timestamp >= %L AND timestamp < %L)',
+                        month, month + interval '1 month'
+                    ) INTO stranded;
+                    IF stranded THEN
+                        EXECUTE format(
+                            'CREATE TABLE %I (LIKE todo_turns INCLUDING DEFAULTS)',
+                            partition_name
+                        );
+                        EXECUTE format(
+                            'WITH moved AS (DELETE FROM todo_turns_default'
+                            ' WHERE timestamp >= %L AND timestamp < %L RETURNING *)'
+                            ' INSERT INTO %I SELECT * FROM moved',
+                            month, month + interval '1 month', partition_name
+                        );
+                        EXECUTE format(
+                            'ALTER TABLE todo_turns ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                            partition_name, month, month + interval '1 month'
+                        );
+                    ELSE
+                        EXECUTE format(
+                            'CREATE TABLE %I PARTITION OF todo_turns FOR VALUES FROM (%L) TO (%L)',
+                            partition_name, month, month + interval '1 month'
+                        );
+                    END IF;
+                    created := created + 1;
+                END IF;
+                month := month + interval '1 month';
+            END LOOP;
+            RETURN created;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Where pg_cron is available (it is on Supabase), keep three months
+        -- of partitions ahead daily. Elsewhere run `migrations.py
+        -- --partitions-ahead 3` from cron.
+        DO $$
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS pg_cron;
+            PERFORM cron.schedule(
+                'todo_turns_partitions',
+                '17 3 * * *',
+                'SELECT create_todo_turns_partitions(now()::date, (now() + interval ''3 months'')::date)'
+            );
+        EXCEPTION WHEN OTHERS THEN
+            RAISE NOTICE 'pg_cron unavailable (%), run migrations.py --partitions-ahead regularly', SQLERRM;
+        END;
+        $$;
+        """,
+    ),
+    (
+        11,
+        "index todo_turns by user and id",
+        """
+        -- the context cache fetches a user's turns inserted after the last
+        -- id it has seen (fetch_turns_since)
+        CREATE INDEX IF NOT EXISTS todo_turns_user_id_idx ON todo_turns (user_id, id);
+        """,
+    ),
+]
+
+
+def applied_versions(cur):
+    cur.execute(create_schema_version_query)
+    cur.execute("SELECT version FROM schema_version ORDER BY version;")
+    return {row[0] for row in cur.fetchall()}
+
+
+def apply_migrations(conn, target=None):
+    """Apply pending migrations up to and including target (default: all).
+
+    Returns the list of versions applied.
+    """
+    applied = []
+    cur = conn.cursor()
+    try:
+        for version, description, sql in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_KEY,))
+            if version in applied_versions(cur):
+                conn.commit()
+                continue
+            logging.info(f"Applying migration {version}: {description}")
+            cur.execute(sql)
+            cur.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s);",
+                (version, description),
+            )
+            conn.commit()
+            applied.append(version)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return applied
+
+
+def create_partitions_ahead(conn, months):
+    """Make sure monthly partitions exist from this month to `months` ahead.
+
+    Also creates partitions for earlier months that have rows in the
+    default partition, moving those rows into them.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT create_todo_turns_partitions(
+                LEAST(COALESCE((SELECT MIN(timestamp) FROM todo_turns_default), now()), now())::date,
+                (now() + %s * interval '1 month')::date
+            );
+            """,
+            (months,),
+        )
+        created = cur.fetchone()[0]
+        conn.commit()
+    finally:
+        cur.close()
+    return created
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Apply todo_turns schema migrations")
+    parser.add_argument("--status", action="store_true", help="Only list applied and pending migrations")
+    parser.add_argument("--target", type=int, help="Stop after this migration version")
+    parser.add_argument(
+        "--partitions-ahead",
+        type=int,
+        metavar="MONTHS",
+        help="Also create monthly todo_turns partitions this many months ahead",
+    )
+    args = parser.parse_args()
+
+    db_url = os.getenv("SUPABASE_DB_URL") or input("Enter your Supabase database URL (postgres://...): ")
+    try:
+        conn = psycopg2.connect(db_url)
+    except Exception as e:
+        logging.error(f"Error connecting to database: {e}", exc_info=True)
+        sys.exit(1)
+
+    try:
+        if args.status:
+            cur = conn.cursor()
+            applied = applied_versions(cur)
+            conn.commit()
+            cur.close()
+            for version, description, _ in MIGRATIONS:
+                state = "applied" if version in applied else "pending"
+                print(f"{version:4d}  {state:8s} {description}")
+            if 3 in applied:
+                cur = conn.cursor()
+                cur.execute("SELECT COUNT(*) FROM todo_turns_default;")
+                stranded = cur.fetchone()[0]
+                conn.commit()
+                cur.close()
+                if stranded:
+                    print(
+                        f"{stranded} todo_turns rows are in the default partition; "
+                        "run with --partitions-ahead to move them"
+                    )
+            return
+
+        applied = apply_migrations(conn, args.target)
+        logging.info(f"Applied {len(applied)} migration(s)")
+        if args.partitions_ahead is not None:
+            created = create_partitions_ahead(conn, args.partitions_ahead)
+            logging.info(f"Created {created} todo_turns partition(s)")
+    except Exception as e:
+        logging.error(f"Error applying migrations: {e}", exc_info=True)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
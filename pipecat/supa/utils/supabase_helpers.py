@@ -1,9 +1,18 @@
 import sys
+from functools import lru_cache
 from supabase import AsyncClient
-from datetime import datetime
+from datetime import datetime, timezone
 from dateutil.parser import isoparse
-from babel.dates import format_datetime
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Optional, List, Dict, Tuple
+
+# PostgREST caps responses at 1000 rows by default, so page at that size.
+HISTORY_PAGE_SIZE = 1000
+
+CONVERSATION_START_PATTERN = "EEEE MMMM d, yyyy hh:mm:ss"
+CONVERSATION_START_LOCALE = "en_US"
+
+# Number of formatted turns iter_formatted_history collects before yielding.
+FORMAT_CHUNK_TURNS = 256
 
 
 async def fetch_conversation_turns(
@@ -23,14 +32,13 @@ async def fetch_conversation_turns(
     return data
 
 
-async def fetch_and_format(
+async def fetch_conversations(
     client: AsyncClient,
     user_id: str,
     limit: Optional[int] = None,
     oldest: Optional[datetime] = None,
 ):
-    text_block = ""
-
+    """Fetch a user's conversations, most recently active first."""
     query = client.from_("conversations").select("*")
     query = query.eq("user_id", user_id)
     query = query.order("last_ts", desc=True)
@@ -44,21 +52,350 @@ async def fetch_and_format(
         print(f"Error fetching conversations: {response.error}", file=sys.stderr)
         sys.exit(1)
 
-    data = getattr(response, "data", "")
-    data = data[::-1]
-    for conversation in data:
-        conversation_id = conversation["conversation_id"]
-        turns = await fetch_conversation_turns(client, user_id, conversation_id)
+    return getattr(response, "data", None) or []
+
+
+async def _fetch_turn_pages(build_query: Callable[[], Any], page_size: int) -> List[Dict]:
+    """All rows of a todo_turns query, one round trip per page.
+
+    Pages on the unique id, so rows are neither skipped nor repeated when
+    timestamps tie or turns are inserted while paging. Ids follow insert
+    order, which is not always the order turns were spoken in (the
+    transcript log can replay old turns late), so the result is sorted by
+    timestamp afterwards.
+    """
+    turns: List[Dict] = []
+    last_id = None
+    while True:
+        query = build_query()
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        query = query.order("id", desc=False).limit(page_size)
+
+        response = await query.execute()
+        if hasattr(response, "error") and response.error:
+            print(f"Error fetching todo_turns: {response.error}", file=sys.stderr)
+            sys.exit(1)
+
+        page = getattr(response, "data", None) or []
+        turns.extend(page)
+        if len(page) < page_size:
+            break
+        last_id = page[-1]["id"]
+    # ISO timestamps in the same time zone sort as text
+    turns.sort(key=lambda t: (t["timestamp"], t["conversation_id"], t["id"]))
+    return turns
+
+
+async def fetch_turns_for_conversations(
+    client: AsyncClient,
+    user_id: str,
+    conversation_ids: List[str],
+    page_size: int = HISTORY_PAGE_SIZE,
+):
+    """Fetch the turns of many conversations with one query per page."""
+    if not conversation_ids:
+        return []
+    return await _fetch_turn_pages(
+        lambda: client.from_("todo_turns")
+        .select("*")
+        .eq("user_id", user_id)
+        .in_("conversation_id", conversation_ids),
+        page_size,
+    )
+
+
+async def fetch_turns_since(
+    client: AsyncClient,
+    user_id: str,
+    since_id: int,
+    page_size: int = HISTORY_PAGE_SIZE,
+):
+    """Fetch a user's turns inserted after the row `since_id`, oldest first.
+
+    Goes by id rather than timestamp so turns replayed late from a
+    transcript log, older than turns already seen, are included.
+    """
+    return await _fetch_turn_pages(
+        lambda: client.from_("todo_turns")
+        .select("*")
+        .eq("user_id", user_id)
+        .gt("id", since_id),
+        page_size,
+    )
+
+
+def group_turns(turns: List[Dict]) -> List[Tuple[str, List[Dict]]]:
+    """Group turns into (conversation_id, turns) pairs in first-seen order."""
+    grouped: Dict[str, List[Dict]] = {}
+    for turn in turns:
+        grouped.setdefault(turn["conversation_id"], []).append(turn)
+    return list(grouped.items())
+
+
+async def fetch_user_history(
+    client: AsyncClient,
+    user_id: str,
+    limit: Optional[int] = None,
+    oldest: Optional[datetime] = None,
+) -> List[Tuple[str, List[Dict]]]:
+    """Fetch a user's recent conversations and their turns.
 
-        dt = isoparse(turns[0]["timestamp"])
-        dt = dt.astimezone()
-        conversation_start_human = format_datetime(
-            dt, "EEEE MMMM d, yyyy hh:mm:ss", locale="en_US"
-        )
-        text_block += f"---- Conversation: {conversation_start_human} ---\n\n"
+    Returns (conversation_id, turns) pairs, oldest conversation first. This
+    costs one round trip for the conversation list plus one per page of
+    turns, instead of one per conversation.
+    """
+    conversations = await fetch_conversations(client, user_id, limit, oldest)
+    conversation_ids = [c["conversation_id"] for c in reversed(conversations)]
 
+    grouped: Dict[str, List[Dict]] = {cid: [] for cid in conversation_ids}
+    for turn in await fetch_turns_for_conversations(
+        client, user_id, conversation_ids
+    ):
+        grouped[turn["conversation_id"]].append(turn)
+
+    return [(cid, grouped[cid]) for cid in conversation_ids if grouped[cid]]
+
+
+@lru_cache(maxsize=None)
+def _start_formatter():
+    # parsing the pattern and loading locale data once instead of on every
+    # format_datetime() call; babel is imported here, on first use
+    from babel import Locale
+    from babel.dates import parse_pattern
+
+    return parse_pattern(CONVERSATION_START_PATTERN), Locale.parse(
+        CONVERSATION_START_LOCALE
+    )
+
+
+def _parse_timestamp(timestamp: str) -> datetime:
+    try:
+        return datetime.fromisoformat(timestamp)
+    except ValueError:
+        return isoparse(timestamp)
+
+
+def format_turn(turn: Dict) -> str:
+    return f"{turn['role']}: {turn['content']}\n\n"
+
+
+def format_turns(turns: List[Dict]) -> str:
+    return "".join([format_turn(turn) for turn in turns])
+
+
+def format_conversation_header(timestamp: str, note: str = "") -> str:
+    pattern, locale = _start_formatter()
+    dt = _parse_timestamp(timestamp).astimezone()
+    conversation_start_human = pattern.apply(dt, locale)
+    return f"---- Conversation: {conversation_start_human}{note} ---\n\n"
+
+
+def format_history(history: List[Tuple[str, List[Dict]]]) -> str:
+    parts = []
+    for conversation_id, turns in history:
+        parts.append(format_conversation_header(turns[0]["timestamp"]))
+        parts.extend(format_turn(turn) for turn in turns)
+        parts.append("\n")
+    return "".join(parts)
+
+
+async def iter_history_turns(
+    client: AsyncClient,
+    user_id: str,
+    limit: Optional[int] = None,
+    oldest: Optional[datetime] = None,
+) -> AsyncIterator[Dict]:
+    """Yield a user's recent turns for iter_formatted_history.
+
+    Loads them with fetch_user_history, so the CLI and the bot's context
+    cache build the same history: grouped by conversation, oldest
+    conversation first, turns in timestamp order.
+    """
+    for _, turns in await fetch_user_history(client, user_id, limit, oldest):
         for turn in turns:
-            text_block += f"{turn['role']}: {turn['content']}\n\n"
-        text_block += "\n"
+            yield turn
+
+
+async def iter_formatted_history(
+    turns: AsyncIterator[Dict], chunk_turns: int = FORMAT_CHUNK_TURNS
+) -> AsyncIterator[str]:
+    """Format turns grouped by conversation, yielding text chunks as they go."""
+    parts = []
+    conversation_id = None
+    async for turn in turns:
+        if turn["conversation_id"] != conversation_id:
+            if conversation_id is not None:
+                parts.append("\n")
+            conversation_id = turn["conversation_id"]
+            parts.append(format_conversation_header(turn["timestamp"]))
+        parts.append(format_turn(turn))
+        if len(parts) >= chunk_turns:
+            yield "".join(parts)
+            parts = []
+    if conversation_id is not None:
+        parts.append("\n")
+    if parts:
+        yield "".join(parts)
+
+
+async def fetch_archived_conversations(
+    client: AsyncClient,
+    user_id: str,
+    conversation_id: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict]:
+    """Manifest rows for a user's archived conversations, most recent first."""
+    query = client.from_("archived_conversations").select("*")
+    query = query.eq("user_id", user_id)
+    if conversation_id:
+        query = query.eq("conversation_id", conversation_id)
+    query = query.order("last_ts", desc=True)
+    if limit:
+        query = query.limit(limit)
+
+    response = await query.execute()
+    if hasattr(response, "error") and response.error:
+        print(f"Error fetching archived_conversations: {response.error}", file=sys.stderr)
+        sys.exit(1)
+
+    return getattr(response, "data", None) or []
+
+
+async def search_turns(
+    client: AsyncClient, user_id: str, query: str, limit: int = 10
+) -> List[Dict]:
+    """Full-text search over all of a user's turns, best matches first.
+
+    Uses the search_todo_turns database function, which ranks by text
+    relevance discounted by age.
+    """
+    response = await client.rpc(
+        "search_todo_turns",
+        {"search_user_id": user_id, "search_query": query, "match_limit": limit},
+    ).execute()
+    if hasattr(response, "error") and response.error:
+        print(f"Error searching todo_turns: {response.error}", file=sys.stderr)
+        return []
+
+    return getattr(response, "data", None) or []
+
 
-    return text_block
+async def add_todo(
+    client: AsyncClient,
+    user_id: str,
+    title: str,
+    list_name: str = "todo",
+    due_date: Optional[str] = None,
+    notes: Optional[str] = None,
+) -> Optional[Dict]:
+    """Insert an open todo and return the stored row."""
+    record = {"user_id": user_id, "title": title, "list_name": list_name}
+    if due_date:
+        record["due_date"] = due_date
+    if notes:
+        record["notes"] = notes
+    response = await client.from_("todos").insert(record).execute()
+    if hasattr(response, "error") and response.error:
+        print(f"Error adding todo: {response.error}", file=sys.stderr)
+        return None
+
+    data = getattr(response, "data", None) or []
+    return data[0] if data else None
+
+
+async def complete_todo(
+    client: AsyncClient, user_id: str, todo_id: int
+) -> Optional[Dict]:
+    """Mark one of the user's todos done; None if it does not exist."""
+    query = client.from_("todos").update(
+        {"status": "done", "completed_at": datetime.now(timezone.utc).isoformat()}
+    )
+    query = query.eq("user_id", user_id).eq("id", todo_id)
+    response = await query.execute()
+    if hasattr(response, "error") and response.error:
+        print(f"Error completing todo: {response.error}", file=sys.stderr)
+        return None
+
+    data = getattr(response, "data", None) or []
+    return data[0] if data else None
+
+
+async def list_todos(
+    client: AsyncClient,
+    user_id: str,
+    status: Optional[str] = "open",
+    list_name: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict]:
+    """A user's todos, soonest due first; status None returns every status."""
+    query = client.from_("todos").select("*")
+    query = query.eq("user_id", user_id)
+    if status:
+        query = query.eq("status", status)
+    if list_name:
+        query = query.eq("list_name", list_name)
+    query = query.order("due_date", desc=False, nullsfirst=False)
+    query = query.order("created_at", desc=False)
+    if limit:
+        query = query.limit(limit)
+
+    response = await query.execute()
+    if hasattr(response, "error") and response.error:
+        print(f"Error listing todos: {response.error}", file=sys.stderr)
+        return []
+
+    return getattr(response, "data", None) or []
+
+
+def format_todos(todos: List[Dict]) -> str:
+    """Compact one-line-per-item listing, grouped by list."""
+    lists: Dict[str, List[str]] = {}
+    for todo in todos:
+        line = f"  #{todo['id']} {todo['title']}"
+        if todo.get("due_date"):
+            line += f" (due {todo['due_date']})"
+        if todo.get("status") == "done":
+            line += " [done]"
+        lists.setdefault(todo["list_name"], []).append(line)
+    return "".join(
+        f"{list_name}:\n" + "\n".join(lines) + "\n" for list_name, lines in lists.items()
+    )
+
+
+async def fetch_conversation_summaries(
+    client: AsyncClient, user_id: str, conversation_ids: List[str]
+) -> Dict[str, Dict]:
+    """Fetch stored summaries for the given conversations, keyed by id."""
+    if not conversation_ids:
+        return {}
+    query = client.from_("conversation_summaries").select("*")
+    query = query.eq("user_id", user_id)
+    query = query.in_("conversation_id", conversation_ids)
+
+    response = await query.execute()
+    if hasattr(response, "error") and response.error:
+        print(f"Error fetching conversation_summaries: {response.error}", file=sys.stderr)
+        return {}
+
+    data = getattr(response, "data", None) or []
+    return {row["conversation_id"]: row for row in data}
+
+
+async def save_conversation_summary(client: AsyncClient, record: Dict):
+    query = client.from_("conversation_summaries").upsert(
+        record, on_conflict="user_id,conversation_id"
+    )
+    response = await query.execute()
+    if hasattr(response, "error") and response.error:
+        print(f"Error saving conversation_summary: {response.error}", file=sys.stderr)
+
+
+async def fetch_and_format(
+    client: AsyncClient,
+    user_id: str,
+    limit: Optional[int] = None,
+    oldest: Optional[datetime] = None,
+):
+    turns = iter_history_turns(client, user_id, limit, oldest)
+    return "".join([chunk async for chunk in iter_formatted_history(turns)])
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the app modules are top-level modules in the pipecat directory, as in the image
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# gemini_live reads it at import time; nothing in the tests calls Gemini
+os.environ.setdefault("GOOGLE_API_KEY", "test")
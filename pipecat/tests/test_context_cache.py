@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+from benchmarks.fake_supabase import FakeAsyncClient
+from context_cache import ContextCache, MemoryContextBackend, SQLiteContextBackend
+from supa.utils.supabase_helpers import fetch_user_history, format_history
+
+
+def turn(timestamp: str, conversation_id: str, content: str) -> dict:
+    return {
+        "timestamp": timestamp,
+        "user_id": "cache-user",
+        "conversation_id": conversation_id,
+        "role": "user",
+        "content": content,
+    }
+
+
+def test_new_turns_are_appended():
+    client = FakeAsyncClient()
+    client.seed([turn("2026-01-01T09:00:00+00:00", "c0", "hello")])
+    cache = ContextCache(MemoryContextBackend(1 << 20))
+
+    async def run():
+        await cache.get_history(client, "cache-user")
+        client.seed([turn("2026-01-01T09:01:00+00:00", "c0", "again")])
+        return await cache.get_history(client, "cache-user")
+
+    text = asyncio.run(run())
+    assert text.index("hello") < text.index("again")
+    assert cache.hits == 1
+
+
+def test_replayed_turns_rebuild_the_entry():
+    client = FakeAsyncClient()
+    client.seed(
+        [
+            turn("2026-01-01T09:00:00+00:00", "c0", "first session"),
+            turn("2026-01-02T09:00:00+00:00", "c1", "second session"),
+        ]
+    )
+    cache = ContextCache(MemoryContextBackend(1 << 20))
+
+    async def run():
+        await cache.get_history(client, "cache-user")
+        # the first session's transcript log is replayed after the second ran
+        client.seed([turn("2026-01-01T09:05:00+00:00", "c0", "replayed")])
+        text = await cache.get_history(client, "cache-user")
+        return text, format_history(await fetch_user_history(client, "cache-user"))
+
+    text, rebuilt = asyncio.run(run())
+    assert text == rebuilt
+    assert text.index("first session") < text.index("replayed") < text.index("second session")
+
+
+def test_compacted_entries_are_rebuilt_not_appended_to():
+    from history_compaction import HistoryCompactor
+    from test_history_compaction import FakeGenai
+
+    client = FakeAsyncClient()
+    client.seed(
+        [turn("2026-01-01T09:00:00+00:00", "c0", "old " + "x" * 2000)]
+        # too long to keep whole, so only its latest turns make it in
+        + [
+            turn(f"2026-01-02T09:00:{n:02d}+00:00", "c1", f"recent {n:02d} " + "y" * 60)
+            for n in range(30)
+        ]
+    )
+    compactor = HistoryCompactor(200, genai_client=FakeGenai())
+    cache = ContextCache(MemoryContextBackend(1 << 20), compactor=compactor)
+
+    async def run():
+        first = await cache.get_history(client, "cache-user")
+        client.seed([turn("2026-01-02T09:01:00+00:00", "c1", "recent 30")])
+        text = await cache.get_history(client, "cache-user")
+        history = await fetch_user_history(client, "cache-user")
+        return first, text, await compactor.compact(client, "cache-user", history)
+
+    first, text, rebuilt = asyncio.run(run())
+    assert "(latest turns)" in first
+    assert text == rebuilt
+    assert "recent 30" in text
+
+
+def test_windows_do_not_share_an_entry():
+    client = FakeAsyncClient()
+    client.seed(
+        [
+            turn("2026-01-01T09:00:00+00:00", "c0", "first session"),
+            turn("2026-01-02T09:00:00+00:00", "c1", "second session"),
+        ]
+    )
+    cache = ContextCache(MemoryContextBackend(1 << 20))
+
+    async def run():
+        everything = await cache.get_history(client, "cache-user")
+        latest = await cache.get_history(client, "cache-user", limit=1)
+        return everything, latest
+
+    everything, latest = asyncio.run(run())
+    assert "first session" in everything
+    assert "first session" not in latest and "second session" in latest
+    assert cache.misses == 2
+
+
+def test_sqlite_backend_is_called_off_the_event_loop(tmp_path):
+    client = FakeAsyncClient()
+    client.seed([turn("2026-01-01T09:00:00+00:00", "c0", "hello")])
+    backend = SQLiteContextBackend(str(tmp_path / "cache.sqlite3"), 1 << 20)
+    threads = set()
+    get = backend.get
+
+    def recording_get(key):
+        threads.add(threading.get_ident())
+        return get(key)
+
+    backend.get = recording_get
+    cache = ContextCache(backend)
+
+    async def run():
+        await cache.get_history(client, "cache-user")
+        return await cache.get_history(client, "cache-user")
+
+    assert "hello" in asyncio.run(run())
+    assert threads and threading.get_ident() not in threads
+    assert cache.hits == 1
@@ -0,0 +1,44 @@
+import asyncio
+from types import SimpleNamespace
+
+from benchmarks.fake_supabase import FakeAsyncClient
+from history_compaction import HistoryCompactor, estimate_tokens
+
+
+class FakeGenai:
+    """Summarizer that never produces a summary."""
+
+    def __init__(self):
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._generate))
+
+    async def _generate(self, **kwargs):
+        return SimpleNamespace(text="")
+
+
+def turn(minute: int, content: str, conversation_id: str = "c0") -> dict:
+    return {
+        "timestamp": f"2026-01-01T09:{minute:02d}:00+00:00",
+        "user_id": "compaction-user",
+        "conversation_id": conversation_id,
+        "role": "user",
+        "content": content,
+    }
+
+
+def compact(history, budget: int) -> str:
+    compactor = HistoryCompactor(budget, genai_client=FakeGenai())
+    return asyncio.run(compactor.compact(FakeAsyncClient(), "compaction-user", history))
+
+
+def test_newest_conversation_over_budget_keeps_its_latest_turns():
+    turns = [turn(n, f"turn {n:02d} " + "x" * 40) for n in range(50)]
+    text = compact([("c0", turns)], budget=100)
+    assert "(latest turns)" in text
+    assert "turn 49" in text and "turn 00" not in text
+    assert estimate_tokens(text) <= 100
+
+
+def test_a_single_huge_turn_keeps_its_end():
+    text = compact([("c0", [turn(0, "start " + "y" * 5000 + " end")])], budget=50)
+    assert "... " in text and text.rstrip().endswith("end")
+    assert "start" not in text
@@ -0,0 +1,70 @@
+import asyncio
+
+from benchmarks.fake_supabase import FakeAsyncClient
+from supa.utils.supabase_helpers import (
+    fetch_and_format,
+    fetch_turns_for_conversations,
+    fetch_turns_since,
+    fetch_user_history,
+    format_history,
+)
+
+
+def turn(timestamp: str, conversation_id: str, content: str) -> dict:
+    return {
+        "timestamp": timestamp,
+        "user_id": "helpers-user",
+        "conversation_id": conversation_id,
+        "role": "user",
+        "content": content,
+    }
+
+
+def test_paging_neither_skips_nor_repeats_tied_turns():
+    client = FakeAsyncClient()
+    # ten turns with the same timestamp in two conversations, over four pages
+    client.seed(
+        [turn("2026-01-01T10:00:00+00:00", f"c{n % 2}", f"tied {n}") for n in range(10)]
+    )
+    turns = asyncio.run(
+        fetch_turns_for_conversations(client, "helpers-user", ["c0", "c1"], page_size=3)
+    )
+    assert sorted(t["content"] for t in turns) == sorted(f"tied {n}" for n in range(10))
+    assert len({t["id"] for t in turns}) == 10
+    assert client.round_trips == 4
+
+
+def test_turns_come_back_in_spoken_order():
+    client = FakeAsyncClient()
+    client.seed(
+        [
+            turn("2026-01-01T10:00:02+00:00", "c0", "second"),
+            turn("2026-01-01T10:00:03.5+00:00", "c0", "third"),
+            # replayed from a transcript log after the later turns
+            turn("2026-01-01T10:00:01+00:00", "c0", "first"),
+        ]
+    )
+    turns = asyncio.run(
+        fetch_turns_since(client, "helpers-user", 0, page_size=2)
+    )
+    assert [t["content"] for t in turns] == ["first", "second", "third"]
+
+
+def test_streamed_history_matches_the_cached_loader():
+    client = FakeAsyncClient()
+    # conversation ids out of start-time order, and tied timestamps
+    client.seed(
+        [
+            turn("2026-01-02T09:00:00+00:00", "b-later", "later 1"),
+            turn("2026-01-02T09:00:00+00:00", "b-later", "later 2"),
+            turn("2026-01-01T09:00:00+00:00", "z-earlier", "earlier"),
+        ]
+    )
+
+    async def run():
+        streamed = await fetch_and_format(client, "helpers-user")
+        return streamed, format_history(await fetch_user_history(client, "helpers-user"))
+
+    streamed, cached = asyncio.run(run())
+    assert streamed == cached
+    assert streamed.index("earlier") < streamed.index("later 1")
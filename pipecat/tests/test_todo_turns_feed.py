@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import todo_turns_feed
+import worker_pool
+from context_cache import ContextCache, MemoryContextBackend
+from todo_turns_feed import TodoTurnsFeed
+
+
+@pytest.fixture
+def listening(monkeypatch):
+    """Feeds that stay "connected" without a database."""
+
+    async def listen(self):
+        self._cache.set_feed_connected(True, drain=lambda: True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self._cache.set_feed_connected(False)
+
+    monkeypatch.setattr(TodoTurnsFeed, "_listen", listen)
+    monkeypatch.setattr(todo_turns_feed, "_todo_turns_feed", None)
+    monkeypatch.setenv("TODO_TURNS_FEED_DB_URL", "postgresql://feed-test")
+
+
+def test_start_restarts_a_cancelled_feed(listening):
+    async def run():
+        cache = ContextCache(MemoryContextBackend(1 << 20))
+        feed = TodoTurnsFeed("postgresql://feed-test", cache)
+        feed.start()
+        first = feed.task
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        assert not cache.stats()["feed_connected"]
+        feed.start()
+        await asyncio.sleep(0)
+        assert feed.task is not first and not feed.task.done()
+        assert cache.stats()["feed_connected"]
+        await feed.close()
+
+    asyncio.run(run())
+
+
+def test_feed_runs_through_two_sessions_in_one_worker(listening):
+    """As a pool worker runs sessions: same loop, leftovers cancelled between."""
+
+    async def session():
+        todo_turns_feed.start_todo_turns_feed()
+        await asyncio.sleep(0)
+        asyncio.get_running_loop().create_task(asyncio.sleep(60))  # a leftover
+        return todo_turns_feed.get_todo_turns_feed().task
+
+    loop = asyncio.new_event_loop()
+    try:
+        tasks = []
+        for _ in range(2):
+            tasks.append(loop.run_until_complete(session()))
+            feed = todo_turns_feed.get_todo_turns_feed()
+            worker_pool._cancel_leftover_tasks(loop, keep=(feed.task,))
+            assert not feed.task.done()
+        assert tasks[0] is tasks[1]
+        loop.run_until_complete(todo_turns_feed.close_todo_turns_feed())
+    finally:
+        loop.close()
+
+
+def test_unresponsive_server_does_not_block_the_loop(monkeypatch):
+    import socket
+
+    monkeypatch.setattr(todo_turns_feed, "KEEPALIVE_TIMEOUT", 0.3)
+    # accepts the connection, never answers, like a half-open connection
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    port = server.getsockname()[1]
+
+    async def run():
+        cache = ContextCache(MemoryContextBackend(1 << 20))
+        feed = TodoTurnsFeed(f"postgresql://feed@127.0.0.1:{port}/feed", cache)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        try:
+            with pytest.raises(ConnectionError):
+                await asyncio.wait_for(feed._listen(), 2)
+        finally:
+            ticker.cancel()
+        return ticks
+
+    try:
+        assert asyncio.run(run()) > 10
+    finally:
+        server.close()
@@ -0,0 +1,99 @@
+import asyncio
+
+from benchmarks.fake_supabase import FakeAsyncClient
+from transcript_wal import TranscriptWAL, recover_transcript_wals
+from turn_writer import TodoTurnWriter
+
+
+def turn(n: int) -> dict:
+    return {
+        "timestamp": f"2026-01-01T10:00:{n:02d}+00:00",
+        "user_id": "wal-user",
+        "conversation_id": "wal-test",
+        "role": "user",
+        "content": f"turn {n}",
+    }
+
+
+def contents(client: FakeAsyncClient):
+    rows = client.conn.execute("SELECT content FROM todo_turns ORDER BY id").fetchall()
+    return [content for (content,) in rows]
+
+
+class CommitThenErrorClient(FakeAsyncClient):
+    """Stores the first `failures` batches, then reports an error for them."""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def from_(self, table):
+        query = super().from_(table)
+        execute = query.execute
+
+        async def execute_then_fail():
+            response = await execute()
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("injected error after commit")
+            return response
+
+        query.execute = execute_then_fail
+        return query
+
+
+def test_left_over_log_is_replayed_and_removed(tmp_path):
+    wal = TranscriptWAL.create(str(tmp_path), "crashed")
+    for n in range(5):
+        wal.append(turn(n))
+    wal.close()  # a session that never reached Supabase
+    client = FakeAsyncClient()
+
+    recovered = asyncio.run(recover_transcript_wals(client, str(tmp_path)))
+
+    assert recovered == 5
+    assert contents(client) == [f"turn {n}" for n in range(5)]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_log_of_a_running_session_is_skipped(tmp_path):
+    wal = TranscriptWAL.create(str(tmp_path), "running")
+    wal.append(turn(0))
+    client = FakeAsyncClient()
+    try:
+        assert asyncio.run(recover_transcript_wals(client, str(tmp_path))) == 0
+        assert contents(client) == []
+    finally:
+        wal.close()
+
+
+def test_batch_retried_after_commit_is_not_duplicated(tmp_path):
+    client = CommitThenErrorClient(failures=2)
+
+    async def run():
+        writer = TodoTurnWriter(
+            client,
+            wal=TranscriptWAL.create(str(tmp_path), "retried"),
+            batch_size=3,
+            retry_base_delay=0.001,
+        )
+        for n in range(6):
+            await writer.put(turn(n))
+        await writer.close()
+        return writer.stats()
+
+    stats = asyncio.run(run())
+    assert stats["retries"] == 2
+    assert contents(client) == [f"turn {n}" for n in range(6)]
+
+
+def test_replaying_turns_already_written_adds_nothing(tmp_path):
+    client = FakeAsyncClient()
+    wal = TranscriptWAL.create(str(tmp_path), "partial")
+    records = [wal.append(turn(n)) for n in range(4)]
+    wal.close()
+    # the first two reached Supabase before the session crashed
+    asyncio.run(client.from_("todo_turns").insert(records[:2]).execute())
+
+    assert asyncio.run(recover_transcript_wals(client, str(tmp_path))) == 4
+    assert contents(client) == [f"turn {n}" for n in range(4)]
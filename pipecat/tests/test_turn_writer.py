@@ -0,0 +1,156 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from turn_writer import TodoTurnWriter
+
+
+class FakeTable:
+    """Stores inserted rows; execute() waits on `gate` while it is set."""
+
+    def __init__(self):
+        self.rows: List[Dict] = []
+        self.requests = 0
+        self.gate: Optional[asyncio.Event] = None
+        self.started = asyncio.Event()
+
+    def from_(self, table: str) -> "FakeTable":
+        return self
+
+    def insert(self, rows: List[Dict]) -> "_Query":
+        return _Query(self, rows)
+
+
+class _Query:
+    def __init__(self, table: FakeTable, rows: List[Dict]):
+        self._table = table
+        self._rows = rows
+
+    async def execute(self):
+        self._table.requests += 1
+        self._table.started.set()
+        if self._table.gate is not None:
+            await self._table.gate.wait()
+        self._table.rows.extend(self._rows)
+
+
+def turn(n: int) -> Dict:
+    return {"role": "user", "content": f"turn {n}"}
+
+
+def test_close_writes_everything_in_order():
+    async def run():
+        table = FakeTable()
+        writer = TodoTurnWriter(table, batch_size=3, flush_interval=10)
+        for n in range(7):
+            await writer.put(turn(n))
+        await writer.close()
+        return table
+
+    table = asyncio.run(run())
+    assert [row["content"] for row in table.rows] == [f"turn {n}" for n in range(7)]
+
+
+def test_close_during_flush_returns():
+    async def run():
+        table = FakeTable()
+        table.gate = asyncio.Event()
+        writer = TodoTurnWriter(table, batch_size=2, flush_interval=0.01)
+        for n in range(2):
+            await writer.put(turn(n))
+        await asyncio.wait_for(table.started.wait(), 1)
+        await writer.put(turn(2))
+        # the background flush is waiting on Supabase when close() starts
+        closing = asyncio.create_task(writer.close())
+        await asyncio.sleep(0.05)
+        assert not closing.done()
+        table.gate.set()
+        await asyncio.wait_for(closing, 2)
+        return table, writer
+
+    table, writer = asyncio.run(run())
+    assert [row["content"] for row in table.rows] == ["turn 0", "turn 1", "turn 2"]
+    assert writer._task is None
+
+
+def test_close_while_idle_returns_promptly():
+    async def run():
+        table = FakeTable()
+        writer = TodoTurnWriter(table, flush_interval=60)
+        await writer.put(turn(0))
+        await asyncio.wait_for(writer.close(), 1)
+        return table
+
+    assert len(asyncio.run(run()).rows) == 1
+
+
+def test_close_timeout_leaves_turns_in_wal(tmp_path):
+    from transcript_wal import TranscriptWAL
+
+    path = str(tmp_path / "session.sqlite3")
+
+    async def run():
+        table = FakeTable()
+        table.upsert = lambda rows, **kwargs: _Query(table, rows)
+        table.gate = asyncio.Event()  # Supabase never answers
+        writer = TodoTurnWriter(table, wal=TranscriptWAL(path), flush_interval=0.01)
+        for n in range(3):
+            await writer.put(turn(n))
+        await asyncio.wait_for(writer.close(timeout=0.1), 1)
+        return table
+
+    assert asyncio.run(run()).rows == []
+    wal = TranscriptWAL(path)
+    assert [record["content"] for record in wal.pending(10)] == ["turn 0", "turn 1", "turn 2"]
+    wal.close()
+
+
+def test_dropped_rows_are_logged_with_the_session():
+    from loguru import logger
+
+    class FailingTable(FakeTable):
+        def insert(self, rows):
+            raise RuntimeError("Supabase is down")
+
+    errors: List[str] = []
+    sink = logger.add(errors.append, level="ERROR", format="{message}")
+
+    async def run():
+        writer = TodoTurnWriter(
+            FailingTable(), max_retries=1, flush_interval=10, session_id="session-1"
+        )
+        await writer.put(turn(0))
+        await writer.close()
+        return writer.stats()
+
+    try:
+        stats = asyncio.run(run())
+    finally:
+        logger.remove(sink)
+    assert stats["rows_dropped"] == 1
+    assert any("session-1" in error and "dropped 1" in error for error in errors)
+
+
+def test_wal_is_written_off_the_event_loop(tmp_path):
+    import threading
+
+    from transcript_wal import TranscriptWAL
+
+    class RecordingWAL(TranscriptWAL):
+        threads = set()
+
+        def append(self, record):
+            self.threads.add(threading.get_ident())
+            return super().append(record)
+
+    async def run():
+        table = FakeTable()
+        table.upsert = lambda rows, **kwargs: _Query(table, rows)
+        wal = RecordingWAL(str(tmp_path / "session.sqlite3"))
+        writer = TodoTurnWriter(table, wal=wal, batch_size=2, flush_interval=0.01)
+        await asyncio.gather(*(writer.put(turn(n)) for n in range(5)))
+        await writer.close()
+        return table, threading.get_ident()
+
+    table, loop_thread = asyncio.run(run())
+    assert [row["content"] for row in table.rows] == [f"turn {n}" for n in range(5)]
+    assert RecordingWAL.threads and loop_thread not in RecordingWAL.threads
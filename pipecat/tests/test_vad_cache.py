@@ -0,0 +1,15 @@
+from pipecat.audio.vad.silero import SileroVADAnalyzer
+
+from vad_cache import build_silero_vad_cache, load_silero_vad
+from warmup import check_vad_cache
+
+
+def test_cached_model_scores_match_the_stock_analyzer(tmp_path):
+    path = build_silero_vad_cache(str(tmp_path / "silero_vad.ort"))
+    assert isinstance(load_silero_vad(path, fallback=False), SileroVADAnalyzer)
+    assert check_vad_cache(path) is None
+
+
+def test_missing_cache_falls_back_to_the_bundled_model(tmp_path):
+    analyzer = load_silero_vad(str(tmp_path / "missing.ort"))
+    assert isinstance(analyzer, SileroVADAnalyzer)
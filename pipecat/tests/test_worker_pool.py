@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from worker_pool import WorkerPool
+
+
+async def wait_for(predicate, timeout: float):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.1)
+
+
+def test_worker_runs_consecutive_sessions(monkeypatch):
+    # sessions fail right after the worker hands them to bot.main, before
+    # anything reaches Supabase, Daily or Gemini; .env does not override these
+    monkeypatch.setenv("SUPABASE_URL", "")
+    monkeypatch.setenv("TODO_TURNS_FEED_DB_URL", "")
+    monkeypatch.setenv("TRANSCRIPT_WAL_DIR", "")
+    monkeypatch.setenv("SESSION_TRACE_LOG", "")
+
+    async def run():
+        pool = WorkerPool(1, max_sessions=5)
+        await pool.start()
+        try:
+            await wait_for(lambda: pool.stats()["idle"] == 1, timeout=60)
+            worker = pool._workers[0]
+            for sessions in (1, 2):
+                await pool.dispatch({"user_id": "worker-test"})
+                await wait_for(lambda: worker.sessions == sessions, timeout=30)
+            stats = pool.stats()
+        finally:
+            await pool.stop()
+        return worker, stats
+
+    worker, stats = asyncio.run(run())
+    assert not worker.session_was_cold
+    assert stats["workers"] == 1 and stats["replaced"] == 0
+    assert stats["time_to_bot_start"]["warm"]["count"] == 2
+    assert stats["session_memory"] == []
+
+
+def test_broken_pipe_on_ping_replaces_the_worker():
+    class BrokenConn:
+        """A worker's pipe whose other end has gone away."""
+
+        def __init__(self, conn):
+            self._conn = conn
+
+        def fileno(self):
+            return self._conn.fileno()
+
+        def send(self, message):
+            raise BrokenPipeError(32, "Broken pipe")
+
+    async def run():
+        pool = WorkerPool(1, health_interval=0.1)
+        await pool.start()
+        try:
+            await wait_for(lambda: pool.stats()["idle"] == 1, timeout=60)
+            broken = pool._workers[0]
+            broken.conn = BrokenConn(broken.conn)
+            await wait_for(lambda: pool.stats()["replaced"] == 1, timeout=5)
+            # the health loop survived and looks after the new worker
+            assert not pool._health_task.done()
+            assert pool._workers and pool._workers[0] is not broken
+        finally:
+            await pool.stop()
+        return broken
+
+    broken = asyncio.run(run())
+    broken.process.join(5)
+    assert not broken.process.is_alive()
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+from typing import Optional
+
+from loguru import logger
+
+from context_cache import ContextCache, get_context_cache
+
+# notified by the todo_turns_notify_insert trigger (migration 9)
+TODO_TURNS_CHANNEL = "todo_turns_insert"
+# seconds between round trips that check an idle connection is still alive
+KEEPALIVE_INTERVAL = 60
+# seconds Postgres has to answer a connect, LISTEN or keepalive
+KEEPALIVE_TIMEOUT = 10
+
+
+class TodoTurnsFeed:
+    """Listens for todo_turns inserts and tells the context cache about them.
+
+    Any instance may write a user's turns, so every process that caches
+    history runs one of these. The connection is re-established with
+    exponential backoff; while it is down the cache verifies every entry
+    with Supabase, as it does without a feed.
+    """
+
+    def __init__(
+        self, db_url: str, cache: ContextCache, max_backoff: float = 30.0
+    ):
+        self._db_url = db_url
+        self._cache = cache
+        self._max_backoff = max_backoff
+        self._task: Optional[asyncio.Task] = None
+        self._conn = None
+        self.connects = 0
+
+    @property
+    def task(self) -> Optional[asyncio.Task]:
+        return self._task
+
+    def start(self):
+        """Start listening, or start again if the task was cancelled."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            # on Python 3.11 a cancel that arrives as one of the feed's
+            # wait_for()s finishes can be lost, so cancel until it ends
+            while not self._task.done():
+                self._task.cancel()
+                await asyncio.wait([self._task], timeout=1.0)
+            self._task = None
+
+    async def _run(self):
+        backoff = 1.0
+        while True:
+            connects = self.connects
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.connects > connects:
+                    backoff = 1.0  # it was up; this is a new outage
+                logger.warning(
+                    f"todo_turns feed disconnected, retrying in {backoff:.0f}s: "
+                    f"{e or type(e).__name__}"
+                )
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self._max_backoff)
+
+    async def _listen(self):
+        import psycopg2
+
+        # an async connection never blocks the event loop, including the
+        # keepalive on a connection that has silently gone away
+        conn = psycopg2.connect(
+            self._db_url, async_=True, keepalives=1, keepalives_idle=30
+        )
+        loop = asyncio.get_running_loop()
+        fd = None
+        try:
+            # libpq may switch sockets while connecting
+            await self._ready(conn)
+            fd = conn.fileno()
+            readable = asyncio.Event()
+            loop.add_reader(fd, readable.set)
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {TODO_TURNS_CHANNEL};")
+            await self._ready(conn, readable)
+            self._conn = conn
+            self.connects += 1
+            self._cache.set_feed_connected(True, drain=self.drain)
+            logger.debug("todo_turns feed connected")
+            while True:
+                try:
+                    await asyncio.wait_for(readable.wait(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    cursor.execute("SELECT 1;")
+                    await self._ready(conn, readable)
+                    continue
+                readable.clear()
+                self._poll()
+        finally:
+            self._conn = None
+            self._cache.set_feed_connected(False)
+            if fd is not None:
+                loop.remove_reader(fd)
+            conn.close()
+
+    async def _ready(self, conn, readable: Optional[asyncio.Event] = None):
+        """Wait up to KEEPALIVE_TIMEOUT seconds for conn's current operation.
+
+        `readable` is set by the connection's reader callback, once there is
+        one; until then each wait registers its own.
+        """
+        from psycopg2.extensions import POLL_OK, POLL_READ
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + KEEPALIVE_TIMEOUT
+        while True:
+            state = conn.poll()
+            self._handle_notifies(conn)
+            if state == POLL_OK:
+                return
+            fd = conn.fileno()
+            if state == POLL_READ and readable is not None:
+                # the reader callback fires again while data is waiting
+                event, remove = readable, None
+                event.clear()
+            elif state == POLL_READ:
+                event, remove = asyncio.Event(), loop.remove_reader
+                loop.add_reader(fd, event.set)
+            else:
+                event, remove = asyncio.Event(), loop.remove_writer
+                loop.add_writer(fd, event.set)
+            try:
+                await asyncio.wait_for(event.wait(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                raise ConnectionError(
+                    f"Postgres did not answer within {KEEPALIVE_TIMEOUT}s"
+                ) from None
+            finally:
+                if remove is not None:
+                    remove(fd)
+
+    def _poll(self):
+        self._conn.poll()
+        self._handle_notifies(self._conn)
+
+    def _handle_notifies(self, conn):
+        while conn.notifies:
+            self._handle(conn.notifies.pop(0).payload)
+
+    def drain(self) -> bool:
+        """Handle notifications that arrived but were not read yet.
+
+        The cache calls this before trusting an entry, since the event loop
+        (and this feed) may have been idle, as in a pool worker between
+        sessions. Returns False if the connection turns out to be gone.
+        """
+        if self._conn is None:
+            return False
+        try:
+            self._poll()
+        except Exception as e:
+            logger.warning(f"todo_turns feed connection lost: {e or type(e).__name__}")
+            return False
+        return True
+
+    def _handle(self, payload: str):
+        try:
+            user_id = json.loads(payload)["user_id"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring todo_turns notification {payload!r}")
+            return
+        self._cache.note_new_turns(user_id)
+
+
+_todo_turns_feed: Optional[TodoTurnsFeed] = None
+
+
+def start_todo_turns_feed() -> Optional[TodoTurnsFeed]:
+    """Start the process-wide feed for the process-wide context cache, once.
+
+    Must be called with the event loop running; calling it again restarts
+    a feed whose task was cancelled. Connects to
+    TODO_TURNS_FEED_DB_URL, or SUPABASE_DB_URL if that is not set; this has
+    to be a direct or session-mode pooler connection, since LISTEN does not
+    work through a transaction-mode pooler. Returns None if neither is set
+    or TODO_TURNS_FEED_DB_URL is empty.
+    """
+    global _todo_turns_feed
+    db_url = os.getenv("TODO_TURNS_FEED_DB_URL", os.getenv("SUPABASE_DB_URL", ""))
+    if not db_url:
+        return None
+    if _todo_turns_feed is None:
+        _todo_turns_feed = TodoTurnsFeed(db_url, get_context_cache())
+    _todo_turns_feed.start()
+    return _todo_turns_feed
+
+
+def get_todo_turns_feed() -> Optional[TodoTurnsFeed]:
+    return _todo_turns_feed
+
+
+async def close_todo_turns_feed():
+    global _todo_turns_feed
+    if _todo_turns_feed is not None:
+        await _todo_turns_feed.close()
+        _todo_turns_feed = None
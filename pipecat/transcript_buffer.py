@@ -0,0 +1,83 @@
+import os
+import sys
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional
+
+from pipecat.frames.frames import TranscriptionMessage
+
+# Most recent transcript messages a session keeps in memory. Every message
+# is also in the LLM context and written to Supabase, so this only needs to
+# cover what the session itself looks back at.
+TRANSCRIPT_BUFFER_LENGTH = int(os.getenv("TRANSCRIPT_BUFFER_LENGTH", "100"))
+
+
+class TranscriptRecord:
+    """One transcript message, without the per-instance dict of a dataclass."""
+
+    __slots__ = ("role", "content", "timestamp", "size")
+
+    def __init__(self, role: str, content: str, timestamp: Optional[str]):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+        # role strings are shared, so only the record and its own strings count
+        self.size = (
+            sys.getsizeof(self)
+            + sys.getsizeof(content)
+            + (sys.getsizeof(timestamp) if timestamp is not None else 0)
+        )
+
+    @classmethod
+    def from_message(cls, message: TranscriptionMessage) -> "TranscriptRecord":
+        return cls(sys.intern(message.role), message.content, message.timestamp)
+
+
+class TranscriptBuffer:
+    """Ring buffer of the last `length` transcript messages of a session.
+
+    Keeps a running count of the bytes it holds, so memory accounting does
+    not have to walk it.
+    """
+
+    __slots__ = ("length", "_records", "_bytes", "appended")
+
+    def __init__(self, length: int = TRANSCRIPT_BUFFER_LENGTH):
+        self.length = length
+        self._records: Deque[TranscriptRecord] = deque(maxlen=max(length, 0))
+        self._bytes = 0
+        self.appended = 0
+
+    def append(self, message: TranscriptionMessage):
+        self.appended += 1
+        if self.length <= 0:
+            return
+        if len(self._records) == self.length:
+            self._bytes -= self._records[0].size
+        record = TranscriptRecord.from_message(message)
+        self._records.append(record)
+        self._bytes += record.size
+
+    def recent(self, n: Optional[int] = None) -> List[TranscriptRecord]:
+        """The last n records (all of them by default), oldest first."""
+        records = list(self._records)
+        if n is None:
+            return records
+        return records[-n:] if n > 0 else []
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[TranscriptRecord]:
+        return iter(self._records)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes + sys.getsizeof(self._records)
+
+    def stats(self) -> Dict:
+        return {
+            "records": len(self._records),
+            "length": self.length,
+            "dropped": self.appended - len(self._records),
+            "bytes": self.size_bytes,
+        }
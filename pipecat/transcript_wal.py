@@ -0,0 +1,143 @@
+import fcntl
+import glob
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+from loguru import logger
+from supabase import AsyncClient
+
+from turn_writer import TodoTurnWriter
+
+# Logs outlive a crashed bot process, not the host; set to "" to disable.
+TRANSCRIPT_WAL_DIR = os.getenv(
+    "TRANSCRIPT_WAL_DIR", os.path.join(tempfile.gettempdir(), "transcript-wal")
+)
+
+
+class TranscriptWAL:
+    """Per-session SQLite log of transcript turns that are not yet in Supabase.
+
+    Every turn is committed here before it is queued for insert and deleted
+    once Supabase has it, so turns survive Supabase outages and bot crashes.
+    Each turn gets a `turn_key` that todo_turns has a unique index on, which
+    makes sending it again harmless. The file is flock()ed for as long as it
+    is open; a log whose lock can be taken belongs to a session that is gone
+    and is replayed by recover_transcript_wals().
+
+    TodoTurnWriter calls it from worker threads, so each method holds a lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock_file = open(path + ".lock", "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = sqlite3.connect(
+            path, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # commits survive a process crash; only a power loss can lose the last few
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS turns (
+                seq integer PRIMARY KEY AUTOINCREMENT,
+                turn_key text UNIQUE NOT NULL,
+                record text NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self.pending_count = self._conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+
+    @classmethod
+    def create(cls, wal_dir: str, name: str) -> "TranscriptWAL":
+        """New log for a session, named after its conversation."""
+        # the logs hold what users said
+        os.makedirs(wal_dir, mode=0o700, exist_ok=True)
+        return cls(os.path.join(wal_dir, f"{name}-{uuid.uuid4().hex[:8]}.sqlite3"))
+
+    def append(self, record: Dict) -> Dict:
+        """Durably log a turn, adding its turn_key."""
+        record.setdefault("turn_key", uuid.uuid4().hex)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO turns (turn_key, record) VALUES (?, ?)",
+                (record["turn_key"], json.dumps(record)),
+            )
+            self._conn.commit()
+            self.pending_count += cursor.rowcount
+        return record
+
+    def pending(self, limit: int) -> List[Dict]:
+        """The oldest turns not yet written, in the order they were logged."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM turns ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [json.loads(record) for (record,) in rows]
+
+    def mark_written(self, turn_keys: List[str]):
+        with self._lock:
+            cursor = self._conn.executemany(
+                "DELETE FROM turns WHERE turn_key = ?", [(key,) for key in turn_keys]
+            )
+            self._conn.commit()
+            self.pending_count -= cursor.rowcount
+
+    def close(self):
+        """Close the log, deleting it if every turn has been written."""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.close()
+            self._conn = None
+        if self.pending_count == 0:
+            for suffix in ("", "-wal", "-shm", ".lock"):
+                try:
+                    os.remove(self.path + suffix)
+                except FileNotFoundError:
+                    pass
+        else:
+            logger.warning(f"{self.pending_count} transcript turns left in {self.path}")
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+
+
+async def recover_transcript_wals(
+    supabase: AsyncClient, wal_dir: str = TRANSCRIPT_WAL_DIR
+) -> int:
+    """Replay turn logs left behind by sessions that crashed or gave up.
+
+    Logs still locked by a running session are skipped, and turns that
+    cannot be written yet stay in their log for the next attempt. Returns
+    the number of turns written.
+    """
+    recovered = 0
+    for path in sorted(glob.glob(os.path.join(wal_dir, "*.sqlite3"))):
+        try:
+            wal = TranscriptWAL(path)
+        except OSError:
+            continue  # a live session owns it
+        try:
+            found = wal.pending_count
+            if found:
+                logger.info(f"Recovering {found} transcript turns from {path}")
+                await TodoTurnWriter(supabase, wal=wal).close()
+                recovered += found - wal.pending_count
+        except Exception as e:
+            logger.error(f"Error recovering transcript turns from {path}: {e}")
+        finally:
+            wal.close()
+    if recovered:
+        logger.info(f"Recovered {recovered} transcript turns")
+    return recovered
@@ -0,0 +1,263 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from loguru import logger
+from supabase import AsyncClient
+
+
+class TodoTurnWriter:
+    """Write-behind queue that batches todo_turns inserts off the pipeline.
+
+    Records are appended in order and written as multi-row inserts when
+    ``batch_size`` records are pending, every ``flush_interval`` seconds, or
+    when ``flush()``/``close()`` is called. A failed batch is retried with
+    exponential backoff before the next one is written, so turns reach the
+    table in the order they were spoken. Once ``max_pending`` records are
+    waiting, ``put()`` blocks until the writer catches up.
+
+    Without a WAL, rows that cannot be written are dropped and logged as
+    errors naming ``session_id``.
+
+    With a ``wal`` (a TranscriptWAL), each record is committed to the local
+    log, in a worker thread so the disk never stalls the event loop, before
+    ``put()`` returns and batches are read back from it, so nothing is
+    dropped: a batch that still fails after its retries stays in
+    the log and the writer backs off, up to ``max_backoff`` seconds, before
+    trying again. Rows are upserted on their ``turn_key``, so a batch that
+    reached the table before its request timed out is not written twice.
+    """
+
+    def __init__(
+        self,
+        supabase: AsyncClient,
+        table: str = "todo_turns",
+        batch_size: int = 20,
+        flush_interval: float = 0.5,
+        max_pending: int = 1000,
+        max_retries: int = 5,
+        retry_base_delay: float = 0.25,
+        request_timeout: float = 10.0,
+        max_backoff: float = 30.0,
+        wal=None,
+        session_id: Optional[str] = None,
+    ):
+        self._supabase = supabase
+        self._table = table
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._max_retries = max_retries
+        self._retry_base_delay = retry_base_delay
+        self._request_timeout = request_timeout
+        self._max_backoff = max_backoff
+        self._wal = wal
+        self._session_id = session_id
+
+        self._pending: Deque[Dict] = deque()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._drain_lock = asyncio.Lock()
+        # keeps concurrent put()s logged in call order
+        self._append_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        # seconds until the writer retries after a failed drain, 0 if none failed
+        self._backoff = 0.0
+
+        self._max_depth = 0
+        self._batches_written = 0
+        self._rows_written = 0
+        self._rows_dropped = 0
+        self._retries = 0
+        self._failed_drains = 0
+        self._flush_latencies: List[float] = []
+
+    @property
+    def queue_depth(self) -> int:
+        if self._wal is not None:
+            return self._wal.pending_count
+        return len(self._pending)
+
+    def stats(self) -> Dict:
+        """Queue depth and flush-latency metrics."""
+        latencies = self._flush_latencies
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self._max_depth,
+            "batches_written": self._batches_written,
+            "rows_written": self._rows_written,
+            "rows_dropped": self._rows_dropped,
+            "retries": self._retries,
+            "failed_drains": self._failed_drains,
+            "last_flush_latency": latencies[-1] if latencies else None,
+            "avg_flush_latency": sum(latencies) / len(latencies) if latencies else None,
+            "max_flush_latency": max(latencies) if latencies else None,
+        }
+
+    async def put(self, record: Dict):
+        if self._wal is not None and not self._closed:
+            async with self._append_lock:
+                await asyncio.to_thread(self._wal.append, record)
+            if self._task is None:
+                self._task = asyncio.create_task(self._run())
+            self._max_depth = max(self._max_depth, self.queue_depth)
+            # while backing off, a full batch waits for the retry
+            if self.queue_depth >= self._batch_size and not self._backoff:
+                self._wakeup.set()
+            return
+        if self._closed:
+            # late turns after close are written straight through
+            if not await self._write([record]):
+                self._drop([record], "after close")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        async with self._space:
+            await self._space.wait_for(lambda: len(self._pending) < self._max_pending)
+            self._pending.append(record)
+        self._max_depth = max(self._max_depth, len(self._pending))
+        if len(self._pending) >= self._batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Write everything queued so far."""
+        await self._drain()
+
+    async def close(self, timeout: Optional[float] = None):
+        """Flush remaining records and stop the background writer.
+
+        With a WAL, records that still cannot be written, or are not written
+        within ``timeout`` seconds, are left in it for
+        recover_transcript_wals() and the WAL is closed. Without one they
+        are dropped.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        # _run exits after the drain it is in, if any; cancelling it instead
+        # can be swallowed by its wait_for and leave close() waiting forever
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._finish(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"{self.queue_depth} {self._table} rows not written "
+                f"within {timeout}s of close"
+            )
+            if self._wal is None:
+                self._drop(list(self._pending), f"not written within {timeout}s of close")
+                self._pending.clear()
+        if self._wal is not None:
+            await asyncio.to_thread(self._wal.close)
+        logger.debug(f"TodoTurnWriter closed: {self.stats()}")
+
+    async def _finish(self):
+        if self._wal is not None:
+            # wait for records being logged by put() calls made before close()
+            async with self._append_lock:
+                pass
+        if self._task is not None:
+            # _run sees _closed before waiting again, even if a cancel is lost
+            await self._task
+            self._task = None
+        await self._drain()
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), self._backoff or self._flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._closed:
+                return  # close() drains what is left
+            if await self._drain():
+                self._backoff = 0.0
+            else:
+                self._backoff = min(
+                    max(2 * self._backoff, self._flush_interval), self._max_backoff
+                )
+                logger.warning(
+                    f"{self.queue_depth} {self._table} rows waiting in the WAL, "
+                    f"next attempt in {self._backoff:.1f}s"
+                )
+
+    async def _drain(self) -> bool:
+        """Write pending records; False if some were left in the WAL."""
+        async with self._drain_lock:
+            if self._wal is not None:
+                while self._wal.pending_count:
+                    batch = await asyncio.to_thread(self._wal.pending, self._batch_size)
+                    if not await self._write(batch):
+                        self._failed_drains += 1
+                        return False
+                    await asyncio.to_thread(
+                        self._wal.mark_written, [record["turn_key"] for record in batch]
+                    )
+                return True
+
+            while self._pending:
+                batch = [
+                    self._pending[i]
+                    for i in range(min(self._batch_size, len(self._pending)))
+                ]
+                if not await self._write(batch):
+                    self._drop(batch, "after retries")
+                for _ in batch:
+                    self._pending.popleft()
+                async with self._space:
+                    self._space.notify_all()
+            return True
+
+    def _drop(self, records: List[Dict], reason: str):
+        if not records:
+            return
+        self._rows_dropped += len(records)
+        timestamps = [record.get("timestamp") for record in records]
+        logger.error(
+            f"Session {self._session_id}: dropped {len(records)} {self._table} rows "
+            f"{reason} ({timestamps[0]} to {timestamps[-1]}), "
+            f"{self._rows_dropped} dropped so far"
+        )
+
+    async def _write(self, batch: List[Dict]) -> bool:
+        started = time.monotonic()
+        for attempt in range(self._max_retries):
+            try:
+                query = self._supabase.from_(self._table)
+                if self._wal is not None:
+                    query = query.upsert(
+                        batch, on_conflict="turn_key,timestamp", ignore_duplicates=True
+                    )
+                else:
+                    query = query.insert(batch)
+                response = await asyncio.wait_for(
+                    query.execute(), self._request_timeout
+                )
+                if hasattr(response, "error") and response.error:
+                    raise RuntimeError(response.error)
+                self._batches_written += 1
+                self._rows_written += len(batch)
+                self._flush_latencies.append(time.monotonic() - started)
+                # keep the latency window bounded for long sessions
+                if len(self._flush_latencies) > 1000:
+                    del self._flush_latencies[:500]
+                return True
+            except Exception as e:
+                if attempt + 1 == self._max_retries:
+                    logger.error(
+                        f"Error inserting {len(batch)} {self._table} rows, giving up: {e or type(e).__name__}"
+                    )
+                    return False
+                delay = self._retry_base_delay * (2**attempt)
+                self._retries += 1
+                logger.warning(
+                    f"Error inserting {len(batch)} {self._table} rows, retrying in {delay:.2f}s: {e or type(e).__name__}"
+                )
+                await asyncio.sleep(delay)
+        return False
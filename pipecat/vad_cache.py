@@ -0,0 +1,91 @@
+import os
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+# onnxruntime is imported by the functions below, not at import time
+if TYPE_CHECKING:
+    from pipecat.audio.vad.silero import SileroVADAnalyzer
+
+SILERO_VAD_CACHE = os.getenv(
+    "SILERO_VAD_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "vad-cache", "silero_vad.ort"),
+)
+
+
+def _session_options(graph_optimization_level):
+    import onnxruntime
+
+    # as pipecat's SileroOnnxModel: one thread, the VAD runs one frame at a time
+    opts = onnxruntime.SessionOptions()
+    opts.inter_op_num_threads = 1
+    opts.intra_op_num_threads = 1
+    opts.graph_optimization_level = graph_optimization_level
+    return opts
+
+
+def _bundled_model_path() -> str:
+    from importlib import resources
+
+    return str(resources.files("pipecat.audio.vad.data").joinpath("silero_vad.onnx"))
+
+
+def build_silero_vad_cache(path: str = SILERO_VAD_CACHE) -> str:
+    """Save the Silero model with its graph optimizations already applied.
+
+    Loading the saved ORT-format model skips graph optimization, which is
+    most of the cost of creating the inference session. Only optimizations
+    that do not depend on the CPU are applied, so the file can be built on
+    one machine and used on another with the same onnxruntime version.
+    """
+    import onnxruntime
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    opts = _session_options(onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED)
+    opts.optimized_model_filepath = path
+    onnxruntime.InferenceSession(
+        _bundled_model_path(), providers=["CPUExecutionProvider"], sess_options=opts
+    )
+    return path
+
+
+def load_silero_vad(
+    path: str = SILERO_VAD_CACHE, fallback: bool = True
+) -> "SileroVADAnalyzer":
+    """A SileroVADAnalyzer, loaded from the cache built at image build time.
+
+    Falls back to pipecat's bundled model if there is no cache, or if it
+    was built by a different onnxruntime and cannot be loaded; with
+    fallback=False those raise instead.
+    """
+    import onnxruntime
+    from pipecat.audio.vad.silero import SileroOnnxModel, SileroVADAnalyzer
+    from pipecat.audio.vad.vad_analyzer import VADAnalyzer
+
+    if not os.path.exists(path) and fallback:
+        return SileroVADAnalyzer()
+    try:
+        session = onnxruntime.InferenceSession(
+            path,
+            providers=["CPUExecutionProvider"],
+            sess_options=_session_options(onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL),
+        )
+    except Exception as e:
+        if not fallback:
+            raise
+        logger.warning(f"Ignoring Silero VAD cache {path}: {e}")
+        return SileroVADAnalyzer()
+
+    # what SileroOnnxModel and SileroVADAnalyzer set up in pipecat-ai 0.0.70
+    # (pinned in requirements.txt), minus loading the bundled model; the
+    # image build's warmup.py and tests/test_vad_cache.py check the result
+    # against a normal analyzer
+    model = SileroOnnxModel.__new__(SileroOnnxModel)
+    model.session = session
+    model.reset_states()
+    model.sample_rates = [8000, 16000]
+    analyzer = SileroVADAnalyzer.__new__(SileroVADAnalyzer)
+    VADAnalyzer.__init__(analyzer)
+    analyzer._model = model
+    analyzer._last_reset_time = 0
+    return analyzer
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Build-time warm-up and self-check for the bot image.
+
+The Dockerfile runs this after the app is copied in, so a new instance has
+nothing left to compile or optimize before its first session:
+  1. compiles bytecode for the app and every installed package,
+  2. caches the pre-optimized Silero VAD model that bot.load_vad_analyzer()
+     loads (see vad_cache.py), after checking that it scores audio exactly
+     like pipecat's bundled model,
+  3. runs a self-check: builds the bot's pipeline, with the real Gemini Live
+     service and context aggregators, on fake transports, and streams audio
+     through the Silero VAD until it reaches the LLM.
+Exits 1 if any step fails, which fails the image build.
+Usage (from the pipecat directory):
+    python warmup.py [--self-check] [--frames N]
+
+--self-check runs only step 3, printing "first_audio_frame" when the first
+frame reaches the LLM and then a JSON line of timings; benchmarks.cold_start
+runs it in fresh interpreters.
+"""
+
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
+import asyncio
+import compileall
+import json
+import os
+import sys
+import sysconfig
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+import bot
+from gemini_live import GeminiLiveTodo
+from vad_cache import SILERO_VAD_CACHE, build_silero_vad_cache, load_silero_vad
+
+from pipecat.frames.frames import EndFrame, InputAudioRawFrame
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.processors.frame_processor import FrameProcessor
+from pipecat.processors.frameworks.rtvi import RTVIConfig, RTVIObserver, RTVIProcessor
+from pipecat.processors.transcript_processor import TranscriptProcessor
+from pipecat.transports.base_input import BaseInputTransport
+from pipecat.transports.base_transport import BaseTransport, TransportParams
+
+IMPORTED = time.perf_counter()
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_RATE = 16000
+# Silero scores 512-sample windows at 16 kHz; Daily delivers 10-20 ms frames
+FRAME_SAMPLES = 320
+SELF_CHECK_TIMEOUT = 60
+
+
+def compile_bytecode() -> bool:
+    """Compile the app and site-packages; only app failures fail the build."""
+    ok = compileall.compile_dir(APP_DIR, quiet=1, workers=0)
+    for path in sorted({sysconfig.get_paths()["purelib"], sysconfig.get_paths()["platlib"]}):
+        # some packages ship sources for other Python versions, e.g. test data
+        if not compileall.compile_dir(path, quiet=1, workers=0):
+            logger.warning(f"Some modules in {path} did not compile")
+    return ok
+
+
+def check_vad_cache(path: str = SILERO_VAD_CACHE) -> Optional[str]:
+    """Problem with the cached Silero model, compared to the bundled one."""
+    import numpy as np
+    from pipecat.audio.vad.silero import SileroVADAnalyzer
+
+    try:
+        cached = load_silero_vad(path, fallback=False)
+    except Exception as e:
+        return f"cannot load {path}: {e}"
+    bundled = SileroVADAnalyzer()
+    rng = np.random.default_rng(0)
+    t = np.arange(512 * 20) / SAMPLE_RATE
+    # a warbling tone under noise, so the scores are not all zero
+    signal = 0.3 * np.sin(2 * np.pi * (220 + 80 * np.sin(3 * t)) * t)
+    signal += 0.05 * rng.standard_normal(len(t))
+    audio = (signal * 32767).astype(np.int16).tobytes()
+    for analyzer in (bundled, cached):
+        analyzer.set_sample_rate(SAMPLE_RATE)
+    for i in range(0, len(audio), 1024):
+        window = audio[i : i + 1024]
+        expected, got = bundled.voice_confidence(window), cached.voice_confidence(window)
+        if abs(expected - got) > 1e-4:
+            return f"cached model scored {got:.5f}, bundled model {expected:.5f}"
+    return None
+
+
+class _OfflineGeminiLiveTodo(GeminiLiveTodo):
+    """GeminiLiveTodo without Supabase: the system instruction is the bare template."""
+
+    async def load_system_instruction(self, filename: str):
+        with open(filename, "r") as f:
+            return f.read()
+
+
+class SelfCheckInput(BaseInputTransport):
+    """Streams silent audio in through the same VAD path as DailyTransport."""
+
+    def __init__(self, params: TransportParams, frames: int):
+        super().__init__(params)
+        self._frames = frames
+        self._feed_task = None
+
+    async def start(self, frame):
+        await super().start(frame)
+        await self.set_transport_ready(frame)
+        self._feed_task = self.create_task(self._feed())
+
+    async def stop(self, frame):
+        await self._stop_feed()
+        await super().stop(frame)
+
+    async def cancel(self, frame):
+        await self._stop_feed()
+        await super().cancel(frame)
+
+    async def _stop_feed(self):
+        if self._feed_task:
+            await self.cancel_task(self._feed_task)
+            self._feed_task = None
+
+    async def _feed(self):
+        audio = bytes(FRAME_SAMPLES * 2)
+        for _ in range(self._frames):
+            await self.push_audio_frame(
+                InputAudioRawFrame(audio=audio, sample_rate=SAMPLE_RATE, num_channels=1)
+            )
+            await asyncio.sleep(0)
+
+
+class SelfCheckOutput(FrameProcessor):
+    async def process_frame(self, frame, direction):
+        await super().process_frame(frame, direction)
+        await self.push_frame(frame, direction)
+
+
+class SelfCheckTransport(BaseTransport):
+    def __init__(self, params: TransportParams, frames: int):
+        super().__init__()
+        self._input = SelfCheckInput(params, frames)
+        self._output = SelfCheckOutput()
+
+    def input(self) -> SelfCheckInput:
+        return self._input
+
+    def output(self) -> SelfCheckOutput:
+        return self._output
+
+
+class AudioProbe(FrameProcessor):
+    """Takes the LLM's place in the pipeline and counts the audio that reaches it.
+
+    Like Gemini Live, it consumes user audio instead of pushing it on.
+    """
+
+    def __init__(self, frames: int, on_first_frame: Optional[Callable[[], None]] = None):
+        super().__init__()
+        self._frames = frames
+        self._on_first_frame = on_first_frame
+        self.received = 0
+        self.first_frame_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    async def process_frame(self, frame, direction):
+        await super().process_frame(frame, direction)
+        if not isinstance(frame, InputAudioRawFrame):
+            await self.push_frame(frame, direction)
+            return
+        self.received += 1
+        if self.received == 1:
+            self.first_frame_at = time.perf_counter()
+            if self._on_first_frame:
+                self._on_first_frame()
+        if self.received == self._frames:
+            self.done.set()
+
+
+async def self_check(
+    frames: int = 50, on_first_frame: Optional[Callable[[], None]] = None
+) -> Dict[str, float]:
+    """Run audio through the bot's pipeline on fake transports.
+
+    Returns the seconds spent on each step, ending with the first audio
+    frame reaching the LLM. Raises if the pipeline fails or stalls.
+    """
+    started = time.perf_counter()
+    vad = await asyncio.to_thread(bot.load_vad_analyzer)
+    vad_loaded = time.perf_counter()
+
+    # the same processors, in the same order, as bot.run_session
+    llm = await _OfflineGeminiLiveTodo(
+        None, "self-check", os.path.join(APP_DIR, "system-instruction.txt")
+    ).llm()
+    transport = SelfCheckTransport(
+        TransportParams(audio_in_enabled=True, audio_in_sample_rate=SAMPLE_RATE, vad_analyzer=vad),
+        frames,
+    )
+    rtvi = RTVIProcessor(config=RTVIConfig(config=[]))
+    context_aggregator = llm.create_context_aggregator(OpenAILLMContext([]))
+    transcript = TranscriptProcessor()
+    probe = AudioProbe(frames, on_first_frame)
+    pipeline = Pipeline(
+        [
+            transport.input(),
+            rtvi,
+            context_aggregator.user(),
+            transcript.user(),
+            probe,  # the Gemini Live service would connect to Google here
+            transport.output(),
+            transcript.assistant(),
+            context_aggregator.assistant(),
+        ]
+    )
+    task = PipelineTask(
+        pipeline,
+        params=PipelineParams(allow_interruptions=True),
+        observers=[RTVIObserver(rtvi)],
+    )
+    built = time.perf_counter()
+
+    run = asyncio.ensure_future(PipelineRunner(handle_sigint=False).run(task))
+    received = asyncio.ensure_future(probe.done.wait())
+    try:
+        await asyncio.wait(
+            {run, received}, timeout=SELF_CHECK_TIMEOUT, return_when=asyncio.FIRST_COMPLETED
+        )
+        if run.done():
+            run.result()  # raises if the pipeline failed
+            raise RuntimeError("pipeline ended before all audio reached the LLM")
+        if not received.done():
+            raise RuntimeError(f"only {probe.received} of {frames} audio frames reached the LLM")
+        await task.queue_frame(EndFrame())
+        await asyncio.wait_for(run, SELF_CHECK_TIMEOUT)
+    finally:
+        received.cancel()
+        if not run.done():
+            await task.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+
+    return {
+        "vad_load_s": vad_loaded - started,
+        "pipeline_build_s": built - vad_loaded,
+        "first_audio_frame_s": probe.first_frame_at - built,
+        "all_audio_frames_s": time.perf_counter() - built,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up and check the bot image")
+    parser.add_argument("--self-check", action="store_true", help="Only run the self-check")
+    parser.add_argument("--frames", type=int, default=50, help="Audio frames to stream")
+    args = parser.parse_args()
+
+    if args.self_check:
+
+        def on_first_frame():
+            print("first_audio_frame", flush=True)
+
+        timings = asyncio.run(self_check(args.frames, on_first_frame))
+        print(json.dumps({"imports_s": IMPORTED - STARTED, **timings}), flush=True)
+        return
+
+    if not compile_bytecode():
+        logger.error("The app did not compile")
+        sys.exit(1)
+    logger.info(f"Caching the Silero VAD model in {build_silero_vad_cache()}")
+    problem = check_vad_cache()
+    if problem:
+        logger.error(f"Silero VAD cache check failed: {problem}")
+        sys.exit(1)
+    timings = asyncio.run(self_check(args.frames))
+    logger.info(
+        "Self-check passed: "
+        + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items())
+    )
+
+
+if __name__ == "__main__":
+    main()
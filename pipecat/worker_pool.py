@@ -0,0 +1,273 @@
+import asyncio
+import multiprocessing
+import os
+import statistics
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+# seconds between a busy worker's reports of the memory its session holds
+MEMORY_REPORT_INTERVAL = 5.0
+
+
+def _worker_main(conn):
+    """Entry point of a pool worker process.
+
+    Imports the bot and loads the Silero VAD model up front, reports ready,
+    then runs one session at a time as they are handed over the pipe. All
+    sessions run on the same event loop so they can share the connections in
+    the client registry.
+    """
+    booted = time.monotonic()
+    import bot
+    from client_registry import close_client_registry
+    from session_memory import session_memory_report
+    from todo_turns_feed import close_todo_turns_feed, get_todo_turns_feed
+
+    # bot.py defers these to first use; a warm worker loads them up front
+    import google.genai  # noqa: F401
+    import pipecatcloud.agent  # noqa: F401
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    vad_analyzer = bot.load_vad_analyzer()
+    conn.send(("ready", time.monotonic() - booted))
+
+    while True:
+        message = conn.recv()
+        if message[0] == "ping":
+            conn.send(("pong",))
+        elif message[0] == "stop":
+            loop.run_until_complete(close_todo_turns_feed())
+            loop.run_until_complete(close_client_registry())
+            loop.close()
+            return
+        elif message[0] == "session":
+            _, body, dispatched_at = message
+            conn.send(("started", time.time() - dispatched_at))
+            reporter = loop.create_task(_report_memory(conn, session_memory_report))
+            try:
+                loop.run_until_complete(
+                    bot.local_dev_runner(body, vad_analyzer=vad_analyzer)
+                )
+            except Exception as e:
+                logger.exception(f"Bot session failed in worker {os.getpid()}: {e}")
+            reporter.cancel()
+            # the change feed outlives sessions so cached history stays current
+            feed = get_todo_turns_feed()
+            _cancel_leftover_tasks(loop, keep=(feed.task,) if feed else ())
+            # load the next session's VAD state while idle
+            vad_analyzer = bot.load_vad_analyzer()
+            conn.send(("done",))
+
+
+async def _report_memory(conn, report):
+    """Send the running session's memory use to the pool until cancelled."""
+    while True:
+        conn.send(("memory", report()))
+        await asyncio.sleep(MEMORY_REPORT_INTERVAL)
+
+
+def _cancel_leftover_tasks(
+    loop: asyncio.AbstractEventLoop, keep: Iterable[Optional[asyncio.Task]] = ()
+):
+    """Stop tasks a finished session left behind before the next one starts.
+
+    Process-wide tasks in `keep` are left running.
+    """
+    tasks = asyncio.all_tasks(loop) - set(keep)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.spawned_at = time.monotonic()
+        self.ready = False
+        self.busy = False
+        self.sessions = 0
+        self.session_was_cold = False
+        self.memory: List[Dict] = []
+        self.last_pong = time.monotonic()
+        self.retiring = False
+
+
+class WorkerPool:
+    """Pre-started bot processes for local-dev-server's /connect.
+
+    Each worker has already imported bot.py and loaded the Silero VAD model,
+    so a session only pays for IPC before bot.main starts. Workers are
+    recycled after `max_sessions` sessions and replaced if they die or stop
+    answering health-check pings. If every worker is busy, an extra one is
+    started and the session waits for it (a cold start).
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_sessions: int = 20,
+        health_interval: float = 10.0,
+        health_timeout: float = 30.0,
+    ):
+        self._size = size
+        self._max_sessions = max_sessions
+        self._health_interval = health_interval
+        self._health_timeout = health_timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        self._health_task: Optional[asyncio.Task] = None
+
+        self._boot_seconds: List[float] = []
+        self._cold_starts: List[float] = []
+        self._warm_starts: List[float] = []
+        self._replaced = 0
+
+    async def start(self):
+        for _ in range(self._size):
+            self._spawn()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._health_task:
+            self._health_task.cancel()
+        for worker in list(self._workers):
+            self._retire(worker, graceful=not worker.busy)
+
+    async def dispatch(self, body: Any):
+        """Hand a session to an idle worker, starting one if none is idle."""
+        worker = next(
+            (w for w in self._workers if w.ready and not w.busy and not w.retiring),
+            None,
+        )
+        if worker is None:
+            worker = next(
+                (w for w in self._workers if not w.ready and not w.busy),
+                None,
+            ) or self._spawn()
+            worker.session_was_cold = True
+        else:
+            worker.session_was_cold = False
+        worker.busy = True
+        worker.conn.send(("session", body, time.time()))
+        logger.info(
+            f"Dispatched session to worker {worker.process.pid} "
+            f"({'cold' if worker.session_was_cold else 'warm'})"
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "workers": len(self._workers),
+            "idle": sum(1 for w in self._workers if w.ready and not w.busy),
+            "busy": sum(1 for w in self._workers if w.busy),
+            "replaced": self._replaced,
+            # bytes held by each running session, as last reported
+            "session_memory": [
+                {**session, "worker": w.process.pid}
+                for w in self._workers
+                if w.busy
+                for session in w.memory
+            ],
+            "worker_boot": _summary(self._boot_seconds),
+            "time_to_bot_start": {
+                "cold": _summary(self._cold_starts),
+                "warm": _summary(self._warm_starts),
+            },
+        }
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx)
+        self._workers.append(worker)
+        asyncio.get_running_loop().add_reader(
+            worker.conn.fileno(), self._on_message, worker
+        )
+        return worker
+
+    def _retire(self, worker: _Worker, graceful: bool = True):
+        worker.retiring = True
+        asyncio.get_running_loop().remove_reader(worker.conn.fileno())
+        if worker in self._workers:
+            self._workers.remove(worker)
+        try:
+            if graceful and worker.process.is_alive():
+                worker.conn.send(("stop",))
+            else:
+                worker.process.kill()
+        except (BrokenPipeError, OSError):
+            worker.process.kill()
+        worker.process.join(timeout=0)
+
+    def _replace(self, worker: _Worker, graceful: bool = True):
+        self._retire(worker, graceful)
+        self._replaced += 1
+        if len(self._workers) < self._size:
+            self._spawn()
+
+    def _on_message(self, worker: _Worker):
+        try:
+            message = worker.conn.recv()
+        except (EOFError, OSError):
+            logger.warning(f"Worker {worker.process.pid} exited")
+            self._replace(worker, graceful=False)
+            return
+
+        kind = message[0]
+        if kind == "ready":
+            worker.ready = True
+            self._boot_seconds.append(message[1])
+            logger.info(f"Worker {worker.process.pid} ready in {message[1]:.2f}s")
+        elif kind == "pong":
+            worker.last_pong = time.monotonic()
+        elif kind == "started":
+            starts = self._cold_starts if worker.session_was_cold else self._warm_starts
+            starts.append(message[1])
+        elif kind == "memory":
+            worker.memory = message[1]
+        elif kind == "done":
+            worker.busy = False
+            worker.memory = []
+            worker.sessions += 1
+            worker.last_pong = time.monotonic()
+            if worker.sessions >= self._max_sessions:
+                logger.info(f"Recycling worker {worker.process.pid}")
+                self._replace(worker)
+            elif len(self._workers) > self._size:
+                # an overflow worker started for a busy pool
+                self._retire(worker)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self._health_interval)
+            now = time.monotonic()
+            for worker in list(self._workers):
+                if not worker.process.is_alive():
+                    logger.warning(f"Worker {worker.process.pid} died, replacing")
+                    self._replace(worker, graceful=False)
+                elif worker.ready and not worker.busy:
+                    if now - worker.last_pong > self._health_timeout:
+                        logger.warning(f"Worker {worker.process.pid} unresponsive, replacing")
+                        self._replace(worker, graceful=False)
+                    else:
+                        try:
+                            worker.conn.send(("ping",))
+                        except (BrokenPipeError, EOFError, OSError):
+                            # it died since is_alive(), or its pipe broke
+                            logger.warning(f"Worker {worker.process.pid} pipe closed, replacing")
+                            self._replace(worker, graceful=False)
+
+
+def _summary(values: List[float]) -> Optional[Dict]:
+    if not values:
+        return None
+    return {
+        "count": len(values),
+        "p50": statistics.median(values),
+        "max": max(values),
+    }